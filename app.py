@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 import time
 import tempfile
 from audiorecorder import audiorecorder 
-import io
+import hashlib
 import warnings
 warnings.filterwarnings("ignore") # Ignore warnings for cleaner output
 
@@ -13,26 +13,55 @@ warnings.filterwarnings("ignore") # Ignore warnings for cleaner output
 from src.processing import (
     load_diarization_pipeline,
     load_transcription_model,
-    perform_diarization,
-    transcribe_audio,
+    run_diarization_and_transcription,
     align_transcription_with_diarization,
+    submit_processing_job,
+    get_processing_job,
+    start_live_session,
+    finish_live_session,
     SUPPORTED_WHISPER_MODELS,
+    ALIGNMENT_STRATEGIES,
+    CHUNK_SPLIT_MODES,
+    SUPPORTED_AUDIO_FORMATS,
     DEFAULT_WHISPER_MODEL,
-    DEFAULT_PYANNOTE_PIPELINE
+    WHISPER_PRECISIONS,
+    DEFAULT_WHISPER_PRECISION,
+    DEFAULT_PYANNOTE_PIPELINE,
+    DEFAULT_DIARIZATION_WINDOW_SECONDS,
+    start_prewarm
 )
+from src.profiling import profile_run, summarize_stages
+from src.jobs import JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED
+from src.transcript import Transcript
 from src.utils import (
-    format_aligned_transcript,
+    format_transcript_turns,
+    find_turn_at,
+    parse_timestamp,
+    format_clock,
     save_uploaded_file,
     get_transcript_text,
-    save_recorded_audio_to_wav, 
+    save_recorded_audio_to_wav,
+    copy_audio_file,
+    audio_segment_to_waveform,
 )
 from src.summarization import (
     summarize_text_map_reduce,
+    render_prompt_editor
+)
+from src.llm import (
     LMSTUDIO_DEFAULT_URL,
     DEFAULT_LOCAL_MODEL,
-    render_prompt_editor
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_CONTEXT_WINDOW,
+    DEFAULT_CHUNK_SIZE_TOKENS,
+    DEFAULT_CHUNK_OVERLAP_TOKENS,
+    DEFAULT_REDUCE_FAN_IN,
+    DEFAULT_REDUCE_MAX_DEPTH,
 )
 
+JOB_POLL_INTERVAL_SECONDS = 2
+TRANSCRIPT_TURNS_PER_PAGE = 50  # Speaker turns rendered at once; keeps reruns and page size flat for long meetings
+
 # Disable Streamlit's file watcher to prevent PyTorch compatibility errors
 os.environ['STREAMLIT_SERVER_WATCHDOG_TIMEOUT'] = '1'
 
@@ -49,6 +78,11 @@ load_dotenv()
 HF_TOKEN = st.secrets.get("HF_TOKEN", os.getenv("HF_TOKEN"))
 LMSTUDIO_API_URL_ENV = st.secrets.get("LMSTUDIO_API_URL", os.getenv("LMSTUDIO_API_URL"))
 
+# --- Model Prewarming ---
+# Loads the default Whisper model and diarization pipeline in the background, once per
+# server process, so the page renders immediately and the first job finds them loaded
+start_prewarm(auth_token=HF_TOKEN)
+
 # --- App Title ---
 st.title("🎙️ Transcibio")
 
@@ -62,6 +96,19 @@ if 'audio_processed' not in st.session_state:
 # Add new session state for user consent
 if 'user_consent_given' not in st.session_state:
     st.session_state.user_consent_given = False
+# Background job of this session; also kept in the URL (?job=...) so a page refresh can pick it up again
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = st.query_params.get("job")
+if 'loaded_job_id' not in st.session_state:
+    st.session_state.loaded_job_id = None
+if 'profile_runs' not in st.session_state:
+    st.session_state.profile_runs = {}  # Run label -> stage records of the latest run, see src/profiling.py
+if 'live_session' not in st.session_state:
+    st.session_state.live_session = None  # LiveSession of the current recording, see src/live.py
+    st.session_state.live_clip_ids = set()  # Recorder clips already sent to a live session
+if 'recording_path' not in st.session_state:
+    st.session_state.recording_path = None  # WAV export of the recorder's current clip, for playback and processing
+    st.session_state.recording_clip_id = None
 
 
 # --- Sidebar Configuration ---
@@ -75,11 +122,68 @@ selected_whisper_model = st.sidebar.selectbox(
     index=SUPPORTED_WHISPER_MODELS.index(DEFAULT_WHISPER_MODEL),
     help="Select Whisper model size (accuracy vs. speed)."
 )
+whisper_precision = st.sidebar.selectbox(
+    "Whisper Precision (CPU):",
+    options=WHISPER_PRECISIONS,
+    index=WHISPER_PRECISIONS.index(DEFAULT_WHISPER_PRECISION),
+    format_func=lambda x: {"fp32": "Full (fp32)", "int8": "Fast (int8 quantized)"}[x],
+    help="int8 quantizes the model's linear layers for faster CPU inference at a small accuracy cost. "
+         "See benchmarks/bench_whisper_precision.py to compare speed and word error rate. Ignored on GPU."
+)
 num_speakers = st.sidebar.number_input(
     "Number of Speakers (0=Auto):", min_value=0, value=0,
     help="0 for auto-detect, or specify known number."
 )
 num_speakers_param = num_speakers if num_speakers > 0 else None
+alignment_strategy = st.sidebar.selectbox(
+    "Speaker Assignment:",
+    options=ALIGNMENT_STRATEGIES,
+    format_func=lambda x: {"midpoint": "Word midpoint", "overlap": "Largest overlap"}[x],
+    help="How words are matched to speaker turns. Words outside every turn go to the nearest speaker."
+)
+run_stages_in_parallel = st.sidebar.toggle(
+    "Run Diarization & Transcription in Parallel",
+    value=True,
+    help="Runs both stages at the same time, splitting the CPU threads between them."
+)
+skip_silence = st.sidebar.toggle(
+    "Skip Silence",
+    value=False,
+    help="Detects pauses, hold music and dead air and only passes speech to the models. "
+         "Timestamps in the transcript still refer to the original recording."
+)
+windowed_diarization = st.sidebar.toggle(
+    "Windowed Diarization",
+    value=False,
+    help=f"Diarizes long recordings in overlapping {DEFAULT_DIARIZATION_WINDOW_SECONDS / 60:.0f}-minute windows "
+         "and matches speakers across them by voice, so memory stays flat and progress is shown as it goes."
+)
+diarization_window = DEFAULT_DIARIZATION_WINDOW_SECONDS if windowed_diarization else None
+chunked_transcription = st.sidebar.toggle(
+    "Chunked Parallel Transcription",
+    value=False,
+    help="Splits long recordings at pauses and transcribes the pieces in parallel. "
+         "Faster on multi-core CPUs; each parallel stream holds its own copy of the Whisper model in memory."
+)
+chunk_split = st.sidebar.selectbox(
+    "Split Chunks At:",
+    options=CHUNK_SPLIT_MODES,
+    format_func=lambda x: {"silence": "Silence (detected)", "speakers": "Speaker turns"}[x],
+    disabled=not chunked_transcription,
+    help="Speaker turns need the diarization first, so both stages then run one after the other."
+)
+process_in_background = st.sidebar.toggle(
+    "Process in Background Queue",
+    value=True,
+    help="Queues the file on the server and shows progress here. Processing continues if the page is refreshed. "
+         "Turn off to process directly in this session."
+)
+show_profile = st.sidebar.toggle(
+    "Show Performance Profile",
+    value=False,
+    help="Shows wall time, CPU time, peak memory, real-time factor and tokens/s per processing stage. "
+         "Set TRANSCIBIO_PROFILE_LOG to also log all runs to a file."
+)
 
 
 
@@ -134,9 +238,18 @@ else:
 # Chunking controls
 st.sidebar.markdown("---")
 st.sidebar.subheader("Detail Control (Chunking)")
+context_window = st.sidebar.number_input(
+    "Model Context Window (tokens):", min_value=1024, max_value=262144, value=DEFAULT_CONTEXT_WINDOW, step=1024,
+    help="Context length of the model loaded in LM Studio. Chunks are capped so that every request fits."
+)
 chunk_size = st.sidebar.slider(
-    "Chunk Size (chars):", min_value=500, max_value=8000, value=4000, step=100,
-    help="Size of text chunks sent to the LLM. The larger the chunk, the less detail in the summary."
+    "Chunk Size (tokens):", min_value=250, max_value=32000, value=DEFAULT_CHUNK_SIZE_TOKENS, step=250,
+    help="Size of text chunks sent to the LLM. The larger the chunk, the less detail in the summary. "
+         "Capped at what fits into the context window."
+)
+max_concurrency = st.sidebar.slider(
+    "Parallel LLM Requests:", min_value=1, max_value=16, value=DEFAULT_MAX_CONCURRENCY,
+    help="Number of chunks sent to the LLM server at the same time. Use 1 if the server cannot handle concurrent requests."
 )
 # Add the toggle for final summary
 combine_summaries = st.sidebar.toggle(
@@ -144,6 +257,15 @@ combine_summaries = st.sidebar.toggle(
     value=True,
     help="When enabled, creates a final summary from all chunk summaries. When disabled, returns individual chunk summaries."
 )
+with st.sidebar.expander("Combine Settings (Advanced)"):
+    reduce_fan_in = st.number_input(
+        "Summaries per Combine Step:", min_value=2, max_value=64, value=DEFAULT_REDUCE_FAN_IN,
+        help="Maximum number of summaries merged in one LLM call. Groups are also limited by the context window."
+    )
+    reduce_max_depth = st.number_input(
+        "Max Combine Levels:", min_value=1, max_value=10, value=DEFAULT_REDUCE_MAX_DEPTH,
+        help="Long transcripts are combined in several levels until one summary remains."
+    )
 
 # --- Main Area ---
 st.markdown("---")
@@ -153,12 +275,13 @@ input_method = st.radio("Choose Audio Input Method:", ("Upload File", "Record Au
 
 uploaded_file = None
 audio_bytes = None
+live_transcription = False
 temp_audio_path_from_input = None # Store path from either upload or record
 
 if input_method == "Upload File":
     uploaded_file = st.file_uploader(
         "Upload Audio File",
-        type=["wav"],
+        type=SUPPORTED_AUDIO_FORMATS,
         key="file_uploader" # Add key to potentially reset
     )
     if uploaded_file:
@@ -220,33 +343,127 @@ elif input_method == "Record Audio":
             st.rerun()
         
         st.info("Click the microphone icon to start recording. Click again to stop.")
+
+        live_transcription = st.toggle(
+            "Live Transcription",
+            value=False,
+            help="Transcribes each recording as soon as you stop it, while you record the next one. "
+                 "All clips are joined into one transcript with consistent speaker labels, so finishing "
+                 "only has to process the last clip. Uses the model settings active when the first clip arrives."
+        )
         
         # Configure the recorder - pauses on silence by default
         audio_bytes = audiorecorder("Click to Record", "Click to Stop Recording", key="recorder")
 
         if len(audio_bytes) > 0:  # Check if audio was recorded
-            # Convert AudioSegment to bytes that Streamlit can display
-            buf = io.BytesIO()
-            audio_bytes.export(buf, format="wav")
-            buf.seek(0)
-            
+            # The recorder returns its last clip on every rerun; export each clip once, to a file that
+            # serves both playback and processing, and send only new clips to the live session
+            clip_id = hashlib.sha1(audio_bytes.raw_data).hexdigest()
+            if clip_id != st.session_state.recording_clip_id:
+                if st.session_state.recording_path and os.path.exists(st.session_state.recording_path):
+                    os.remove(st.session_state.recording_path)
+                st.session_state.recording_path = save_recorded_audio_to_wav(audio_bytes)
+                st.session_state.recording_clip_id = clip_id
+
             # Display the audio
-            st.audio(buf, format="audio/wav")
-            # Save recorded bytes temporarily when processing starts
-            # temp_audio_path_from_input = save_recorded_audio_to_wav(audio_bytes) # Moved to button logic
+            if st.session_state.recording_path:
+                st.audio(st.session_state.recording_path, format="audio/wav")
+
+            if live_transcription and HF_TOKEN and clip_id not in st.session_state.live_clip_ids:
+                if st.session_state.live_session is None:
+                    diarization_pipeline = load_diarization_pipeline(auth_token=HF_TOKEN)
+                    transcription_model = load_transcription_model(selected_whisper_model, whisper_precision)
+                    if diarization_pipeline and transcription_model:
+                        st.session_state.live_session = start_live_session(
+                            transcription_model, diarization_pipeline,
+                            num_speakers=num_speakers_param,
+                            strategy=alignment_strategy
+                        )
+                if st.session_state.live_session is not None:
+                    st.session_state.live_session.append(audio_segment_to_waveform(audio_bytes), is_boundary=True)
+                    st.session_state.live_clip_ids.add(clip_id)
+
+        if live_transcription and not HF_TOKEN:
+            st.warning("Hugging Face Token needed in sidebar to enable live transcription.")
+
+
+# --- Live Transcription ---
+@st.fragment(run_every=JOB_POLL_INTERVAL_SECONDS)
+def render_live_transcript(session):
+    """Shows the committed part of the live transcript while later clips are still processed."""
+    # Only the latest turns, so the polling and rendering cost does not grow with the recording
+    snapshot = session.snapshot(max_lines=TRANSCRIPT_TURNS_PER_PAGE)
+    if snapshot["error"]:
+        st.error(snapshot["error"])
+    status = "⚙️ processing..." if snapshot["busy"] else "✅ up to date"
+    st.caption(f"Live: {snapshot['committed_seconds']:.0f}s of {snapshot['recorded_seconds']:.0f}s recorded transcribed ({status})")
+    lines = snapshot["lines"]  # Formatted as windows are committed, so polling does not regroup the words
+    if lines:
+        if snapshot["num_turns"] > len(lines):
+            st.caption(f"Showing the latest {len(lines)} of {snapshot['num_turns']} speaker turns.")
+        st.markdown("\n\n".join(lines))
+
+if live_transcription and st.session_state.live_session is not None:
+    st.markdown("---")
+    st.subheader("🎙️ Live Transcript:")
+    render_live_transcript(st.session_state.live_session)
+    finish_col, discard_col = st.columns(2)
+    if finish_col.button("✅ Finish & Show Transcript", type="primary"):
+        live_result = finish_live_session(st.session_state.live_session)
+        st.session_state.live_session = None
+        if live_result is not None:
+            st.session_state.aligned_data = live_result["aligned"]
+            st.session_state.full_transcript_text = live_result["text"]
+            st.session_state.audio_processed = True
+            st.session_state.job_id = None
+            st.session_state.loaded_job_id = None
+            st.query_params.pop("job", None)
+    if discard_col.button("🗑️ Discard Live Transcript"):
+        st.session_state.live_session.cancel()
+        st.session_state.live_session = None
+        st.rerun()
 
 
 # --- Processing Button ---
 st.markdown("---")
-process_button_disabled = not (uploaded_file or audio_bytes) or not HF_TOKEN
+process_button_disabled = not (uploaded_file or audio_bytes) or not HF_TOKEN or live_transcription
 if not HF_TOKEN:
      st.warning("Hugging Face Token needed in sidebar to enable processing.")
 
-if st.button("📊 Process Audio", type="primary", disabled=process_button_disabled):
-    # Clear previous results
+process_clicked = st.button("📊 Process Audio", type="primary", disabled=process_button_disabled)
+if process_clicked:
+    # Clear previous results and forget any earlier background job
     st.session_state.aligned_data = None
     st.session_state.full_transcript_text = None
     st.session_state.audio_processed = False
+    st.session_state.job_id = None
+    st.session_state.loaded_job_id = None
+    st.query_params.pop("job", None)
+
+if process_clicked and process_in_background:
+    with st.spinner("Preparing audio data..."):
+        # The job takes ownership of its file, so the recording export is copied (on disk, in chunks)
+        temp_audio_path = save_uploaded_file(uploaded_file) if uploaded_file else copy_audio_file(st.session_state.recording_path)
+    if temp_audio_path:
+        job_id = submit_processing_job(
+            temp_audio_path, selected_whisper_model,
+            pipeline_name=DEFAULT_PYANNOTE_PIPELINE,
+            num_speakers=num_speakers_param,
+            strategy=alignment_strategy,
+            auth_token=HF_TOKEN,
+            chunked=chunked_transcription,
+            chunk_split=chunk_split,
+            skip_silence=skip_silence,
+            precision=whisper_precision,
+            diarization_window=diarization_window
+        )
+        if job_id:
+            st.session_state.job_id = job_id
+            st.query_params["job"] = job_id
+    else:
+        st.error("Could not prepare audio data for processing.")
+
+if process_clicked and not process_in_background:
 
     temp_audio_path = None # Reset path
     input_audio_source = None # Track if we got data from upload or record
@@ -259,7 +476,7 @@ if st.button("📊 Process Audio", type="primary", disabled=process_button_disab
                 temp_audio_path = save_uploaded_file(uploaded_file)
                 input_audio_source = "upload"
             elif audio_bytes:
-                temp_audio_path = save_recorded_audio_to_wav(audio_bytes)
+                temp_audio_path = st.session_state.recording_path  # Kept for playback, not deleted below
                 input_audio_source = "record"
 
             if not temp_audio_path:
@@ -273,29 +490,34 @@ if st.button("📊 Process Audio", type="primary", disabled=process_button_disab
         # ... Transcribe ...
         # ... Align ... 
         # --- Start Copy ---
-        # 2. Load Models
-        diarization_pipeline = load_diarization_pipeline(auth_token=HF_TOKEN)
-        transcription_model = load_transcription_model(selected_whisper_model)
-        if not diarization_pipeline or not transcription_model: st.stop()
-
-        # 3. Perform Diarization
-        speaker_segments = perform_diarization(
-            diarization_pipeline, temp_audio_path, num_speakers_param
-        )
-
-        # 4. Perform Transcription
-        transcription_result = transcribe_audio(
-            transcription_model, temp_audio_path
-        )
-
-        # 5. Align Results
-        with st.spinner("Aligning transcription..."):
-            aligned_data = align_transcription_with_diarization(
-                transcription_result, speaker_segments
+        with profile_run("Transcription & Diarization") as profile:
+            # 2. Load Models
+            diarization_pipeline = load_diarization_pipeline(auth_token=HF_TOKEN)
+            transcription_model = load_transcription_model(selected_whisper_model, whisper_precision)
+            if not diarization_pipeline or not transcription_model: st.stop()
+
+            # 3. + 4. Perform Diarization and Transcription
+            speaker_segments, transcription_result = run_diarization_and_transcription(
+                diarization_pipeline, transcription_model, temp_audio_path,
+                num_speakers=num_speakers_param,
+                model_name=selected_whisper_model,
+                pipeline_name=DEFAULT_PYANNOTE_PIPELINE,
+                parallel=run_stages_in_parallel,
+                chunked=chunked_transcription,
+                chunk_split=chunk_split,
+                skip_silence=skip_silence,
+                diarization_window=diarization_window
             )
-            st.session_state.aligned_data = aligned_data
-            st.session_state.full_transcript_text = get_transcript_text(aligned_data)
-            st.session_state.audio_processed = True # Mark as processed
+
+            # 5. Align Results
+            with st.spinner("Aligning transcription..."):
+                aligned_data = align_transcription_with_diarization(
+                    transcription_result, speaker_segments, strategy=alignment_strategy
+                )
+                st.session_state.aligned_data = aligned_data
+                st.session_state.full_transcript_text = get_transcript_text(aligned_data)
+                st.session_state.audio_processed = True # Mark as processed
+            st.session_state.profile_runs["Transcription & Diarization"] = profile.records
          # --- End Copy ---
 
 
@@ -312,18 +534,88 @@ if st.button("📊 Process Audio", type="primary", disabled=process_button_disab
 
     finally:
         # Clean up temporary file
-        if temp_audio_path and os.path.exists(temp_audio_path):
+        if input_audio_source == "upload" and temp_audio_path and os.path.exists(temp_audio_path):
             try: os.remove(temp_audio_path)
             except Exception as e_clean: st.warning(f"Could not remove temp file: {e_clean}")
 
 
+# --- Background Job Status ---
+@st.fragment(run_every=JOB_POLL_INTERVAL_SECONDS)
+def render_job_status(job_id: str):
+    """Polls the background job; loads its result into the session and reruns the app once it is done."""
+    job = get_processing_job(job_id)
+    if job is None:
+        st.warning("The processing job was not found (it may have expired). Please process the audio again.")
+        st.session_state.job_id = None
+        st.query_params.pop("job", None)
+    elif job["status"] == JOB_QUEUED:
+        st.info(f"⏳ Waiting in queue (position {job['position']})...")
+    elif job["status"] == JOB_RUNNING:
+        stage = f"{job['progress']}, " if job.get("progress") else ""
+        st.info(f"⚙️ Transcribing & diarizing in the background... ({stage}{time.time() - job['started_at']:.0f}s)")
+    elif job["status"] == JOB_FAILED:
+        st.error(f"An error occurred during Transcription/Diarization: {job['error']}")
+        st.session_state.job_id = None
+        st.query_params.pop("job", None)
+    elif job["status"] == JOB_DONE:
+        aligned_data = Transcript.from_words(job["result"]["aligned"])  # Word dicts from the JSON result
+        st.session_state.aligned_data = aligned_data
+        st.session_state.full_transcript_text = get_transcript_text(aligned_data)
+        st.session_state.audio_processed = True
+        st.session_state.loaded_job_id = job_id
+        st.session_state.job_processing_time = job["result"]["processing_time_s"]
+        st.session_state.profile_runs["Transcription & Diarization"] = job["result"].get("profile", [])
+        st.rerun()  # Full rerun so the transcript and summary sections render
+
+if st.session_state.job_id and st.session_state.loaded_job_id != st.session_state.job_id:
+    render_job_status(st.session_state.job_id)
+elif st.session_state.loaded_job_id and st.session_state.loaded_job_id == st.session_state.job_id:
+    st.success(f"🕒 Transcription & Diarization complete in {st.session_state.job_processing_time:.2f} seconds!")
+
+# --- Transcript Viewer ---
+def jump_to_timestamp(transcript: Transcript):
+    """Opens the page with the speaker turn running at the time typed into the jump box."""
+    seconds = parse_timestamp(st.session_state.transcript_jump)
+    if seconds is None:
+        st.session_state.transcript_jump_error = f"'{st.session_state.transcript_jump}' is not a time like 1:05:30."
+        return
+    st.session_state.transcript_page = find_turn_at(transcript, seconds) // TRANSCRIPT_TURNS_PER_PAGE + 1
+
+@st.fragment
+def render_transcript_viewer(transcript: Transcript):
+    """Shows one page of speaker turns; paging and jumping only rerun this fragment."""
+    turns = transcript.turns()  # Memoized on the transcript, so reruns do not regroup the words
+    num_turns = len(turns.texts)
+    if not num_turns:
+        st.warning("No aligned transcript data generated.")
+        return
+    num_pages = -(-num_turns // TRANSCRIPT_TURNS_PER_PAGE)
+    if st.session_state.get("transcript_viewer_source") is not transcript:
+        st.session_state.transcript_viewer_source = transcript  # New transcript: back to its first page
+        st.session_state.transcript_page = 1
+
+    page_col, jump_col = st.columns(2)
+    page = page_col.number_input(f"Page (of {num_pages}):", min_value=1, max_value=num_pages, key="transcript_page")
+    jump_col.text_input(
+        "Jump to Time:", key="transcript_jump", placeholder="e.g. 1:05:30",
+        on_change=jump_to_timestamp, args=(transcript,)
+    )
+    if st.session_state.get("transcript_jump_error"):
+        st.warning(st.session_state.pop("transcript_jump_error"))
+
+    start = (page - 1) * TRANSCRIPT_TURNS_PER_PAGE
+    stop = min(start + TRANSCRIPT_TURNS_PER_PAGE, num_turns)
+    page_end = max(turns.starts[stop - 1], turns.ends[stop - 1])  # Start time if the end is unknown (NaN)
+    st.caption(f"Speaker turns {start + 1}–{stop} of {num_turns} "
+               f"({format_clock(turns.starts[start])} – {format_clock(page_end)})")
+    st.markdown("\n\n".join(format_transcript_turns(transcript, start, stop)))
+
 # --- Display Transcript Results ---
 if st.session_state.get('audio_processed'):
     st.markdown("---")
     st.subheader("🗣️ Speaker-Aligned Transcript:")
     if st.session_state.aligned_data:
-        formatted_lines = format_aligned_transcript(st.session_state.aligned_data)
-        st.markdown("\n\n".join(formatted_lines))
+        render_transcript_viewer(Transcript.from_words(st.session_state.aligned_data))
         # st.text_area(
         #     "Full Transcript Text (for summarization input)",
         #     st.session_state.full_transcript_text,
@@ -360,27 +652,50 @@ if st.session_state.get('audio_processed') and lmstudio_url:
             if not st.session_state.full_transcript_text:
                  st.warning("No transcript text available to summarize.")
             else:
-                with st.spinner(f"Generating summary... (Chunk Size: {chunk_size})"):
+                with st.spinner(f"Generating summary... (Chunk Size: {chunk_size} tokens)"):
                     start_summary_time = time.time()
-                    # Use the selected/edited prompt from the editor
-                    summary_text = summarize_text_map_reduce(
-                                    full_text=st.session_state.full_transcript_text,
-                                    SUMMARY_PROMPT_TEMPLATE=selected_prompt,  # Use custom/default prompt
-                                    chunk_size=chunk_size,
-                                    chunk_overlap=150,
-                                    base_url=lmstudio_url,
-                                    model_name=local_model_name_input,
-                                    combine_summaries=combine_summaries
-                                    )
+                    call_metrics = []  # LLM calls of this summary only; cached steps record none
+                    with profile_run("Summary") as profile:
+                        # Use the selected/edited prompt from the editor
+                        summary_text = summarize_text_map_reduce(
+                                        full_text=st.session_state.full_transcript_text,
+                                        SUMMARY_PROMPT_TEMPLATE=selected_prompt,  # Use custom/default prompt
+                                        chunk_size=chunk_size,
+                                        chunk_overlap=DEFAULT_CHUNK_OVERLAP_TOKENS,
+                                        base_url=lmstudio_url,
+                                        model_name=local_model_name_input,
+                                        combine_summaries=combine_summaries,
+                                        max_concurrency=max_concurrency,
+                                        context_window=context_window,
+                                        reduce_fan_in=reduce_fan_in,
+                                        reduce_max_depth=reduce_max_depth,
+                                        stream_output=True,
+                                        call_metrics=call_metrics
+                                        )
+                        st.session_state.profile_runs["Summary"] = profile.records
                     end_summary_time = time.time()
 
                     if summary_text:
                         st.markdown("### Summary Result:")
                         st.markdown(summary_text)
                         st.info(f"Summarization took {end_summary_time - start_summary_time:.2f} seconds.")
+                        if call_metrics and call_metrics[-1]["streamed"]:
+                            last_call = call_metrics[-1]
+                            st.caption(f"Final step: first token after {last_call['time_to_first_token_s']:.2f}s, "
+                                       f"{last_call['tokens_per_second'] or 0:.1f} tokens/s")
                     else:
                         st.error("Summarization failed. Check LM Studio status and logs.")
 
 
-
-
+# --- Performance Profile ---
+if show_profile and st.session_state.profile_runs:
+    st.markdown("---")
+    st.subheader("⏱️ Performance Profile")
+    st.caption("CPU time counts all threads of the server process, so it includes stages running at the same time. "
+               "RTF = wall time / audio duration (lower is faster).")
+    for run_label, records in st.session_state.profile_runs.items():
+        with st.expander(run_label, expanded=True):
+            if records:
+                st.dataframe(summarize_stages(records), hide_index=True, use_container_width=True)
+            else:
+                st.info("No stages were recorded for this run.")
@@ -0,0 +1,54 @@
+"""Benchmark for word-to-speaker alignment.
+
+Compares the interval-index alignment with the previous linear scan
+(`get_speaker_for_timestamp` per word) on synthetic recordings.
+
+Usage:
+    python -m benchmarks.bench_alignment [--sizes 1000 100000]
+"""
+import argparse
+import time
+from typing import Dict, List
+
+from benchmarks.synthetic import make_synthetic_recording
+from src.processing import align_transcription_with_diarization, get_speaker_for_timestamp
+
+LINEAR_SCAN_MAX_WORDS = 20000  # The quadratic baseline gets too slow beyond this
+
+
+def linear_scan_alignment(transcription_result: Dict, segments: List[Dict]) -> List[str]:
+    """The original O(words x segments) alignment."""
+    speakers = []
+    for segment in transcription_result["segments"]:
+        for word in segment["words"]:
+            mid = word["start"] + (word["end"] - word["start"]) / 2
+            speakers.append(get_speaker_for_timestamp(mid, segments))
+    return speakers
+
+
+def time_call(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 100000, 200000],
+                        help="Numbers of words to benchmark.")
+    args = parser.parse_args()
+
+    print(f"{'words':>8} {'turns':>7} {'linear (s)':>11} {'midpoint (s)':>13} {'overlap (s)':>12}")
+    for num_words in args.sizes:
+        transcription_result, segments = make_synthetic_recording(num_words)
+        if num_words <= LINEAR_SCAN_MAX_WORDS:
+            linear = f"{time_call(linear_scan_alignment, transcription_result, segments):11.3f}"
+        else:
+            linear = f"{'-':>11}"
+        midpoint = time_call(align_transcription_with_diarization, transcription_result, segments)
+        overlap = time_call(align_transcription_with_diarization, transcription_result, segments, strategy="overlap")
+        print(f"{num_words:>8} {len(segments):>7} {linear} {midpoint:13.3f} {overlap:12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Offline benchmark suite for the post-processing and summarization pipeline.
+
+Runs the CPU-side stages on synthetic multi-speaker recordings from 1 minute to
+4 hours: word-to-speaker alignment, transcript formatting and text extraction,
+silence detection with chunk planning, LLM text chunking and the map-reduce
+summarization against a local fake LLM server (see `fake_llm_server.py`).
+No models, no network access.
+
+Results are written as JSON. Passing an earlier result file as `--baseline`
+prints the change per case and exits with status 1 if any case got slower than
+`--threshold`, so the suite can guard a change to these functions:
+
+    python -m benchmarks.bench_pipeline --output before.json
+    # ... change the code ...
+    python -m benchmarks.bench_pipeline --baseline before.json --output after.json
+
+Usage:
+    python -m benchmarks.bench_pipeline [--scales 1m 10m 1h 4h] [--cases align_midpoint map_reduce] [--repeats 5]
+"""
+import os
+
+# Keep benchmark runs out of the profile log (see src/profiling.py)
+os.environ.setdefault("TRANSCIBIO_PROFILE_LOG", "")
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks import synthetic
+from benchmarks.fake_llm_server import FakeLLMServer
+from src import cache, llm, vad
+from src.processing import align_transcription_with_diarization
+from src.transcript import Transcript
+from src.utils import format_aligned_transcript, get_transcript_text
+
+SCALES = {"1m": 60, "10m": 600, "1h": 3600, "4h": 14400}
+DEFAULT_MAX_AUDIO_SECONDS = 3600  # A 4 h waveform alone is ~0.9 GB of float32
+DEFAULT_THRESHOLD = 1.15           # Slower than baseline by more than 15% counts as a regression
+MIN_REGRESSION_SECONDS = 0.002     # ... unless the difference is within timer noise
+NUM_SPEAKERS = 4
+
+
+# --- Cases ---
+
+def quiet_report(level: str, message: str) -> None:
+    pass
+
+def uncached(transcript: Transcript) -> Transcript:
+    """Same columns without the memoized turns and text, so every call measures the full work."""
+    return Transcript(
+        transcript.starts, transcript.ends, transcript.codes, transcript.speakers, transcript.text, transcript.offsets
+    )
+
+def build_cases(duration: float, server: FakeLLMServer, max_audio_seconds: float, seed: int) -> Dict[str, Callable[[], object]]:
+    """Benchmark callables for one recording length; inputs are generated once, outside the timing."""
+    num_words = synthetic.words_for_duration(duration)
+    transcription, segments = synthetic.make_synthetic_recording(num_words, NUM_SPEAKERS, seed)
+    aligned_words = synthetic.make_aligned_transcript(num_words, NUM_SPEAKERS, seed)
+    aligned = Transcript.from_words(aligned_words)
+    text = get_transcript_text(aligned)
+    prompts = llm.read_prompts()
+    prompt_template = prompts["DEFAULT_SUMMARY_PROMPT_TEMPLATE"]
+    combine_template = prompts["DEFAULT_COMBINE_PROMPT_TEMPLATE"]
+
+    def map_reduce():
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache.CACHE_DIR = Path(cache_dir)  # Empty summary cache: every chunk goes to the server
+            return llm.summarize_map_reduce(
+                text, prompt_template, combine_template, server.base_url, model_name="fake",
+                report=quiet_report
+            )
+
+    cases = {
+        "align_midpoint": lambda: align_transcription_with_diarization(transcription, segments, strategy="midpoint"),
+        "align_overlap": lambda: align_transcription_with_diarization(transcription, segments, strategy="overlap"),
+        "transcript_load": lambda: Transcript.from_words(aligned_words),  # Job result JSON -> Transcript
+        "format_transcript": lambda: format_aligned_transcript(uncached(aligned)),
+        "transcript_text": lambda: get_transcript_text(uncached(aligned)),
+        "text_chunking": lambda: llm.split_text_into_chunks(
+            text, llm.DEFAULT_CHUNK_SIZE_TOKENS, llm.DEFAULT_CHUNK_OVERLAP_TOKENS, prompt_template
+        ),
+        "map_reduce": map_reduce,
+    }
+    if duration <= max_audio_seconds:
+        audio = synthetic.make_synthetic_audio(duration, NUM_SPEAKERS, seed)
+        cases["audio_chunking"] = lambda: vad.plan_chunks(
+            vad.detect_speech(audio, synthetic.SAMPLE_RATE), waveform=audio, sample_rate=synthetic.SAMPLE_RATE
+        )
+    return cases
+
+def measure(func: Callable[[], object], repeats: int) -> Dict:
+    """Runs `func` `repeats` times (after one warm-up call); returns median and minimum seconds."""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):  # Progress prints of the pipeline would bury the table
+        func()
+        for _ in range(repeats):
+            gc.collect()
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(timings), "min_seconds": min(timings), "repeats": repeats}
+
+
+# --- Results ---
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_to_baseline(results: List[Dict], baseline: Dict, threshold: float) -> List[Dict]:
+    """Adds `baseline_seconds`, `ratio` and `regression` to every result that exists in the baseline."""
+    previous = {(row["case"], row["scale"]): row for row in baseline.get("results", [])}
+    for row in results:
+        old = previous.get((row["case"], row["scale"]))
+        if old and old["seconds"] > 0:
+            row["baseline_seconds"] = old["seconds"]
+            row["ratio"] = row["seconds"] / old["seconds"]
+            row["regression"] = row["ratio"] > threshold and row["seconds"] - old["seconds"] > MIN_REGRESSION_SECONDS
+    return results
+
+def print_table(results: List[Dict]) -> None:
+    print(f"{'case':<18} {'scale':>5} {'words':>7} {'median (s)':>11} {'min (s)':>9} {'baseline':>9} {'change':>8}")
+    for row in results:
+        if "ratio" in row:
+            change = f"{row['ratio'] - 1:+7.1%}" + ("!" if row["regression"] else " ")
+            baseline = f"{row['baseline_seconds']:9.4f}"
+        else:
+            change, baseline = f"{'-':>8}", f"{'-':>9}"
+        print(f"{row['case']:<18} {row['scale']:>5} {row['words']:>7} {row['seconds']:11.4f} "
+              f"{row['min_seconds']:9.4f} {baseline} {change}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(SCALES),
+                        help="Recording lengths to benchmark.")
+    parser.add_argument("--cases", nargs="+", default=None, help="Only run these cases (default: all).")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per case; the median is reported.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-audio-seconds", type=float, default=DEFAULT_MAX_AUDIO_SECONDS,
+                        help="Skip audio_chunking for longer recordings (memory).")
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="Fake LLM server latency per request (s).")
+    parser.add_argument("--output", type=Path, default=None, help="Write results as JSON to this file.")
+    parser.add_argument("--baseline", type=Path, default=None, help="Earlier --output file to compare against.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Ratio to the baseline above which a case counts as a regression.")
+    args = parser.parse_args(argv)
+
+    results: List[Dict] = []
+    with FakeLLMServer(latency=args.llm_latency) as server:
+        for scale in args.scales:
+            duration = SCALES[scale]
+            cases = build_cases(duration, server, args.max_audio_seconds, args.seed)
+            for name, func in cases.items():
+                if args.cases and name not in args.cases:
+                    continue
+                print(f"Running {name} at {scale}...", file=sys.stderr)
+                row = {"case": name, "scale": scale, "words": synthetic.words_for_duration(duration)}
+                row.update(measure(func, args.repeats))
+                results.append(row)
+
+    if args.baseline:
+        compare_to_baseline(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+    print_table(results)
+
+    if args.output:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "repeats": args.repeats,
+                "seed": args.seed,
+                "llm_latency_s": args.llm_latency,
+            },
+            "results": results,
+        }
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Results written to {args.output}")
+
+    regressions = [row for row in results if row.get("regression")]
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than {args.threshold:.2f}x the baseline.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
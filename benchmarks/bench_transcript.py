@@ -0,0 +1,115 @@
+"""Benchmark for building the transcript display lines and plain text.
+
+Compares the original word loop (string concatenation per turn, one pass for
+the lines and another for the text) with the columnar `Transcript` views, built
+in one traversal, and with the incremental `TranscriptBuilder` fed in windows as
+during live transcription. The time per word should stay flat as the
+transcript grows; only regrouping the whole transcript per window (the live
+view before the builder) is quadratic.
+
+Usage:
+    python -m benchmarks.bench_transcript [--sizes 10000 100000 500000] [--window-words 200]
+"""
+import argparse
+import time
+from typing import Dict, List
+
+from benchmarks.synthetic import make_aligned_transcript
+from src.transcript import Transcript, TranscriptBuilder, format_turn
+
+REGROUP_MAX_WORDS = 100000  # Regrouping the whole transcript per window is quadratic; too slow beyond this
+
+
+def word_loop_views(aligned_data: List[Dict]):
+    """The original formatting loop and text join over word dicts."""
+    output_lines = []
+    current_speaker = None
+    current_segment_start = None
+    current_text = ""
+    last_end_time = 0.0
+    for i, word_data in enumerate(aligned_data):
+        speaker = word_data.get('speaker', "UNKNOWN")
+        word = word_data.get('word', "")
+        start_time = word_data.get('start', None)
+        end_time = word_data.get('end', None)
+        if current_speaker is None or start_time is None:
+            current_speaker = speaker
+            current_segment_start = start_time if start_time is not None else last_end_time
+            current_text = ""
+        if speaker != current_speaker or start_time is None:
+            if current_text.strip():
+                output_lines.append(f"[{current_segment_start:.2f}s - {last_end_time:.2f}s] **{current_speaker}:** {current_text.strip()}")
+            current_speaker = speaker
+            current_segment_start = start_time if start_time is not None else last_end_time
+            current_text = word
+        else:
+            current_text += word
+        if end_time is not None:
+            last_end_time = end_time
+        if i == len(aligned_data) - 1 and current_text.strip():
+            output_lines.append(f"[{current_segment_start:.2f}s - {last_end_time:.2f}s] **{current_speaker}:** {current_text.strip()}")
+    text = " ".join(word['word'].strip() for word in aligned_data if word.get('word', '').strip())
+    return output_lines, text
+
+
+def batch_views(transcript: Transcript):
+    """Turns, display lines and plain text of a finished transcript (memoized views dropped first)."""
+    transcript = Transcript(
+        transcript.starts, transcript.ends, transcript.codes, transcript.speakers, transcript.text, transcript.offsets
+    )
+    turns = transcript.turns()
+    lines = [format_turn(*turn) for turn in zip(turns.starts.tolist(), turns.ends.tolist(), turns.speakers, turns.texts)]
+    return lines, transcript.plain_text()
+
+
+def incremental_views(windows: List[Transcript]):
+    builder = TranscriptBuilder()
+    for window in windows:
+        builder.extend(window)
+    return builder.lines(), builder.plain_text()
+
+
+def regroup_views(windows: List[Transcript]):
+    """Live view before the builder: concatenate each window and regroup the whole transcript."""
+    transcript = Transcript.from_words([])
+    for window in windows:
+        transcript = Transcript.concat([transcript, window])
+        transcript.turns()
+    return transcript.turns(), transcript.plain_text()
+
+
+def time_call(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000, 250000, 500000],
+                        help="Numbers of words to benchmark.")
+    parser.add_argument("--window-words", type=int, default=200,
+                        help="Words per incremental update (roughly one live window).")
+    args = parser.parse_args()
+
+    print(f"{'words':>8} {'word loop (s)':>14} {'batch (s)':>10} {'incremental (s)':>16} {'regroup (s)':>12} "
+          f"{'batch us/word':>14} {'incr. us/word':>14}")
+    for num_words in args.sizes:
+        aligned_data = make_aligned_transcript(num_words)
+        transcript = Transcript.from_words(aligned_data)
+        windows = [transcript[i:i + args.window_words] for i in range(0, num_words, args.window_words)]
+        assert batch_views(transcript) == incremental_views(windows)
+
+        word_loop = time_call(word_loop_views, aligned_data)
+        batch = time_call(batch_views, transcript)
+        incremental = time_call(incremental_views, windows)
+        if num_words <= REGROUP_MAX_WORDS:
+            regroup = f"{time_call(regroup_views, windows):12.3f}"
+        else:
+            regroup = f"{'-':>12}"
+        print(f"{num_words:>8} {word_loop:14.3f} {batch:10.3f} {incremental:16.3f} {regroup} "
+              f"{batch / num_words * 1e6:14.2f} {incremental / num_words * 1e6:14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Word error rate vs. speed for Whisper model sizes and precisions.
+
+Transcribes the given recordings with every combination of `--models` and
+`--precisions` and reports the real-time factor (processing time / audio
+duration, lower is faster) and the word error rate (WER).
+
+The reference for each recording is a `.txt` file next to it with the same
+name (e.g. `meeting.wav` + `meeting.txt`). Without one, the fp32 output of the
+largest model in the run is used as the reference, which measures how far the
+faster settings drift from the best available transcript.
+
+Usage:
+    python -m benchmarks.bench_whisper_precision recordings/*.wav --models tiny base small
+    python -m benchmarks.bench_whisper_precision talk.mp3 --precisions fp32 int8 --threads 8
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+from src import engine
+
+
+def normalize_words(text: str) -> List[str]:
+    """Lowercases and strips punctuation so WER only counts word differences."""
+    return re.findall(r"\w+", text.lower())
+
+
+def word_error_rate(reference: List[str], hypothesis: List[str]) -> float:
+    """(substitutions + deletions + insertions) / reference length, via word-level edit distance."""
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, start=1):
+            current[j] = min(
+                previous[j] + 1,                            # Deletion
+                current[j - 1] + 1,                         # Insertion
+                previous[j - 1] + (ref_word != hyp_word)    # Substitution or match
+            )
+        previous = current
+    return previous[-1] / len(reference)
+
+
+def read_reference(audio_path: Path) -> Optional[List[str]]:
+    reference_path = audio_path.with_suffix(".txt")
+    if not reference_path.exists():
+        return None
+    return normalize_words(reference_path.read_text(encoding="utf-8"))
+
+
+def run_config(model_name: str, precision: str, recordings: Dict[Path, np.ndarray]) -> Dict:
+    """Transcribes all recordings with one model/precision; returns texts and timings."""
+    load_start = time.perf_counter()
+    model = engine.load_transcription_model(model_name, precision)
+    load_seconds = time.perf_counter() - load_start
+
+    texts, seconds = {}, 0.0
+    for path, waveform in recordings.items():
+        start = time.perf_counter()
+        result = engine.transcribe(model, str(path), use_cache=False, waveform=waveform)
+        seconds += time.perf_counter() - start
+        texts[path] = result.get("text", "")
+    return {"load_seconds": load_seconds, "seconds": seconds, "texts": texts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", type=Path, nargs="+", help="Recordings to transcribe.")
+    parser.add_argument("--models", nargs="+", choices=engine.SUPPORTED_WHISPER_MODELS, default=["tiny", "base", "small"])
+    parser.add_argument("--precisions", nargs="+", choices=engine.WHISPER_PRECISIONS, default=engine.WHISPER_PRECISIONS)
+    parser.add_argument("--threads", type=int, default=None, help="Torch CPU threads (default: torch's choice).")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    recordings = {path: engine.decode_audio(str(path)) for path in args.audio}
+    audio_seconds = sum(len(waveform) for waveform in recordings.values()) / engine.SAMPLE_RATE
+    references = {path: read_reference(path) for path in recordings}
+
+    configs = [(model_name, precision) for model_name in args.models for precision in args.precisions]
+    results = {config: run_config(*config, recordings) for config in configs}
+
+    # Recordings without a reference file are compared to the best transcript of this run
+    best_config = (max(args.models, key=engine.SUPPORTED_WHISPER_MODELS.index), "fp32")
+    for path, reference in references.items():
+        if reference is None and best_config in results:
+            references[path] = normalize_words(results[best_config]["texts"][path])
+            print(f"No reference for {path.name}; using {best_config[0]}/fp32 output as reference.")
+
+    print(f"\n{len(recordings)} recording(s), {audio_seconds:.0f}s of audio, {torch.get_num_threads()} thread(s)")
+    print(f"{'model':>8} {'precision':>10} {'load (s)':>9} {'time (s)':>9} {'RTF':>7} {'WER':>7}")
+    for (model_name, precision), result in results.items():
+        scored = [path for path in recordings if references[path] is not None]
+        if scored:
+            reference_words = sum(len(references[path]) for path in scored)
+            errors = sum(
+                word_error_rate(references[path], normalize_words(result["texts"][path])) * len(references[path])
+                for path in scored
+            )
+            wer = f"{errors / max(reference_words, 1):7.1%}"
+        else:
+            wer = f"{'-':>7}"
+        rtf = result["seconds"] / audio_seconds if audio_seconds else 0.0
+        print(f"{model_name:>8} {precision:>10} {result['load_seconds']:9.1f} {result['seconds']:9.1f} {rtf:7.3f} {wer}")
+
+
+if __name__ == "__main__":
+    main()
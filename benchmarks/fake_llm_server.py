@@ -0,0 +1,149 @@
+"""Local stand-in for an OpenAI-compatible LLM server (LM Studio, llama.cpp, vLLM).
+
+Answers `POST /v1/chat/completions`, streamed or not, after a fixed latency and
+at a fixed generation speed, so benchmarks of the summarization pipeline measure
+its orchestration (chunking, concurrency, reduce levels) without a real model
+and without network access. The "summary" is the first words of the prompt.
+
+Usage:
+    python -m benchmarks.fake_llm_server --port 1234 --latency 0.5
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+DEFAULT_LATENCY_SECONDS = 0.02     # Time to first token (prompt processing)
+DEFAULT_TOKENS_PER_SECOND = 2000.0  # Generation speed; one word counts as one token
+DEFAULT_RESPONSE_WORDS = 40
+
+
+class FakeLLMServer:
+    """Threaded fake chat completions server; use as a context manager or call `start`/`stop`."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = DEFAULT_LATENCY_SECONDS,
+        tokens_per_second: float = DEFAULT_TOKENS_PER_SECOND,
+        response_words: int = DEFAULT_RESPONSE_WORDS
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_words = response_words
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _answer(self, request: dict) -> str:
+        prompt = request["messages"][-1]["content"] if request.get("messages") else ""
+        return " ".join(prompt.split()[:self.response_words])
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output clean
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with server._count_lock:
+                    server.request_count += 1
+                time.sleep(server.latency)
+                words = server._answer(request).split(" ")
+                if request.get("stream"):
+                    self._stream(request, words)
+                else:
+                    self._complete(request, words)
+
+            def _complete(self, request: dict, words: list):
+                time.sleep(len(words) / server.tokens_per_second)
+                body = json.dumps({
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "fake"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": " ".join(words)},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, request: dict, words: list):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                for i, word in enumerate(words):
+                    time.sleep(1 / server.tokens_per_second)
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": request.get("model", "fake"),
+                        "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY_SECONDS, help="Seconds before the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=DEFAULT_TOKENS_PER_SECOND)
+    parser.add_argument("--response-words", type=int, default=DEFAULT_RESPONSE_WORDS)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.tokens_per_second, args.response_words)
+    print(f"Fake LLM server at {server.base_url} (Ctrl+C to stop)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
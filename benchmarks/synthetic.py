@@ -0,0 +1,99 @@
+"""Synthetic recordings for the benchmarks.
+
+Everything is generated from a seed, so runs on different machines or commits
+measure exactly the same inputs. Durations are in seconds of "recorded" audio;
+the word and speaker turn rates match typical meeting recordings.
+"""
+import random
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+WORDS_PER_SECOND = 2.5
+SECONDS_PER_TURN = 8.0
+WORDS_PER_SEGMENT = 12  # Whisper segments are roughly one sentence
+SAMPLE_RATE = 16000
+
+# Mixed German/English meeting vocabulary, so tokenizers see realistic words
+VOCABULARY = (
+    "wir wollen das projekt nächste woche abschließen und die ergebnisse im team besprechen "
+    "the budget for the next quarter needs approval before we start the rollout "
+    "ich denke dass die anforderungen noch nicht vollständig geklärt sind "
+    "let us schedule a follow up meeting with the customer to review the timeline "
+    "außerdem müssen wir die dokumentation aktualisieren und die tests erweitern"
+).split()
+
+
+def words_for_duration(duration: float) -> int:
+    return max(1, int(duration * WORDS_PER_SECOND))
+
+
+def make_speaker_segments(duration: float, num_speakers: int = 4, seed: int = 0) -> List[Dict]:
+    """pyannote-like speaker turns with small overlaps and gaps between them."""
+    rng = random.Random(seed)
+    segments = []
+    t = 0.0
+    while t < duration:
+        turn_length = rng.uniform(0.5, 2 * SECONDS_PER_TURN)
+        segments.append({"start": t, "end": t + turn_length, "speaker": f"SPEAKER_{rng.randrange(num_speakers):02d}"})
+        t += turn_length + rng.uniform(-0.3, 0.8)
+    return segments
+
+
+def make_transcription(num_words: int, seed: int = 0) -> Dict:
+    """Whisper-like transcription result with word timestamps, split into sentence-sized segments."""
+    rng = random.Random(seed)
+    words = []
+    for i in range(num_words):
+        start = i / WORDS_PER_SECOND
+        words.append({"start": start, "end": start + rng.uniform(0.1, 0.4), "word": " " + rng.choice(VOCABULARY)})
+    segments = [
+        {
+            "id": i // WORDS_PER_SEGMENT,
+            "start": words[i]["start"],
+            "end": words[min(i + WORDS_PER_SEGMENT, num_words) - 1]["end"],
+            "text": "".join(word["word"] for word in words[i:i + WORDS_PER_SEGMENT]),
+            "words": words[i:i + WORDS_PER_SEGMENT],
+        }
+        for i in range(0, num_words, WORDS_PER_SEGMENT)
+    ]
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments, "language": "de"}
+
+
+def make_synthetic_recording(num_words: int, num_speakers: int = 4, seed: int = 0) -> Tuple[Dict, List[Dict]]:
+    """Generates a Whisper-like transcription result and matching pyannote segments."""
+    duration = num_words / WORDS_PER_SECOND
+    return make_transcription(num_words, seed), make_speaker_segments(duration, num_speakers, seed)
+
+
+def make_aligned_transcript(num_words: int, num_speakers: int = 4, seed: int = 0) -> List[Dict]:
+    """Word-level transcript as produced by the alignment (start, end, word, speaker)."""
+    transcription, segments = make_synthetic_recording(num_words, num_speakers, seed)
+    aligned = []
+    turn = 0
+    for segment in transcription["segments"]:
+        for word in segment["words"]:
+            while turn + 1 < len(segments) and segments[turn + 1]["start"] <= word["start"]:
+                turn += 1
+            aligned.append({**word, "speaker": segments[turn]["speaker"]})
+    return aligned
+
+
+def make_synthetic_audio(duration: float, num_speakers: int = 4, seed: int = 0) -> np.ndarray:
+    """16 kHz mono float32 "speech": one harmonic voice per speaker, pauses between turns, background noise."""
+    rng = np.random.default_rng(seed)
+    num_samples = int(duration * SAMPLE_RATE)
+    audio = rng.standard_normal(num_samples, dtype=np.float32) * np.float32(0.002)
+    pitches = 110.0 + 40.0 * np.arange(num_speakers)
+    for segment in make_speaker_segments(duration, num_speakers, seed):
+        start = int(segment["start"] * SAMPLE_RATE)
+        end = min(int(segment["end"] * SAMPLE_RATE), num_samples)
+        if end <= start:
+            continue
+        t = np.arange(end - start, dtype=np.float32) / SAMPLE_RATE
+        pitch = pitches[int(segment["speaker"].split("_")[1])]
+        # Syllable-rate amplitude modulation makes the energy envelope look like speech
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4.0 * t) ** 2
+        voice = np.sin(2 * np.pi * pitch * t) + 0.5 * np.sin(2 * np.pi * 2 * pitch * t)
+        audio[start:end] += (0.2 * envelope * voice).astype(np.float32)
+    return audio
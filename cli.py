@@ -0,0 +1,252 @@
+"""Headless batch processing of recordings (no Streamlit).
+
+Transcribes, diarizes, aligns and optionally summarizes every audio file in a
+directory or manifest on a process pool, with one model instance per worker.
+Writes <name>.json and <name>.srt per recording; files whose JSON output already
+exists are skipped, so an interrupted run resumes where it stopped.
+
+Usage:
+    python cli.py recordings/ --output-dir transcripts --model small --workers 4
+    python cli.py manifest.txt --summarize --llm-url http://localhost:1234/v1
+
+A manifest is either a .txt file with one audio path per line, or a .jsonl file
+with {"path": ..., "num_speakers": ...} per line. Relative paths are resolved
+against the manifest's directory.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from src import engine, llm, profiling
+
+SUMMARY_PROMPT_KEYS = {
+    "default": "DEFAULT_SUMMARY_PROMPT_TEMPLATE",
+    "protocol": "PROTOCOL_PROMPT_TEMPLATE",
+    "order": "ORDER_PROMPT_TEMPLATE",
+}
+
+
+# --- Input Discovery ---
+
+def find_audio_files(directory: Path) -> List[Dict]:
+    """Lists supported audio files below `directory`, sorted by path."""
+    suffixes = {f".{fmt}" for fmt in engine.SUPPORTED_AUDIO_FORMATS}
+    return [
+        {"path": str(path)}
+        for path in sorted(directory.rglob("*"))
+        if path.is_file() and path.suffix.lower() in suffixes
+    ]
+
+def read_manifest(manifest: Path) -> List[Dict]:
+    """Reads a .txt (one path per line) or .jsonl manifest into job dicts."""
+    jobs = []
+    with open(manifest, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            job = json.loads(line) if manifest.suffix == ".jsonl" else {"path": line}
+            path = Path(job["path"])
+            job["path"] = str(path if path.is_absolute() else manifest.parent / path)
+            jobs.append(job)
+    return jobs
+
+def assign_output_paths(jobs: List[Dict], output_dir: Path) -> None:
+    """Mirrors each input's path relative to the inputs' common directory under `output_dir`."""
+    if not jobs:
+        return
+    paths = [os.path.abspath(job["path"]) for job in jobs]
+    common_root = os.path.commonpath(paths) if len(paths) > 1 else os.path.dirname(paths[0])
+    stems = [output_dir / Path(os.path.relpath(path, common_root)).with_suffix("") for path in paths]
+    for job, path, stem in zip(jobs, paths, stems):
+        if stems.count(stem) > 1:  # e.g. meeting.wav next to meeting.mp3
+            stem = stem.with_name(f"{stem.name}_{Path(path).suffix.lstrip('.')}")
+        job["output_stem"] = str(stem)
+
+
+# --- Worker Process ---
+
+def init_worker(options: Dict) -> None:
+    """Loads the models once per worker process, with its share of the CPU threads."""
+    import torch
+    torch.set_num_threads(options["threads_per_worker"])
+    engine.load_transcription_model(options["model"], options["precision"])
+    engine.load_diarization_pipeline(options["pipeline"], options["hf_token"])
+
+def _write_atomic(path: Path, content: str) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(content, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+def process_job(job: Dict, options: Dict) -> Dict:
+    """Processes one recording and writes its JSON and SRT outputs."""
+    # Stages of this recording are grouped in the profile log (see src/profiling.py)
+    with profiling.profile_run(job["path"]):
+        start_time = time.perf_counter()
+        num_speakers = job.get("num_speakers", options["num_speakers"])
+        result = engine.process_audio_file(
+            job["path"],
+            engine.load_transcription_model(options["model"], options["precision"]),
+            engine.load_diarization_pipeline(options["pipeline"], options["hf_token"]),
+            model_name=options["model"],
+            pipeline_name=options["pipeline"],
+            num_speakers=num_speakers,
+            strategy=options["alignment"],
+            chunked=options["chunked"],
+            chunk_split=options["chunk_split"],
+            max_chunk_seconds=options["max_chunk_seconds"],
+            skip_silence=options["skip_silence"],
+            diarization_window=options["diarization_window"]
+        )
+        aligned = result["aligned"]
+        text = aligned.plain_text()
+
+        summary = None
+        if options["summarize"] and text:
+            prompts = llm.read_prompts()
+            summary = llm.summarize_map_reduce(
+                text,
+                prompt_template=prompts[SUMMARY_PROMPT_KEYS[options["summary_type"]]],
+                combine_prompt_template=prompts["DEFAULT_COMBINE_PROMPT_TEMPLATE"],
+                base_url=options["llm_url"],
+                model_name=options["llm_model"],
+                chunk_size=options["chunk_size"],
+                context_window=options["context_window"],
+            )
+
+        output_stem = Path(job["output_stem"])
+        output_stem.parent.mkdir(parents=True, exist_ok=True)
+        output = {
+            "source": job["path"],
+            "whisper_model": options["model"],
+            "whisper_precision": options["precision"],
+            "pipeline": options["pipeline"],
+            "num_speakers": num_speakers,
+            "language": result["transcription"].get("language"),
+            "processing_time_s": round(time.perf_counter() - start_time, 2),
+            "speaker_segments": result["speaker_segments"],
+            "turns": engine.group_speaker_turns(aligned),
+            "words": aligned.to_dicts(),
+            "text": text,
+            "summary": summary,
+        }
+        _write_atomic(output_stem.with_suffix(".srt"), engine.to_srt(aligned))
+        # JSON last: its presence marks the recording as done for resume
+        _write_atomic(output_stem.with_suffix(".json"), json.dumps(output, ensure_ascii=False, indent=2))
+        return {"path": job["path"], "seconds": output["processing_time_s"]}
+
+
+# --- Main ---
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", type=Path, help="Directory of recordings, or a .txt/.jsonl manifest.")
+    parser.add_argument("--output-dir", type=Path, default=Path("transcripts"))
+    parser.add_argument("--model", choices=engine.SUPPORTED_WHISPER_MODELS, default=engine.DEFAULT_WHISPER_MODEL)
+    parser.add_argument("--precision", choices=engine.WHISPER_PRECISIONS, default=engine.DEFAULT_WHISPER_PRECISION,
+                        help="int8 quantizes Whisper for faster CPU inference.")
+    parser.add_argument("--pipeline", default=engine.DEFAULT_PYANNOTE_PIPELINE)
+    parser.add_argument("--num-speakers", type=int, default=None, help="Known number of speakers (default: auto).")
+    parser.add_argument("--alignment", choices=engine.ALIGNMENT_STRATEGIES, default="midpoint")
+    parser.add_argument("--skip-silence", action="store_true",
+                        help="Only pass detected speech to the models (timestamps stay on the original timeline).")
+    parser.add_argument("--diarization-window", type=float, default=None, metavar="SECONDS",
+                        help=f"Diarize in overlapping windows of this length to bound memory on long recordings "
+                             f"(e.g. {engine.DEFAULT_DIARIZATION_WINDOW_SECONDS:.0f}; default: whole file at once).")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Split each recording at pauses and transcribe the chunks in parallel.")
+    parser.add_argument("--chunk-split", choices=engine.CHUNK_SPLIT_MODES, default="silence")
+    parser.add_argument("--max-chunk-seconds", type=float, default=engine.DEFAULT_MAX_CHUNK_SECONDS)
+    parser.add_argument("--workers", type=int, default=max(1, cpu_count // 4),
+                        help="Worker processes; each loads its own models.")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Torch threads per worker (default: CPU count / workers).")
+    parser.add_argument("--overwrite", action="store_true", help="Reprocess files that already have output.")
+    parser.add_argument("--summarize", action="store_true", help="Also summarize each transcript with the local LLM.")
+    parser.add_argument("--summary-type", choices=list(SUMMARY_PROMPT_KEYS), default="default")
+    parser.add_argument("--llm-url", default=os.getenv("LMSTUDIO_API_URL", llm.LMSTUDIO_DEFAULT_URL))
+    parser.add_argument("--llm-model", default=llm.DEFAULT_LOCAL_MODEL)
+    parser.add_argument("--chunk-size", type=int, default=llm.DEFAULT_CHUNK_SIZE_TOKENS, help="Chunk size in tokens.")
+    parser.add_argument("--context-window", type=int, default=llm.DEFAULT_CONTEXT_WINDOW)
+    args = parser.parse_args(argv)
+    args.workers = max(1, args.workers)
+    args.threads_per_worker = args.threads_per_worker or max(1, cpu_count // args.workers)
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    load_dotenv()
+    args = parse_args(argv)
+    hf_token = os.getenv("HF_TOKEN")
+    if not hf_token:
+        print("HF_TOKEN is not set (environment or .env); it is needed for pyannote diarization.", file=sys.stderr)
+        return 2
+
+    if args.input.is_dir():
+        jobs = find_audio_files(args.input)
+    elif args.input.is_file():
+        jobs = read_manifest(args.input)
+    else:
+        print(f"Input not found: {args.input}", file=sys.stderr)
+        return 2
+    assign_output_paths(jobs, args.output_dir)
+
+    pending = [job for job in jobs if args.overwrite or not Path(job["output_stem"] + ".json").exists()]
+    print(f"{len(jobs)} recording(s) found, {len(jobs) - len(pending)} already done, {len(pending)} to process "
+          f"on {args.workers} worker(s) x {args.threads_per_worker} thread(s).")
+    if not pending:
+        return 0
+
+    options = {
+        "model": args.model,
+        "precision": args.precision,
+        "pipeline": args.pipeline,
+        "hf_token": hf_token,
+        "num_speakers": args.num_speakers,
+        "alignment": args.alignment,
+        "skip_silence": args.skip_silence,
+        "diarization_window": args.diarization_window,
+        "chunked": args.chunked,
+        "chunk_split": args.chunk_split,
+        "max_chunk_seconds": args.max_chunk_seconds,
+        "threads_per_worker": args.threads_per_worker,
+        "summarize": args.summarize,
+        "summary_type": args.summary_type,
+        "llm_url": args.llm_url,
+        "llm_model": args.llm_model,
+        "chunk_size": args.chunk_size,
+        "context_window": args.context_window,
+    }
+    failures = 0
+    start_time = time.perf_counter()
+    # spawn: forked children would inherit torch's thread pools in an undefined state
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(options,)
+    ) as executor:
+        futures = {executor.submit(process_job, job, options): job for job in pending}
+        for completed, future in enumerate(as_completed(futures), start=1):
+            job = futures[future]
+            try:
+                done = future.result()
+                print(f"[{completed}/{len(pending)}] Done {done['path']} in {done['seconds']:.1f}s")
+            except Exception as e:
+                failures += 1
+                print(f"[{completed}/{len(pending)}] FAILED {job['path']}: {e}", file=sys.stderr)
+
+    print(f"Finished in {time.perf_counter() - start_time:.1f}s, {failures} failure(s).")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# --- Constants ---
+PROJECT_ROOT = Path(__file__).parent.parent
+CACHE_DIR = Path(os.getenv("TRANSCIBIO_CACHE_DIR", PROJECT_ROOT / ".cache"))
+# Upper bound for everything stored under CACHE_DIR; least recently used entries are evicted first
+CACHE_MAX_BYTES = int(float(os.getenv("TRANSCIBIO_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MiB reads while hashing audio files
+# Puts between full rescans of CACHE_DIR, to pick up entries written or deleted by other processes
+CACHE_RESCAN_PUTS = 200
+
+_CACHE_SUFFIX = ".pkl"
+_eviction_lock = threading.Lock()
+# Running size of the cache as seen by this process; None until the first scan
+_cache_bytes: Optional[int] = None
+_puts_since_scan = 0
+# (path, size, mtime_ns) -> sha256, so one file is only hashed once per process
+_file_hash_memo: Dict[Tuple[str, int, int], str] = {}
+
+
+# --- Keys ---
+
+def hash_file(path: str) -> str:
+    """Returns the SHA-256 hex digest of a file's content, read in bounded chunks."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _file_hash_memo.get(memo_key)
+    if digest is not None:
+        return digest
+
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(block)
+    digest = hasher.hexdigest()
+    _file_hash_memo[memo_key] = digest
+    return digest
+
+
+def register_file_hash(path: str, digest: str) -> None:
+    """Records the SHA-256 of a file hashed elsewhere (e.g. while writing it), so `hash_file` does not read it again."""
+    stat = os.stat(path)
+    _file_hash_memo[(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)] = digest
+
+
+def known_file_hash(path: str) -> Optional[str]:
+    """The memoized SHA-256 of a file, or None if it has not been hashed in this process."""
+    stat = os.stat(path)
+    return _file_hash_memo.get((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Builds a stable key from JSON-serialisable parts (hashes, model names, settings)."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- Storage ---
+
+def _entry_path(namespace: str, key: str) -> Path:
+    return CACHE_DIR / namespace / key[:2] / f"{key}{_CACHE_SUFFIX}"
+
+
+def cache_get(namespace: str, key: str) -> Optional[Any]:
+    """Returns the cached value for `key`, or None on a miss. A hit refreshes the entry's LRU position."""
+    path = _entry_path(namespace, key)
+    try:
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # Truncated or incompatible entry: drop it and treat as a miss
+        print(f"Discarding unreadable cache entry {path}: {e}")
+        try: path.unlink()
+        except OSError: pass
+        return None
+
+    try: os.utime(path)  # mtime doubles as the "last used" timestamp
+    except OSError: pass
+    return value
+
+
+def cache_contains(namespace: str, key: str) -> bool:
+    """Checks for an entry without loading it."""
+    return _entry_path(namespace, key).exists()
+
+
+def cache_put(namespace: str, key: str, value: Any) -> None:
+    """Stores `value` under `key` atomically, then evicts old entries if the cache is over budget.
+
+    The cache size is tracked as entries are written, so the directory is only
+    scanned when the total goes over `CACHE_MAX_BYTES` or every `CACHE_RESCAN_PUTS` puts.
+    """
+    global _cache_bytes, _puts_since_scan
+    path = _entry_path(namespace, key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file in the same directory and rename, so readers never see partial entries
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False, suffix=".tmp") as tmp_file:
+            pickle.dump(value, tmp_file, protocol=pickle.HIGHEST_PROTOCOL)
+            written_bytes = tmp_file.tell()
+        try:
+            replaced_bytes = path.stat().st_size
+        except OSError:
+            replaced_bytes = 0
+        os.replace(tmp_file.name, path)
+    except Exception as e:
+        print(f"Could not write cache entry {path}: {e}")
+        return
+
+    with _eviction_lock:
+        _puts_since_scan += 1
+        if _cache_bytes is not None:
+            _cache_bytes += written_bytes - replaced_bytes
+        rescan = _cache_bytes is None or _cache_bytes > CACHE_MAX_BYTES or _puts_since_scan >= CACHE_RESCAN_PUTS
+    if rescan:
+        evict_cache()
+
+
+def evict_cache(max_bytes: Optional[int] = None) -> None:
+    """Deletes least recently used entries until the cache fits into `max_bytes` (default `CACHE_MAX_BYTES`)."""
+    global _cache_bytes, _puts_since_scan
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+    with _eviction_lock:
+        entries = []
+        total_bytes = 0
+        for entry in CACHE_DIR.rglob(f"*{_CACHE_SUFFIX}"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # Removed concurrently
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total_bytes += stat.st_size
+
+        _puts_since_scan = 0
+        if total_bytes <= max_bytes:
+            _cache_bytes = total_bytes
+            return
+
+        entries.sort()  # Oldest "last used" first
+        for _, size, entry in entries:
+            if total_bytes <= max_bytes:
+                break
+            try:
+                entry.unlink()
+                total_bytes -= size
+            except OSError:
+                pass
+        _cache_bytes = total_bytes
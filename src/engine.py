@@ -0,0 +1,1075 @@
+"""Streamlit-free processing engine.
+
+Model loading, decoding, diarization, transcription and alignment without any
+`st.*` calls, so the pipeline can run from the Streamlit app (via `src.processing`),
+the batch CLI (`cli.py`) or background workers. Errors are raised, not displayed.
+"""
+import contextvars
+import copy
+import functools
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# torch, whisper and pyannote take seconds to import, so they are imported on first
+# use inside the functions below; importing this module stays cheap for the app
+if TYPE_CHECKING:
+    import whisper
+    from pyannote.audio import Pipeline
+
+from src import profiling, vad
+from src.cache import hash_file, make_cache_key, cache_get, cache_put, cache_contains
+from src.speakers import SpeakerRegistry
+from src.transcript import UNKNOWN_SPEAKER, Transcript
+
+# --- Constants ---
+SUPPORTED_WHISPER_MODELS = ["tiny", "base", "small", "medium", "large"]
+DEFAULT_WHISPER_MODEL = "tiny"
+DEFAULT_PYANNOTE_PIPELINE = "pyannote/speaker-diarization-3.1"
+# "int8": dynamic int8 quantization of Whisper's linear layers for CPU inference
+WHISPER_PRECISIONS = ["fp32", "int8"]
+DEFAULT_WHISPER_PRECISION = os.getenv("TRANSCIBIO_WHISPER_PRECISION", "fp32")
+SAMPLE_RATE = 16000  # whisper.audio.SAMPLE_RATE, expected by both Whisper and pyannote
+SUPPORTED_AUDIO_FORMATS = ["wav", "mp3", "m4a", "ogg", "flac"]
+ALIGNMENT_STRATEGIES = ["midpoint", "overlap"]
+ALIGNMENT_FALLBACKS = ["nearest", "unknown"]
+CHUNK_SPLIT_MODES = ["silence", "speakers"]  # Where chunked transcription may cut the audio
+DEFAULT_MAX_CHUNK_SECONDS = vad.DEFAULT_MAX_CHUNK_SECONDS
+# Windowed diarization (see `iter_diarization_windows`): pyannote's memory grows with the audio it sees at once
+DEFAULT_DIARIZATION_WINDOW_SECONDS = float(os.getenv("TRANSCIBIO_DIARIZATION_WINDOW_SECONDS", "600"))
+DIARIZATION_WINDOW_OVERLAP_SECONDS = 30.0
+# Parallel Whisper streams for chunked transcription; each one holds its own model copy in memory
+# Callers that may run one loaded model at the same time (app sessions, queue workers, live sessions),
+# see `model_slot`; each concurrent Whisper user beyond the first holds its own model copy
+MODEL_SLOTS = max(1, int(os.getenv("TRANSCIBIO_JOBS_PER_MODEL", "1")))
+DEFAULT_TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCIBIO_TRANSCRIPTION_WORKERS", "0")) or max(1, min(4, (os.cpu_count() or 1) // 2))
+
+# Background model loading at startup, see `start_prewarm`
+PREWARM_ENABLED = os.getenv("TRANSCIBIO_PREWARM", "1") != "0"
+PREWARM_WHISPER_MODEL = os.getenv("TRANSCIBIO_PREWARM_MODEL", DEFAULT_WHISPER_MODEL)
+
+# --- Device Selection ---
+
+@functools.lru_cache(maxsize=1)
+def get_device() -> str:
+    """"cuda" if a GPU is available, else "cpu" (imports torch on first call)."""
+    import torch
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Processing device: {device}") # Log device choice
+    return device
+
+# --- Model Loading (Cached per Process) ---
+
+_models: Dict[Tuple[str, str], object] = {}
+_load_locks: Dict[Tuple, threading.Lock] = {}  # One per model key, held while that model loads
+_registry_lock = threading.Lock()  # Guards the model, slot and replica registries; never held during a load
+_PRECISION_ATTR = "transcibio_precision"  # Set on quantized models, see `model_precision`
+
+def _load_once(key: Tuple, load: Callable[[], object]) -> object:
+    """Returns the loaded model for `key`, calling `load` if no thread has loaded it yet.
+
+    Loads of the same key wait for each other; loads of other keys and slot or
+    replica lookups do not.
+    """
+    with _registry_lock:
+        if key in _models:
+            return _models[key]
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+    with load_lock:
+        with _registry_lock:
+            if key in _models:
+                return _models[key]
+        model = load()
+        with _registry_lock:
+            _models[key] = model
+        return model
+
+def load_diarization_pipeline(pipeline_name: str = DEFAULT_PYANNOTE_PIPELINE, auth_token: Optional[str] = None) -> "Pipeline":
+    """Loads the Pyannote diarization pipeline once per process."""
+    import torch
+    from pyannote.audio import Pipeline
+
+    def load():
+        print(f"Loading Pyannote pipeline: {pipeline_name}")
+        with profiling.stage("model_load", model=pipeline_name):
+            pipeline = Pipeline.from_pretrained(pipeline_name, use_auth_token=auth_token)
+            if pipeline is None:
+                # from_pretrained returns None instead of raising for gated models without access
+                raise RuntimeError(f"Could not load '{pipeline_name}'. Check the Hugging Face token and model conditions.")
+            pipeline.to(torch.device(get_device()))
+        _enable_intermediate_reuse(pipeline)
+        print("Pyannote pipeline loaded successfully.")
+        return pipeline
+
+    return _load_once(("pyannote", pipeline_name), load)
+
+def load_transcription_model(model_name: str = DEFAULT_WHISPER_MODEL, precision: str = "fp32") -> "whisper.Whisper":
+    """Loads the Whisper transcription model once per process.
+
+    `precision="int8"` quantizes the model for CPU inference (see `quantize_whisper_int8`).
+    On CUDA it is ignored, since fp16 decoding is used there already.
+    """
+    import whisper
+    if precision not in WHISPER_PRECISIONS:
+        raise ValueError(f"Unknown Whisper precision '{precision}', expected one of {WHISPER_PRECISIONS}.")
+    key = _whisper_key(model_name, precision)
+    if key[2] != precision:
+        print("int8 quantization is CPU-only; using the regular model on CUDA.")
+        precision = key[2]
+
+    def load():
+        print(f"Loading Whisper model: {model_name} ({precision})")
+        with profiling.stage("model_load", model=f"whisper-{model_name}", precision=precision):
+            model = whisper.load_model(model_name, device=get_device())
+            if precision == "int8":
+                model = quantize_whisper_int8(model)
+        print("Whisper model loaded successfully.")
+        return model
+
+    return _load_once(key, load)
+
+def _whisper_key(model_name: str, precision: str) -> Tuple[str, str, str]:
+    """Key of the loaded Whisper model for a requested precision; int8 falls back to fp32 on CUDA."""
+    if precision == "int8" and get_device() != "cpu":
+        precision = "fp32"
+    return ("whisper", model_name, precision)
+
+def quantize_whisper_int8(model: "whisper.Whisper") -> "whisper.Whisper":
+    """Applies dynamic int8 quantization to all linear layers of a CPU Whisper model (in place).
+
+    Weights are stored as int8 and activations quantized on the fly, which speeds up
+    the attention and MLP matmuls on CPUs with VNNI/AVX2 and cuts the model's memory
+    roughly in half. Convolutions and embeddings stay fp32.
+    """
+    import torch
+    import whisper
+    # Whisper's Linear subclasses nn.Linear only to cast weights to the input dtype, which
+    # does not matter in fp32; quantize_dynamic matches exact types, so use the base class.
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    setattr(model, _PRECISION_ATTR, "int8")
+    return model
+
+def model_precision(model: "whisper.Whisper") -> str:
+    """Precision a model was loaded with by `load_transcription_model`."""
+    return getattr(model, _PRECISION_ATTR, "fp32")
+
+# Idle instances of each base model: the model itself plus copies (see `_borrow_replica`)
+_replica_pools: Dict[int, "queue.Queue[whisper.Whisper]"] = {}
+
+@contextmanager
+def _borrow_replica(model: "whisper.Whisper") -> Iterator["whisper.Whisper"]:
+    """Lends an instance of `model` that no other thread is running.
+
+    Whisper's decoder installs kv-cache hooks on the model for every decode, so two
+    threads must never run the same instance. The first borrower gets `model`
+    itself; copies are only created while it is busy and are returned to a pool
+    afterwards, so repeated runs reuse them. All transcription goes through here.
+    """
+    with _registry_lock:
+        if id(model) not in _replica_pools:
+            _replica_pools[id(model)] = queue.Queue()
+            _replica_pools[id(model)].put(model)
+        pool = _replica_pools[id(model)]
+    try:
+        replica = pool.get_nowait()
+    except queue.Empty:
+        print("Creating Whisper model copy for parallel transcription.")
+        replica = copy.deepcopy(model)
+    try:
+        yield replica
+    finally:
+        pool.put(replica)
+
+# --- Model Slots ---
+
+_model_slots: Dict[Tuple, threading.BoundedSemaphore] = {}
+
+def model_slot(key: Tuple) -> threading.BoundedSemaphore:
+    """Semaphore bounding the concurrent users of one loaded model to `MODEL_SLOTS`.
+
+    Every path that runs a loaded model (the app, queue workers, live sessions)
+    holds its slot meanwhile, so the limit applies across all of them.
+    """
+    with _registry_lock:
+        if key not in _model_slots:
+            _model_slots[key] = threading.BoundedSemaphore(MODEL_SLOTS)
+        return _model_slots[key]
+
+def whisper_slot(model_name: str, precision: str = "fp32") -> threading.BoundedSemaphore:
+    """Slot of a Whisper model by name, usable before the model is loaded."""
+    return model_slot(_whisper_key(model_name, precision))
+
+def pipeline_slot(pipeline_name: str) -> threading.BoundedSemaphore:
+    """Slot of a pyannote pipeline by name, usable before the pipeline is loaded."""
+    return model_slot(("pyannote", pipeline_name))
+
+def slot_for(model) -> threading.BoundedSemaphore:
+    """Slot of a model or pipeline returned by `load_transcription_model` / `load_diarization_pipeline`."""
+    with _registry_lock:
+        key = next((key for key, loaded in _models.items() if loaded is model), ("instance", id(model)))
+    return model_slot(key)
+
+# --- Prewarming ---
+
+_prewarm_thread: Optional[threading.Thread] = None
+_prewarm_lock = threading.Lock()
+
+def start_prewarm(
+    model_name: str = PREWARM_WHISPER_MODEL,
+    precision: str = DEFAULT_WHISPER_PRECISION,
+    pipeline_name: str = DEFAULT_PYANNOTE_PIPELINE,
+    auth_token: Optional[str] = None
+) -> Optional[threading.Thread]:
+    """Imports torch and loads the Whisper model and diarization pipeline in a background thread.
+
+    Runs once per process (later calls return the same thread) unless
+    `TRANSCIBIO_PREWARM=0`. The diarization pipeline is skipped without a token.
+    A `load_*` call for a model that is still loading waits for it instead of loading it twice.
+    """
+    global _prewarm_thread
+    if not PREWARM_ENABLED:
+        return None
+
+    def prewarm():
+        try:
+            load_transcription_model(model_name, precision)
+            if auth_token:
+                load_diarization_pipeline(pipeline_name, auth_token)
+        except Exception as e:
+            print(f"Model prewarm failed, models will be loaded on first use: {e}")
+
+    with _prewarm_lock:
+        if _prewarm_thread is None:
+            targets = f"Whisper '{model_name}' ({precision})" + (f" and '{pipeline_name}'" if auth_token else "")
+            print(f"Prewarming {targets} in the background.")
+            _prewarm_thread = threading.Thread(target=prewarm, name="transcibio-prewarm", daemon=True)
+            _prewarm_thread.start()
+        return _prewarm_thread
+
+# --- Audio Decoding ---
+
+@profiling.profiled("decode")
+def decode_audio(audio_path: str) -> np.ndarray:
+    """Decodes any ffmpeg-readable file to 16 kHz mono float32."""
+    import whisper
+    print(f"Decoding audio: {audio_path}")
+    waveform = whisper.load_audio(audio_path, sr=SAMPLE_RATE)
+    profiling.annotate(audio_seconds=len(waveform) / SAMPLE_RATE)
+    print(f"Decoded {len(waveform) / SAMPLE_RATE:.1f}s of audio.")
+    return waveform
+
+# --- Speech-Only Audio ---
+
+@profiling.profiled("silence_detection")
+def detect_speech_regions(waveform: np.ndarray) -> List[vad.Region]:
+    """Speech regions of `waveform`; detect them once and pass them to `diarize` and `transcribe` as `speech_regions`."""
+    return vad.detect_speech(waveform, SAMPLE_RATE)
+
+@profiling.profiled("silence_detection")
+def speech_only_audio(
+    waveform: np.ndarray, regions: Optional[List[vad.Region]] = None
+) -> Tuple[np.ndarray, vad.TimeMap]:
+    """Cuts silence out of `waveform`; the TimeMap restores original timestamps (see `vad.build_speech_timeline`).
+
+    `regions` from `detect_speech_regions` skips detecting the speech again.
+    """
+    if regions is None:
+        regions = vad.detect_speech(waveform, SAMPLE_RATE)
+    speech_waveform, time_map = vad.build_speech_timeline(waveform, SAMPLE_RATE, regions)
+    duration = len(waveform) / SAMPLE_RATE
+    profiling.annotate(audio_seconds=duration, speech_seconds=len(speech_waveform) / SAMPLE_RATE)
+    print(f"Speech-only audio: {len(speech_waveform) / SAMPLE_RATE:.1f}s of {duration:.1f}s "
+          f"({vad.speech_fraction(time_map, duration):.0%} speech).")
+    return speech_waveform, time_map
+
+def restore_segment_times(speaker_segments: List[Dict], time_map: vad.TimeMap) -> List[Dict]:
+    """Maps diarization turns from the speech-only timeline back to the original one (in place)."""
+    starts, ends = vad.to_original_intervals(
+        time_map, [segment["start"] for segment in speaker_segments], [segment["end"] for segment in speaker_segments]
+    )
+    for segment, start, end in zip(speaker_segments, starts.tolist(), ends.tolist()):
+        segment["start"], segment["end"] = start, end
+    return speaker_segments
+
+def restore_transcription_times(result: Dict, time_map: vad.TimeMap) -> Dict:
+    """Maps segment and word timestamps from the speech-only timeline back to the original one (in place)."""
+    segments = result.get("segments", [])
+    restore_segment_times(segments, time_map)
+    words = [word_info for segment in segments for word_info in segment.get("words", [])]
+    restore_segment_times(words, time_map)
+    return result
+
+# --- Diarization Intermediates ---
+
+# pyannote's segmentation and speaker embeddings do not depend on the number of speakers;
+# only the final clustering does. Cached per audio, a new `num_speakers` only re-clusters.
+_INTERMEDIATE_STEPS = ("get_segmentations", "get_embeddings")
+_reused_intermediates: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar(
+    "transcibio_diarization_intermediates", default=None
+)
+
+def _reusing(step: str, compute: Callable) -> Callable:
+    @functools.wraps(compute)
+    def wrapper(*args, **kwargs):
+        store = _reused_intermediates.get()
+        if store is None:
+            return compute(*args, **kwargs)
+        if step in store:
+            profiling.annotate(reused_intermediates=True)
+        else:
+            store[step] = compute(*args, **kwargs)
+        return store[step]
+    return wrapper
+
+def _enable_intermediate_reuse(pipeline: "Pipeline") -> bool:
+    """Routes the pipeline's segmentation and embedding steps through `_reused_intermediates`.
+
+    The pipeline is shared between threads, so the wrappers are installed once and
+    only serve cached results inside `reuse_diarization_intermediates` of the calling
+    context. Returns False for pipelines without these steps.
+    """
+    if getattr(pipeline, "_transcibio_reuse", False):
+        return True
+    if not all(callable(getattr(pipeline, step, None)) for step in _INTERMEDIATE_STEPS):
+        return False
+    for step in _INTERMEDIATE_STEPS:
+        setattr(pipeline, step, _reusing(step, getattr(pipeline, step)))
+    pipeline._transcibio_reuse = True
+    return True
+
+@contextmanager
+def reuse_diarization_intermediates(pipeline: "Pipeline", key: Optional[str]) -> Iterator[None]:
+    """Pipeline calls in this block reuse the segmentation and embeddings cached under `key`.
+
+    Steps that are not cached yet are computed as usual and stored when the block
+    completes. Without a key, the pipeline runs unchanged.
+    """
+    if key is None or not _enable_intermediate_reuse(pipeline):
+        yield
+        return
+    cached = cache_get("diarization-intermediates", key) or {}
+    store = dict(cached)
+    token = _reused_intermediates.set(store)
+    try:
+        yield
+    finally:
+        _reused_intermediates.reset(token)
+    if store.keys() != cached.keys():
+        cache_put("diarization-intermediates", key, store)
+
+# --- Diarization and Transcription ---
+
+def diarization_cache_key(
+    audio_path: str,
+    pipeline_name: str,
+    num_speakers: Optional[int],
+    skip_silence: bool = False,
+    diarization_window: Optional[float] = None
+) -> str:
+    parts = [hash_file(audio_path), pipeline_name, num_speakers]
+    if skip_silence:
+        parts.append("speech-only")
+    if diarization_window:
+        parts.append(["windowed", diarization_window, DIARIZATION_WINDOW_OVERLAP_SECONDS])
+    return make_cache_key(*parts)
+
+def transcription_cache_key(
+    audio_path: str,
+    model_name: str,
+    chunking: Optional[Tuple[str, float]] = None,
+    skip_silence: bool = False,
+    precision: str = "fp32"
+) -> str:
+    """`chunking` is (split mode, max chunk seconds) for chunked transcription, None for a single pass."""
+    parts = [hash_file(audio_path), model_name if precision == "fp32" else f"{model_name}:{precision}"]
+    if chunking is not None:
+        parts.append(list(chunking))
+    elif skip_silence:  # Chunking already leaves silence out; the flag only matters for a single pass
+        parts.append("speech-only")
+    return make_cache_key(*parts)
+
+def needs_decoding(
+    audio_path: str,
+    model_name: Optional[str],
+    pipeline_name: str,
+    num_speakers: Optional[int],
+    chunking: Optional[Tuple[str, float]] = None,
+    skip_silence: bool = False,
+    precision: str = "fp32",
+    diarization_window: Optional[float] = None
+) -> bool:
+    """False if both diarization and transcription of this file are already cached."""
+    return not (
+        model_name is not None
+        and cache_contains(
+            "diarization", diarization_cache_key(audio_path, pipeline_name, num_speakers, skip_silence, diarization_window)
+        )
+        and cache_contains(
+            "transcription", transcription_cache_key(audio_path, model_name, chunking, skip_silence, precision)
+        )
+    )
+
+def diarization_intermediates_key(audio_path: str, pipeline_name: str, skip_silence: bool = False) -> str:
+    """Key of the segmentation and embeddings of a file, which do not depend on the number of speakers."""
+    return make_cache_key(hash_file(audio_path), pipeline_name, "intermediates", "speech-only" if skip_silence else "full")
+
+def annotation_to_segments(diarization) -> List[Dict]:
+    """Converts a pyannote Annotation into start/end/speaker dicts."""
+    return [
+        {"start": turn.start, "end": turn.end, "speaker": speaker}
+        for turn, _, speaker in diarization.itertracks(yield_label=True)
+    ]
+
+def diarize_waveform(
+    pipeline: "Pipeline",
+    waveform: np.ndarray,
+    num_speakers: Optional[int] = None,
+    max_speakers: Optional[int] = None,
+    intermediates_key: Optional[str] = None
+) -> Tuple[List[Dict], Dict[str, np.ndarray]]:
+    """Diarizes a decoded waveform without caching the result; also returns one embedding per speaker.
+
+    The embeddings (pyannote's cluster centroids, keyed by speaker label) allow
+    matching speakers between separately diarized pieces of a recording.
+    With `intermediates_key`, segmentation and embeddings are cached under it
+    (see `reuse_diarization_intermediates`).
+    """
+    import torch
+    # (channel, time) tensor sharing memory with the decoded array
+    audio_input = {"waveform": torch.from_numpy(waveform).unsqueeze(0), "sample_rate": SAMPLE_RATE}
+    with reuse_diarization_intermediates(pipeline, intermediates_key):
+        diarization, centroids = pipeline(
+            audio_input, num_speakers=num_speakers, max_speakers=max_speakers, return_embeddings=True
+        )
+    labels = diarization.labels()
+    embeddings = {label: centroids[i] for i, label in enumerate(labels) if centroids is not None and i < len(centroids)}
+    return annotation_to_segments(diarization), embeddings
+
+def plan_diarization_windows(
+    num_samples: int,
+    window_seconds: float = DEFAULT_DIARIZATION_WINDOW_SECONDS,
+    overlap_seconds: float = DIARIZATION_WINDOW_OVERLAP_SECONDS
+) -> List[Tuple[int, int, int, int]]:
+    """Overlapping windows covering the audio, as (start, end, keep_start, keep_end) sample indices.
+
+    Each window is diarized on its own; only its turns between keep_start and keep_end
+    are kept. Neighbouring windows hand over in the middle of their overlap, where
+    both have context on either side.
+    """
+    window = max(1, int(window_seconds * SAMPLE_RATE))
+    overlap = min(int(overlap_seconds * SAMPLE_RATE), window // 2)
+    if num_samples <= window:
+        return [(0, num_samples, 0, num_samples)]
+    # Fewest windows that fit, all of the same (possibly shorter) length, so none is a sliver
+    num_windows = -(-(num_samples - overlap) // (window - overlap))
+    window = -(-(num_samples + (num_windows - 1) * overlap) // num_windows)
+    starts = [min(i * (window - overlap), num_samples - window) for i in range(num_windows)]
+    windows = []
+    for i, start in enumerate(starts):
+        keep_start = 0 if i == 0 else windows[-1][3]
+        keep_end = num_samples if i == len(starts) - 1 else (starts[i + 1] + start + window) // 2
+        windows.append((start, start + window, keep_start, keep_end))
+    return windows
+
+def iter_diarization_windows(
+    pipeline: "Pipeline",
+    waveform: np.ndarray,
+    num_speakers: Optional[int] = None,
+    window_seconds: float = DEFAULT_DIARIZATION_WINDOW_SECONDS,
+    overlap_seconds: float = DIARIZATION_WINDOW_OVERLAP_SECONDS,
+    intermediates_key: Optional[str] = None
+) -> Iterator[Tuple[List[Dict], float]]:
+    """Diarizes a long waveform window by window; yields (new turns, seconds done) after each window.
+
+    pyannote only ever sees one window, so its memory stays bounded however long the
+    recording is. A `SpeakerRegistry` maps each window's local labels onto global
+    speakers by embedding similarity. Turns are on the waveform's timeline; a turn
+    cut at a hand-over point is joined with its continuation in the next window
+    before it is yielded. `intermediates_key` caches each window's segmentation
+    and embeddings (see `diarize_waveform`).
+    """
+    windows = plan_diarization_windows(len(waveform), window_seconds, overlap_seconds)
+    registry = SpeakerRegistry(max_speakers=num_speakers)
+    held: List[Dict] = []  # Turns ending at the current hand-over point, may continue in the next window
+    for start, end, keep_start, keep_end in windows:
+        window_key = make_cache_key(intermediates_key, start, end) if intermediates_key else None
+        if len(windows) == 1:
+            segments, _ = diarize_waveform(pipeline, waveform, num_speakers=num_speakers, intermediates_key=window_key)
+        else:
+            # A window may hold only some of the speakers, so the count is an upper bound here
+            segments, embeddings = diarize_waveform(
+                pipeline, waveform[start:end], max_speakers=num_speakers, intermediates_key=window_key
+            )
+            durations: Dict[str, float] = {}
+            for segment in segments:
+                durations[segment["speaker"]] = durations.get(segment["speaker"], 0.0) + segment["end"] - segment["start"]
+            labels = registry.match(embeddings, durations)
+            for segment in segments:
+                segment["speaker"] = labels.get(segment["speaker"], segment["speaker"])
+
+        offset, keep_from, keep_to = start / SAMPLE_RATE, keep_start / SAMPLE_RATE, keep_end / SAMPLE_RATE
+        turns = []
+        for segment in segments:
+            turn_start, turn_end = max(segment["start"] + offset, keep_from), min(segment["end"] + offset, keep_to)
+            if turn_end > turn_start:
+                turns.append({"start": turn_start, "end": turn_end, "speaker": segment["speaker"]})
+        turns.sort(key=lambda turn: turn["start"])
+
+        # Turns cut at the next hand-over wait for their continuation; held turns from the previous one get theirs now
+        is_last = keep_end == len(waveform)
+        ready = []
+        for turn in held:
+            continuation = next((t for t in turns if t["start"] == keep_from and t["speaker"] == turn["speaker"]), None)
+            if continuation is not None:
+                continuation["start"] = turn["start"]
+            else:
+                ready.append(turn)
+        held = [turn for turn in turns if turn["end"] == keep_to and not is_last]
+        ready.extend(turn for turn in turns if is_last or turn["end"] != keep_to)
+        ready.sort(key=lambda turn: turn["start"])
+        yield ready, keep_to
+
+@profiling.profiled("diarization")
+def diarize(
+    pipeline: "Pipeline",
+    audio_path: str,
+    num_speakers: Optional[int] = None,
+    pipeline_name: str = DEFAULT_PYANNOTE_PIPELINE,
+    use_cache: bool = True,
+    waveform: Optional[np.ndarray] = None,
+    skip_silence: bool = False,
+    diarization_window: Optional[float] = None,
+    progress: Optional[Callable[[float, float], None]] = None,
+    speech_regions: Optional[List[vad.Region]] = None
+) -> List[Dict]:
+    """Runs speaker diarization and returns speaker turns as start/end/speaker dicts.
+
+    Results are cached on disk by audio content, pipeline name and `num_speakers`;
+    pyannote's segmentation and embeddings are cached without `num_speakers`, so a
+    different speaker count only repeats the clustering.
+    If `waveform` (from `decode_audio`) is given, pyannote uses it instead of reading the file.
+    With `skip_silence`, only the detected speech is diarized (see `speech_only_audio`);
+    the returned turns are on the original timeline. `speech_regions` (from
+    `detect_speech_regions` on `waveform`) avoids detecting the speech again.
+
+    With `diarization_window` (seconds), the audio is diarized in overlapping windows of
+    that length (see `iter_diarization_windows`) and `progress(done_seconds, total_seconds)`
+    is called after each one.
+    """
+    import torch
+    print(f"Starting diarization for: {audio_path}")
+    cache_key = (
+        diarization_cache_key(audio_path, pipeline_name, num_speakers, skip_silence, diarization_window)
+        if use_cache else None
+    )
+    intermediates_key = diarization_intermediates_key(audio_path, pipeline_name, skip_silence) if use_cache else None
+    if cache_key:
+        cached_segments = cache_get("diarization", cache_key)
+        if cached_segments is not None:
+            print(f"Diarization loaded from cache ({len(cached_segments)} speaker turns).")
+            profiling.annotate(cached=True)
+            return cached_segments
+
+    time_map = None
+    if waveform is None and (skip_silence or diarization_window):
+        waveform = decode_audio(audio_path)
+    if skip_silence:
+        profiling.annotate(audio_seconds=len(waveform) / SAMPLE_RATE)
+        waveform, time_map = speech_only_audio(waveform, speech_regions)
+        if len(waveform) == 0:
+            print("No speech detected, skipping diarization.")
+            return []
+
+    if waveform is not None and time_map is None:
+        profiling.annotate(audio_seconds=len(waveform) / SAMPLE_RATE)
+    if diarization_window:
+        speaker_segments = []
+        total_seconds = len(waveform) / SAMPLE_RATE
+        windows = iter_diarization_windows(
+            pipeline, waveform, num_speakers, window_seconds=diarization_window, intermediates_key=intermediates_key
+        )
+        for turns, done_seconds in windows:
+            speaker_segments.extend(turns)
+            print(f"Diarized {done_seconds:.0f}s of {total_seconds:.0f}s ({len(speaker_segments)} speaker turns).")
+            if progress is not None:
+                progress(done_seconds, total_seconds)
+        profiling.annotate(windows=len(plan_diarization_windows(len(waveform), diarization_window)))
+    else:
+        if waveform is not None:
+            # (channel, time) tensor sharing memory with the decoded array
+            audio_input = {"waveform": torch.from_numpy(waveform).unsqueeze(0), "sample_rate": SAMPLE_RATE}
+        else:
+            audio_input = audio_path
+        with reuse_diarization_intermediates(pipeline, intermediates_key):
+            diarization = pipeline(audio_input, num_speakers=num_speakers)
+        speaker_segments = annotation_to_segments(diarization)
+    if time_map is not None:
+        restore_segment_times(speaker_segments, time_map)
+    print(f"Diarization complete. Found {len(speaker_segments)} speaker turns.")
+    if speaker_segments and cache_key:
+        cache_put("diarization", cache_key, speaker_segments)
+    return speaker_segments
+
+@profiling.profiled("transcription")
+def transcribe(
+    model: "whisper.Whisper",
+    audio_path: str,
+    model_name: Optional[str] = None,
+    use_cache: bool = True,
+    waveform: Optional[np.ndarray] = None,
+    chunked: bool = False,
+    chunk_split: str = "silence",
+    max_chunk_seconds: float = DEFAULT_MAX_CHUNK_SECONDS,
+    speaker_segments: Optional[List[Dict]] = None,
+    num_workers: Optional[int] = None,
+    skip_silence: bool = False,
+    speech_regions: Optional[List[vad.Region]] = None
+) -> Dict:
+    """Transcribes with Whisper, including word timestamps.
+
+    When `model_name` is given, results are cached on disk by audio content and model name.
+    If `waveform` (from `decode_audio`) is given, Whisper uses it instead of running ffmpeg again.
+    With `chunked`, the audio is split into pauses and the chunks are transcribed in
+    parallel, see `transcribe_chunked`; `chunk_split="speakers"` cuts between the
+    diarization turns in `speaker_segments` instead of at detected silence.
+    With `skip_silence`, a single pass only sees the detected speech (see `speech_only_audio`);
+    chunked transcription skips silence between chunks anyway. Timestamps are always on
+    the original timeline. `speech_regions` (from `detect_speech_regions` on `waveform`)
+    avoids detecting the speech again.
+    """
+    import whisper
+    print(f"Starting transcription for: {audio_path}")
+    chunking = None
+    if chunked:
+        if chunk_split == "speakers" and not speaker_segments:
+            print("No speaker turns available, splitting chunks at silence instead.")
+            chunk_split = "silence"
+        chunking = (chunk_split, max_chunk_seconds)
+    # Without the model name two different models would share cache entries, so skip caching
+    cache_key = None
+    if use_cache and model_name:
+        cache_key = transcription_cache_key(audio_path, model_name, chunking, skip_silence, model_precision(model))
+    if cache_key:
+        cached_result = cache_get("transcription", cache_key)
+        if cached_result is not None:
+            print("Transcription loaded from cache.")
+            profiling.annotate(cached=True)
+            return cached_result
+
+    if waveform is None and (chunked or skip_silence):
+        waveform = decode_audio(audio_path)
+    if waveform is not None:
+        profiling.annotate(audio_seconds=len(waveform) / SAMPLE_RATE)
+
+    if chunked:
+        with profiling.stage("chunk_planning", split=chunk_split):
+            if chunk_split == "speakers":
+                regions = vad.regions_from_segments(speaker_segments)
+            elif speech_regions is not None:
+                regions = speech_regions
+            else:
+                regions = vad.detect_speech(waveform, SAMPLE_RATE)
+            chunks = vad.plan_chunks(regions, max_chunk_seconds, waveform, SAMPLE_RATE)
+            profiling.annotate(chunks=len(chunks))
+        result = transcribe_chunked(model, waveform, chunks, num_workers=num_workers)
+    elif skip_silence:
+        speech_waveform, time_map = speech_only_audio(waveform, speech_regions)
+        if len(speech_waveform) == 0:
+            print("No speech detected, skipping transcription.")
+            result = {"text": "", "segments": [], "language": None}
+        else:
+            options = whisper.DecodingOptions(fp16 = (get_device() == "cuda"))
+            with _borrow_replica(model) as replica:
+                result = replica.transcribe(speech_waveform, word_timestamps=True, **vars(options))
+            restore_transcription_times(result, time_map)
+    else:
+        options = whisper.DecodingOptions(fp16 = (get_device() == "cuda")) # fp16 only works on CUDA
+        audio_input = waveform if waveform is not None else audio_path
+        with _borrow_replica(model) as replica:
+            result = replica.transcribe(audio_input, word_timestamps=True, **vars(options))
+    profiling.annotate(tokens=count_whisper_tokens(result))
+    print("Transcription complete.")
+    if cache_key:
+        cache_put("transcription", cache_key, result)
+    return result
+
+# --- Chunked Transcription ---
+
+def count_whisper_tokens(result: Dict) -> int:
+    """Number of decoded text tokens in a Whisper result."""
+    return sum(len(segment.get("tokens", [])) for segment in result.get("segments", []))
+
+def detect_language(model: "whisper.Whisper", audio: np.ndarray) -> str:
+    """Detects the spoken language from the first 30 seconds of `audio`."""
+    import whisper
+    if not model.is_multilingual:
+        return "en"
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels).to(model.device)
+    _, probs = model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+def offset_transcription(result: Dict, offset: float) -> Dict:
+    """Shifts segment and word timestamps of a chunk's result by `offset` seconds (in place)."""
+    for segment in result.get("segments", []):
+        segment["start"] += offset
+        segment["end"] += offset
+        for word_info in segment.get("words", []):
+            word_info["start"] += offset
+            word_info["end"] += offset
+    return result
+
+def merge_transcriptions(results: List[Dict], language: Optional[str]) -> Dict:
+    """Concatenates chunk results (already on the global timeline) into one Whisper-style result."""
+    segments = [segment for result in results for segment in result.get("segments", [])]
+    for i, segment in enumerate(segments):
+        segment["id"] = i
+    return {
+        "text": "".join(result.get("text", "") for result in results),
+        "segments": segments,
+        "language": language,
+    }
+
+def transcribe_chunked(
+    model: "whisper.Whisper",
+    waveform: np.ndarray,
+    chunks: List[Tuple[float, float]],
+    num_workers: Optional[int] = None,
+    language: Optional[str] = None
+) -> Dict:
+    """Transcribes independent chunks of `waveform` in parallel and merges them.
+
+    `chunks` are (start, end) seconds, e.g. from `vad.plan_chunks`; audio outside
+    every chunk (long silence) is not transcribed. Each worker thread runs its own
+    instance of the model (see `_borrow_replica`) with a share of the current torch
+    thread count (see `thread_budget`).
+    The language is detected once, so all chunks are decoded consistently.
+    Timestamps in the result are on the timeline of the whole recording.
+    """
+    import torch
+    import whisper
+    if not chunks:
+        return merge_transcriptions([], language)
+    num_workers = max(1, min(num_workers or DEFAULT_TRANSCRIPTION_WORKERS, len(chunks)))
+    threads_per_worker = max(1, torch.get_num_threads() // num_workers)
+    if language is None:
+        first_start, first_end = chunks[0]
+        with _borrow_replica(model) as replica:
+            language = detect_language(replica, waveform[int(first_start * SAMPLE_RATE):int(first_end * SAMPLE_RATE)])
+    options = whisper.DecodingOptions(fp16 = (get_device() == "cuda"), language=language)
+    print(f"Transcribing {len(chunks)} chunks ({sum(end - start for start, end in chunks):.0f}s of audio) "
+          f"on {num_workers} worker(s), language '{language}'.")
+
+    def transcribe_chunk(chunk: Tuple[float, float]) -> Dict:
+        start, end = chunk
+        audio = waveform[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+        with profiling.stage("transcription_chunk", audio_seconds=end - start):
+            with _borrow_replica(model) as replica, thread_budget(threads_per_worker):
+                result = replica.transcribe(audio, word_timestamps=True, **vars(options))
+            profiling.annotate(tokens=count_whisper_tokens(result))
+        return offset_transcription(result, start)
+
+    with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="transcibio-chunk") as executor:
+        # map keeps chunk order; each chunk's stage is recorded under the caller's run
+        results = list(executor.map(profiling.in_current_context(transcribe_chunk), chunks))
+    return merge_transcriptions(results, language)
+
+# --- Thread Budgets ---
+
+def split_thread_budget(total_threads: Optional[int] = None) -> Tuple[int, int]:
+    """Splits the CPU thread budget between diarization and transcription.
+
+    Whisper is usually the slower stage on CPU, so it gets the larger half.
+    """
+    total_threads = total_threads or os.cpu_count() or 2
+    diarization_threads = max(1, total_threads // 2)
+    transcription_threads = max(1, total_threads - diarization_threads)
+    return diarization_threads, transcription_threads
+
+_thread_budget_lock = threading.Lock()
+_open_thread_budgets: List[Tuple[object, int]] = []  # (token, thread count) per open budget, in opening order
+_threads_before_budgets: Optional[int] = None
+
+@contextmanager
+def thread_budget(num_threads: int) -> Iterator[None]:
+    """Sets torch's intra-op thread count for the enclosed work; the previous count is restored afterwards.
+
+    torch does not guarantee that `set_num_threads` is per thread: depending on the
+    build's parallel backend it may change the count for the whole process. Stages
+    running at the same time may then overwrite each other's budget, so treat it as
+    a cap on oversubscription, not as isolation. When a budget closes, the count of
+    the latest budget still open applies again (e.g. a stage's budget after a nested
+    one for chunk workers), or the original count once none is open.
+    """
+    import torch
+    global _threads_before_budgets
+    token = object()
+    with _thread_budget_lock:
+        if not _open_thread_budgets:
+            _threads_before_budgets = torch.get_num_threads()
+        _open_thread_budgets.append((token, num_threads))
+        torch.set_num_threads(num_threads)
+    try:
+        yield
+    finally:
+        with _thread_budget_lock:
+            _open_thread_budgets[:] = [budget for budget in _open_thread_budgets if budget[0] is not token]
+            torch.set_num_threads(_open_thread_budgets[-1][1] if _open_thread_budgets else _threads_before_budgets)
+
+def run_with_thread_budget(num_threads: int, func, *args, **kwargs):
+    """Runs `func` inside `thread_budget(num_threads)`."""
+    with thread_budget(num_threads):
+        return func(*args, **kwargs)
+
+# --- Alignment ---
+
+class SpeakerIndex(NamedTuple):
+    """Sorted, array-backed interval index over diarization segments."""
+    starts: np.ndarray        # Segment starts, ascending
+    ends: np.ndarray          # Segment ends, in the same order as `starts`
+    codes: np.ndarray         # Speaker code per segment (index into `speakers`)
+    speakers: List[str]       # Speaker labels
+    max_ends: np.ndarray      # Running maximum of `ends`, non-decreasing
+    max_end_idx: np.ndarray   # Index of the segment holding each running maximum
+
+def build_speaker_index(segments: List[Dict]) -> SpeakerIndex:
+    """Builds an interval index from pyannote speaker segments.
+
+    Segments may overlap (overlapped speech), so ends are not sorted. The running
+    maximum of the ends is, which lets `searchsorted` find the first segment that
+    can still contain a given time.
+    """
+    starts = np.array([segment["start"] for segment in segments], dtype=np.float64)
+    ends = np.array([segment["end"] for segment in segments], dtype=np.float64)
+    speakers, codes = np.unique([segment["speaker"] for segment in segments], return_inverse=True)
+
+    order = np.argsort(starts, kind="stable")
+    starts, ends, codes = starts[order], ends[order], codes[order]
+    max_ends = np.maximum.accumulate(ends)
+    positions = np.arange(len(ends))
+    max_end_idx = np.maximum.accumulate(np.where(ends == max_ends, positions, 0))
+    return SpeakerIndex(starts, ends, codes.astype(np.int64), speakers.tolist(), max_ends, max_end_idx)
+
+def _candidate_pairs(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Expands per-word candidate ranges [lo, hi) into flat (word, segment) index pairs."""
+    counts = np.maximum(hi - lo, 0)
+    word_idx = np.repeat(np.arange(len(lo)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    segment_idx = np.repeat(lo, counts) + offsets
+    return word_idx, segment_idx
+
+def _assign_by_midpoint(index: SpeakerIndex, mids: np.ndarray) -> np.ndarray:
+    """Speaker code of the first segment with start <= mid < end, or -1."""
+    lo = np.searchsorted(index.max_ends, mids, side="right")  # Earlier segments all end <= mid
+    hi = np.searchsorted(index.starts, mids, side="right")    # Later segments all start > mid
+    word_idx, segment_idx = _candidate_pairs(lo, hi)
+    hits = index.ends[segment_idx] > mids[word_idx]
+    word_idx, segment_idx = word_idx[hits], segment_idx[hits]
+
+    codes = np.full(len(mids), -1, dtype=np.int64)
+    # Pairs are ordered by word, then by segment start: keep the first hit per word
+    hit_words, first = np.unique(word_idx, return_index=True)
+    codes[hit_words] = index.codes[segment_idx[first]]
+    return codes
+
+def _assign_by_overlap(index: SpeakerIndex, word_starts: np.ndarray, word_ends: np.ndarray) -> np.ndarray:
+    """Speaker code with the largest total overlap with each word, or -1."""
+    lo = np.searchsorted(index.max_ends, word_starts, side="right")
+    hi = np.searchsorted(index.starts, word_ends, side="left")
+    word_idx, segment_idx = _candidate_pairs(lo, hi)
+    overlap = (np.minimum(word_ends[word_idx], index.ends[segment_idx])
+               - np.maximum(word_starts[word_idx], index.starts[segment_idx]))
+    positive = overlap > 0
+    word_idx, segment_idx, overlap = word_idx[positive], segment_idx[positive], overlap[positive]
+
+    codes = np.full(len(word_starts), -1, dtype=np.int64)
+    if len(word_idx) == 0:
+        return codes
+    # Sum overlap per (word, speaker), then keep the speaker with the largest sum per word
+    num_speakers = len(index.speakers)
+    keys, inverse = np.unique(word_idx * num_speakers + index.codes[segment_idx], return_inverse=True)
+    totals = np.bincount(inverse, weights=overlap)
+    key_words, key_codes = keys // num_speakers, keys % num_speakers
+    order = np.lexsort((-totals, key_words))
+    best_words, first = np.unique(key_words[order], return_index=True)
+    codes[best_words] = key_codes[order][first]
+    return codes
+
+def _assign_nearest(index: SpeakerIndex, word_starts: np.ndarray, word_ends: np.ndarray) -> np.ndarray:
+    """Speaker code of the segment closest to each word; a segment overlapping the word has distance 0.
+
+    Words reach this fallback when their midpoint lies in a gap, but they may
+    still overlap a segment on either side of it.
+    """
+    num_segments = len(index.starts)
+    # Segments starting before the word ends: the closest is the one ending last (distance 0 if it overlaps)
+    prev = np.searchsorted(index.starts, word_ends, side="right") - 1
+    prev_clipped = np.clip(prev, 0, num_segments - 1)
+    prev_gap = np.where(prev >= 0, np.maximum(word_starts - index.max_ends[prev_clipped], 0.0), np.inf)
+    # Segments starting after the word: the closest is the first of them
+    nxt = prev + 1
+    next_clipped = np.clip(nxt, 0, num_segments - 1)
+    next_gap = np.where(nxt < num_segments, index.starts[next_clipped] - word_ends, np.inf)
+
+    prev_codes = index.codes[index.max_end_idx[prev_clipped]]
+    next_codes = index.codes[next_clipped]
+    return np.where(prev_gap <= next_gap, prev_codes, next_codes)
+
+def assign_speakers(
+    index: SpeakerIndex,
+    word_starts: np.ndarray,
+    word_ends: np.ndarray,
+    strategy: str = "midpoint",
+    fallback: str = "nearest"
+) -> np.ndarray:
+    """Assigns a speaker code to every word in one vectorized pass.
+
+    Args:
+        index: Interval index from `build_speaker_index`
+        word_starts: Word start times in seconds
+        word_ends: Word end times in seconds
+        strategy: "midpoint" uses the segment containing the word's midpoint,
+                  "overlap" the speaker with the most total overlap with the word
+        fallback: "nearest" assigns words outside every segment to the closest segment,
+                  "unknown" leaves them unassigned
+
+    Returns:
+        Array of speaker codes (indices into `index.speakers`), -1 where unassigned
+    """
+    if len(index.starts) == 0 or len(word_starts) == 0:
+        return np.full(len(word_starts), -1, dtype=np.int64)
+
+    mids = word_starts + (word_ends - word_starts) / 2
+    codes = _assign_by_midpoint(index, mids)
+    if strategy == "overlap":
+        overlap_codes = _assign_by_overlap(index, word_starts, word_ends)
+        # Zero-length words have no overlap; they keep their midpoint assignment
+        codes = np.where(overlap_codes >= 0, overlap_codes, codes)
+
+    if fallback == "nearest":
+        unassigned = codes < 0
+        if unassigned.any():
+            codes[unassigned] = _assign_nearest(index, word_starts[unassigned], word_ends[unassigned])
+    return codes
+
+def iter_transcribed_words(transcription_result: Dict) -> List[Dict]:
+    """Flattens Whisper's segment/word structure into one list of word dicts."""
+    return [
+        word_info
+        for segment in transcription_result.get('segments', [])
+        for word_info in segment.get('words', [])
+    ]
+
+@profiling.profiled("alignment")
+def align_words(
+    transcription_result: Dict,
+    speaker_segments: List[Dict],
+    strategy: str = "midpoint",
+    fallback: str = "nearest"
+) -> Transcript:
+    """Assigns a speaker to every transcribed word.
+
+    Speakers are looked up in a sorted interval index, so the cost is
+    O((words + segments) log segments) instead of O(words * segments).
+    See `assign_speakers` for `strategy` and `fallback`.
+    """
+    words = iter_transcribed_words(transcription_result)
+    profiling.annotate(words=len(words))
+    word_texts = [word_info.get('word', "") for word_info in words]
+    if not speaker_segments:
+        return Transcript.from_columns(
+            np.array([w.get('start', 0) for w in words], dtype=np.float64),
+            np.array([w.get('end', 0) for w in words], dtype=np.float64),
+            np.zeros(len(words), dtype=np.int32),
+            [UNKNOWN_SPEAKER],
+            word_texts,
+        )
+
+    word_starts = np.array([w.get('start') for w in words], dtype=np.float64)  # None -> nan
+    word_ends = np.array([w.get('end') for w in words], dtype=np.float64)
+    # Cannot align without timestamps: those words stay UNKNOWN_SPEAKER
+    timed = ~(np.isnan(word_starts) | np.isnan(word_ends))
+
+    index = build_speaker_index(speaker_segments)
+    codes = np.full(len(words), -1, dtype=np.int64)
+    codes[timed] = assign_speakers(index, word_starts[timed], word_ends[timed], strategy, fallback)
+
+    speaker_labels = index.speakers + [UNKNOWN_SPEAKER]
+    codes[codes < 0] = len(index.speakers)  # Unassigned words point at the UNKNOWN_SPEAKER entry
+    return Transcript.from_columns(word_starts, word_ends, codes, speaker_labels, word_texts)
+
+# --- Speaker Turns and Export ---
+
+def group_speaker_turns(aligned_data: Sequence[Dict]) -> List[Dict]:
+    """Merges consecutive words of the same speaker into turns with start, end, speaker and text."""
+    turns = Transcript.from_words(aligned_data).turns()
+    return [
+        {"start": start, "end": None if end != end else end, "speaker": speaker, "text": text}
+        for start, end, speaker, text in zip(turns.starts.tolist(), turns.ends.tolist(), turns.speakers, turns.texts)
+    ]
+
+def _srt_timestamp(seconds: Optional[float]) -> str:
+    milliseconds = int(round((seconds or 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
+
+def to_srt(aligned_data: Sequence[Dict]) -> str:
+    """Renders speaker turns as SRT subtitles."""
+    blocks = []
+    for i, turn in enumerate(group_speaker_turns(aligned_data), start=1):
+        blocks.append(f"{i}\n{_srt_timestamp(turn['start'])} --> {_srt_timestamp(turn['end'])}\n"
+                      f"{turn['speaker']}: {turn['text']}\n")
+    return "\n".join(blocks)
+
+# --- Full Pipeline ---
+
+def process_audio_file(
+    audio_path: str,
+    model: "whisper.Whisper",
+    pipeline: "Pipeline",
+    model_name: str,
+    pipeline_name: str = DEFAULT_PYANNOTE_PIPELINE,
+    num_speakers: Optional[int] = None,
+    strategy: str = "midpoint",
+    chunked: bool = False,
+    chunk_split: str = "silence",
+    max_chunk_seconds: float = DEFAULT_MAX_CHUNK_SECONDS,
+    skip_silence: bool = False,
+    diarization_window: Optional[float] = None
+) -> Dict:
+    """Runs decode, diarization, transcription and alignment for one file, sequentially.
+
+    See `transcribe` for `chunked`, `chunk_split`, `max_chunk_seconds` and `skip_silence`,
+    and `diarize` for `diarization_window`.
+
+    Returns:
+        Dict with "speaker_segments", "transcription" and "aligned" (word-level `Transcript`)
+    """
+    chunking = (chunk_split, max_chunk_seconds) if chunked else None
+    waveform = None
+    if needs_decoding(
+        audio_path, model_name, pipeline_name, num_speakers, chunking, skip_silence, model_precision(model),
+        diarization_window
+    ):
+        waveform = decode_audio(audio_path)
+    speech_regions = detect_speech_regions(waveform) if skip_silence and waveform is not None else None
+    speaker_segments = diarize(
+        pipeline, audio_path, num_speakers, pipeline_name=pipeline_name, waveform=waveform, skip_silence=skip_silence,
+        diarization_window=diarization_window, speech_regions=speech_regions
+    )
+    transcription_result = transcribe(
+        model, audio_path, model_name=model_name, waveform=waveform,
+        chunked=chunked, chunk_split=chunk_split, max_chunk_seconds=max_chunk_seconds,
+        speaker_segments=speaker_segments, skip_silence=skip_silence, speech_regions=speech_regions
+    )
+    aligned = align_words(transcription_result, speaker_segments, strategy=strategy)
+    return {"speaker_segments": speaker_segments, "transcription": transcription_result, "aligned": aligned}
@@ -0,0 +1,324 @@
+"""Local background job queue for transcription/diarization.
+
+Jobs are persisted in a SQLite database so a browser refresh (or a server
+restart) does not lose them; the app submits a job and polls its status.
+A small pool of worker threads runs the jobs through `src.engine` in the
+server process, so models are loaded once and shared between sessions.
+
+Load is bounded in two places:
+- Admission control: `JobQueue.submit` refuses new jobs while `MAX_QUEUED_JOBS`
+  are waiting or running, instead of growing an unbounded backlog.
+- Per-model concurrency: jobs take the same model slots as the app and live
+  sessions (`engine.model_slot`, `TRANSCIBIO_JOBS_PER_MODEL` users per loaded
+  Whisper model or pyannote pipeline). A worker only claims a job whose Whisper
+  model has a free slot, so jobs for other models are not held up behind a busy one.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from src import cache, engine, profiling
+
+# --- Constants ---
+PROJECT_ROOT = Path(__file__).parent.parent
+JOBS_DIR = Path(os.getenv("TRANSCIBIO_JOBS_DIR", PROJECT_ROOT / ".jobs"))
+JOBS_DB_PATH = JOBS_DIR / "jobs.sqlite3"
+JOBS_UPLOAD_DIR = JOBS_DIR / "uploads"
+NUM_JOB_WORKERS = int(os.getenv("TRANSCIBIO_JOB_WORKERS", "2"))
+MAX_QUEUED_JOBS = int(os.getenv("TRANSCIBIO_MAX_QUEUED_JOBS", "8"))  # Waiting + running
+JOB_RETENTION_SECONDS = int(os.getenv("TRANSCIBIO_JOB_RETENTION_HOURS", "24")) * 3600
+WORKER_IDLE_POLL_SECONDS = 1.0
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    audio_path TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    progress TEXT
+)
+"""
+
+
+class QueueFullError(RuntimeError):
+    """Raised by `JobQueue.submit` when the queue is at `MAX_QUEUED_JOBS`."""
+
+
+# --- Job Queue ---
+
+class JobQueue:
+    """SQLite-backed job queue with a pool of worker threads.
+
+    Use `get_job_queue()` for the process-wide instance.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = JOBS_DB_PATH,
+        num_workers: int = NUM_JOB_WORKERS,
+        max_queued: int = MAX_QUEUED_JOBS
+    ):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.num_workers = max(1, num_workers)
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # Tokens are secrets: they stay in memory and are never written to the database
+        self._auth_tokens: Dict[str, Optional[str]] = {}
+        self._workers: List[threading.Thread] = []
+
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "progress" not in columns:  # Databases created before progress reporting
+                conn.execute("ALTER TABLE jobs ADD COLUMN progress TEXT")
+            # Jobs that were running when the server stopped never finished: run them again
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, progress = NULL WHERE status = ?", (JOB_QUEUED, JOB_RUNNING)
+            )
+        self.purge_finished_jobs()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Short-lived connection per operation (sqlite3 connections must not cross threads); commits on success."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def start(self) -> None:
+        """Starts the worker threads (idempotent)."""
+        with self._lock:
+            if self._workers:
+                return
+            # Each worker caps torch at its share of the CPU threads while running a job
+            threads_per_worker = max(1, (os.cpu_count() or 1) // self.num_workers)
+            for i in range(self.num_workers):
+                worker = threading.Thread(
+                    target=self._worker_loop, args=(threads_per_worker,), name=f"job-worker-{i}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+        print(f"Job queue started with {self.num_workers} worker(s), {engine.MODEL_SLOTS} user(s) per model.")
+
+    # --- Submission and Status ---
+
+    def submit(self, audio_path: str, params: Dict, auth_token: Optional[str] = None) -> str:
+        """Queues `audio_path` for processing and returns the job id.
+
+        The queue takes ownership of `audio_path` and deletes it once the job has finished.
+
+        Raises:
+            QueueFullError: If `max_queued` jobs are already waiting or running
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            with self._connect() as conn:
+                (active,) = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (JOB_QUEUED, JOB_RUNNING)
+                ).fetchone()
+                if active >= self.max_queued:
+                    raise QueueFullError(f"The processing queue is full ({active} jobs). Please try again later.")
+                conn.execute(
+                    "INSERT INTO jobs (id, status, audio_path, params, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, JOB_QUEUED, audio_path, json.dumps(params), time.time())
+                )
+            self._auth_tokens[job_id] = auth_token
+            self._wakeup.notify()
+        print(f"Job {job_id} queued ({params.get('model_name')}).")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Returns the job as a dict (with `position` while queued), or None if unknown."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            job["params"] = json.loads(job["params"])
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+            if job["status"] == JOB_QUEUED:
+                (ahead,) = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?", (JOB_QUEUED, job["created_at"])
+                ).fetchone()
+                job["position"] = ahead + 1
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def purge_finished_jobs(self, max_age_seconds: int = JOB_RETENTION_SECONDS) -> None:
+        """Deletes finished jobs older than `max_age_seconds`."""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (JOB_DONE, JOB_FAILED, time.time() - max_age_seconds)
+            )
+
+    # --- Workers ---
+
+    def _model_slot(self, params: Dict) -> threading.Semaphore:
+        # int8 and fp32 variants are separate model instances, so they get separate slots
+        return engine.whisper_slot(params["model_name"], params.get("precision", "fp32"))
+
+    def _claim_next_job(self) -> Optional[Dict]:
+        """Marks the oldest queued job whose model has a free slot as running. Caller holds `_lock`."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, audio_path, params FROM jobs WHERE status = ? ORDER BY created_at", (JOB_QUEUED,)
+            ).fetchall()
+            for row in rows:
+                params = json.loads(row["params"])
+                slot = self._model_slot(params)
+                if not slot.acquire(blocking=False):
+                    continue
+                try:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (JOB_RUNNING, time.time(), row["id"])
+                    )
+                except Exception:
+                    slot.release()
+                    raise
+                return {"id": row["id"], "audio_path": row["audio_path"], "params": params}
+        return None
+
+    def _worker_loop(self, num_threads: int) -> None:
+        while True:
+            with self._lock:
+                try:
+                    job = self._claim_next_job()
+                except Exception as e:
+                    # e.g. the database is locked; keep the worker alive and retry after the poll interval
+                    print(f"Error claiming the next job: {e}")
+                    job = None
+                if job is None:
+                    self._wakeup.wait(timeout=WORKER_IDLE_POLL_SECONDS)
+                    continue
+            try:
+                # Caps torch's threads while jobs run; may be process-wide, see `engine.thread_budget`
+                with engine.thread_budget(num_threads):
+                    self._run_job(job)
+            finally:
+                self._model_slot(job["params"]).release()
+                with self._lock:
+                    self._wakeup.notify_all()  # A model slot is free again
+
+    def _run_job(self, job: Dict) -> None:
+        job_id, audio_path, params = job["id"], job["audio_path"], job["params"]
+        print(f"Job {job_id} started.")
+        with profiling.profile_run(f"job {job_id}") as run:
+            start_time = time.perf_counter()
+            try:
+                auth_token = self._auth_tokens.get(job_id, os.getenv("HF_TOKEN"))
+                model = engine.load_transcription_model(params["model_name"], params.get("precision", "fp32"))
+                pipeline = engine.load_diarization_pipeline(params["pipeline_name"], auth_token)
+                chunked = params.get("chunked", False)
+                chunk_split = params.get("chunk_split", "silence")
+                max_chunk_seconds = params.get("max_chunk_seconds", engine.DEFAULT_MAX_CHUNK_SECONDS)
+                skip_silence = params.get("skip_silence", False)
+                diarization_window = params.get("diarization_window")
+                chunking = (chunk_split, max_chunk_seconds) if chunked else None
+                waveform = None
+                if engine.needs_decoding(
+                    audio_path, params["model_name"], params["pipeline_name"], params["num_speakers"],
+                    chunking, skip_silence, engine.model_precision(model), diarization_window
+                ):
+                    self._set_progress(job_id, "Decoding audio")
+                    waveform = engine.decode_audio(audio_path)
+                speech_regions = (
+                    engine.detect_speech_regions(waveform) if skip_silence and waveform is not None else None
+                )
+                self._set_progress(job_id, "Diarizing")
+                with engine.pipeline_slot(params["pipeline_name"]):
+                    speaker_segments = engine.diarize(
+                        pipeline, audio_path, params["num_speakers"],
+                        pipeline_name=params["pipeline_name"], waveform=waveform, skip_silence=skip_silence,
+                        diarization_window=diarization_window, speech_regions=speech_regions,
+                        progress=lambda done, total: self._set_progress(
+                            job_id, f"Diarizing: {done / 60:.0f} of {total / 60:.0f} min"
+                        )
+                    )
+                self._set_progress(job_id, f"Transcribing ({len(speaker_segments)} speaker turns found)")
+                transcription_result = engine.transcribe(
+                    model, audio_path, model_name=params["model_name"], waveform=waveform,
+                    chunked=chunked, chunk_split=chunk_split, max_chunk_seconds=max_chunk_seconds,
+                    speaker_segments=speaker_segments, skip_silence=skip_silence, speech_regions=speech_regions
+                )
+                aligned = engine.align_words(transcription_result, speaker_segments, strategy=params["strategy"])
+                result = {
+                    "speaker_segments": speaker_segments,
+                    "aligned": aligned.to_dicts(),
+                    "language": transcription_result.get("language"),
+                    "processing_time_s": time.perf_counter() - start_time,
+                    "profile": run.records,
+                }
+                self._finish(job_id, JOB_DONE, result=json.dumps(result))
+                print(f"Job {job_id} done in {result['processing_time_s']:.1f}s.")
+            except Exception as e:
+                self._finish(job_id, JOB_FAILED, error=str(e) or type(e).__name__)
+                print(f"Job {job_id} failed: {e}")
+            finally:
+                self._auth_tokens.pop(job_id, None)
+                try: os.remove(audio_path)
+                except OSError: pass
+
+    def _set_progress(self, job_id: str, progress: str) -> None:
+        """Stage of a running job, shown while polling."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (progress, job_id))
+
+    def _finish(self, job_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+
+
+# --- Module-Level Access ---
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """Returns the process-wide job queue, starting its workers on first use."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+            _job_queue.start()
+        return _job_queue
+
+def store_file(source_path: str) -> str:
+    """Moves an existing temporary audio file into the jobs directory, keeping its known content hash."""
+    JOBS_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    path = JOBS_UPLOAD_DIR / f"{uuid.uuid4().hex}{Path(source_path).suffix}"
+    digest = cache.known_file_hash(source_path)
+    shutil.move(source_path, path)  # Keeps the mtime, also when it has to copy across filesystems
+    if digest is not None:
+        cache.register_file_hash(str(path), digest)
+    return str(path)
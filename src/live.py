@@ -0,0 +1,231 @@
+"""Incremental transcription and diarization while a recording grows.
+
+A `LiveSession` receives audio as it is recorded (`append`) and processes it in
+a background thread, one committed window at a time:
+
+- A window ends at a safe cut: a recorder stop/pause (`is_boundary=True`), or a
+  pause detected by the VAD, at least `LIVE_COMMIT_MARGIN_SECONDS` before the end
+  of the audio received so far. Audio after the last cut stays pending, so no
+  word is split and committed words never change.
+- Each window is transcribed and diarized on its own. Its speaker labels are
+  mapped to session-wide labels with a `SpeakerRegistry`, and its words are
+  aligned and appended to the transcript on the recording's global timeline.
+
+When the recording stops, `finish` only has to process the pending tail.
+"""
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy as np
+
+from src import engine, vad
+from src.speakers import SpeakerRegistry
+from src.transcript import Transcript, TranscriptBuilder
+
+if TYPE_CHECKING:  # Imported on first use by src.engine, see there
+    import whisper
+    from pyannote.audio import Pipeline
+
+# --- Constants ---
+LIVE_MIN_WINDOW_SECONDS = 15.0     # Without a recorder boundary, wait for this much new audio before a step
+LIVE_COMMIT_MARGIN_SECONDS = 1.0   # Pauses closer than this to the end may still be mid-sentence
+LIVE_MAX_PENDING_SECONDS = 60.0    # Speech without a usable pause is cut at the quietest frame after this long
+SAMPLE_RATE = engine.SAMPLE_RATE
+
+
+class LiveSession:
+    """Transcribes and diarizes a growing recording in committed windows."""
+
+    def __init__(
+        self,
+        model: "whisper.Whisper",
+        pipeline: "Pipeline",
+        num_speakers: Optional[int] = None,
+        strategy: str = "midpoint"
+    ):
+        self.model = model
+        self.pipeline = pipeline
+        self.num_speakers = num_speakers
+        self.strategy = strategy
+        self.registry = SpeakerRegistry(max_speakers=num_speakers)
+        self.language: Optional[str] = None
+
+        self.view = TranscriptBuilder()  # Display lines of the committed words, extended per window
+        self._windows: List[Transcript] = []  # Committed words per window, global timeline; joined once in `finish`
+        self.speaker_segments: List[Dict] = []  # Committed speaker turns, global timeline
+        self.error: Optional[str] = None
+
+        self._pending: List[np.ndarray] = []  # Received audio after the last commit; committed audio is dropped
+        self._received = 0    # Samples received in total
+        self._committed = 0   # Samples processed and committed
+        self._boundary = 0    # Last sample index known to be a safe cut
+        self._finishing = False
+        self._cancelled = False
+        self._busy = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._worker = threading.Thread(target=self._worker_loop, name="live-session", daemon=True)
+        self._worker.start()
+
+    # --- Input ---
+
+    def append(self, samples: np.ndarray, is_boundary: bool = False) -> None:
+        """Adds 16 kHz mono float32 audio. `is_boundary` marks its end as a safe cut (e.g. recorder stopped)."""
+        with self._lock:
+            if self._finishing:
+                raise RuntimeError("Cannot append audio to a finished live session.")
+            self._pending.append(samples.astype(np.float32, copy=False))
+            self._received += len(samples)
+            if is_boundary:
+                self._boundary = self._received
+            self._wakeup.notify()
+
+    def finish(self, timeout: Optional[float] = None) -> Dict:
+        """Processes the remaining audio and returns the result.
+
+        Returns:
+            Dict with "aligned", "speaker_segments" and "language", like the batch pipeline, and "text"
+        """
+        with self._lock:
+            self._finishing = True
+            self._boundary = self._received
+            self._wakeup.notify()
+        self._worker.join(timeout)
+        if self.error:
+            raise RuntimeError(self.error)
+        with self._lock:
+            return {
+                "aligned": Transcript.concat(self._windows),
+                "speaker_segments": list(self.speaker_segments),
+                "language": self.language,
+                "text": self.view.plain_text(),
+            }
+
+    def cancel(self) -> None:
+        """Stops the session without processing the remaining audio."""
+        with self._lock:
+            self._finishing = True
+            self._cancelled = True
+            self._wakeup.notify()
+
+    # --- Status ---
+
+    def snapshot(self, max_lines: Optional[int] = None) -> Dict:
+        """Display lines of the committed turns (the latest `max_lines`) plus progress counters.
+
+        Safe to call from any thread. With `max_lines`, its cost does not grow with the recording.
+        """
+        with self._lock:
+            return {
+                "lines": self.view.lines(-max_lines if max_lines else 0),
+                "num_turns": self.view.num_turns,
+                "language": self.language,
+                "recorded_seconds": self._received / SAMPLE_RATE,
+                "committed_seconds": self._committed / SAMPLE_RATE,
+                "busy": self._busy,
+                "error": self.error,
+            }
+
+    # --- Processing ---
+
+    def _pending_audio(self) -> np.ndarray:
+        """Audio received after the last commit as one array. Caller holds `_lock`."""
+        if len(self._pending) != 1:
+            self._pending = [np.concatenate(self._pending) if self._pending else np.zeros(0, dtype=np.float32)]
+        return self._pending[0]
+
+    def _next_cut(self) -> Optional[int]:
+        """Sample index up to which the pending audio can be committed now, or None. Caller holds `_lock`."""
+        total = self._received
+        if self._boundary > self._committed:
+            return self._boundary
+        pending = total - self._committed
+        if pending < LIVE_MIN_WINDOW_SECONDS * SAMPLE_RATE:
+            return None
+
+        window = self._pending_audio()
+        window_seconds = len(window) / SAMPLE_RATE
+        regions = vad.detect_speech(window, SAMPLE_RATE)
+        if not regions:
+            return total - int(LIVE_COMMIT_MARGIN_SECONDS * SAMPLE_RATE)  # Only silence so far
+
+        # Candidate cuts: the middle of every pause that lies entirely before the commit margin,
+        # plus trailing silence if the last speech ended before the margin
+        limit = window_seconds - LIVE_COMMIT_MARGIN_SECONDS
+        cuts = [
+            (end + next_start) / 2
+            for (_, end), (next_start, _) in zip(regions, regions[1:])
+            if next_start <= limit
+        ]
+        if regions[-1][1] <= limit:
+            cuts.append(min((regions[-1][1] + window_seconds) / 2, limit))
+        if cuts:
+            return self._committed + int(max(cuts) * SAMPLE_RATE)
+
+        if window_seconds >= LIVE_MAX_PENDING_SECONDS:
+            # No pause at all: cut at the quietest frame in the older half of the window
+            energy = vad.frame_energy_db(window[:len(window) // 2], SAMPLE_RATE)
+            return self._committed + int(np.argmin(energy) * vad.FRAME_SECONDS * SAMPLE_RATE)
+        return None
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._lock:
+                cut = self._next_cut()
+                while cut is None or cut <= self._committed:
+                    if self._cancelled or (self._finishing and self._committed >= self._received):
+                        return
+                    self._wakeup.wait()
+                    cut = self._next_cut()
+                if self._cancelled:
+                    return
+                start = self._committed
+                window = self._pending_audio()[:cut - start]
+                self._busy = True
+            try:
+                aligned, segments = self._process_window(window, start / SAMPLE_RATE)
+            except Exception as e:
+                with self._lock:
+                    self.error = f"Live processing failed: {e}"
+                    self._busy = False
+                print(self.error)
+                return
+            with self._lock:
+                self._windows.append(aligned)
+                self.view.extend(aligned)
+                self.speaker_segments.extend(segments)
+                # Copy, so the committed audio before the cut can be freed
+                self._pending = [self._pending_audio()[cut - self._committed:].copy()]
+                self._committed = cut
+                self._busy = False
+
+    def _process_window(self, window: np.ndarray, offset: float):
+        """Transcribes, diarizes and aligns one committed window; returns (aligned, segments) on the global timeline."""
+        duration = len(window) / SAMPLE_RATE
+        if not vad.detect_speech(window, SAMPLE_RATE):
+            print(f"Live: {duration:.1f}s without speech at {offset:.1f}s, skipped.")
+            return Transcript.from_words([]), []
+
+        # Single-chunk transcription borrows a free model instance, so sessions do not share decoder state
+        # The model slots are shared with app sessions and queued jobs (see `engine.model_slot`)
+        with engine.slot_for(self.model):
+            transcription = engine.transcribe_chunked(
+                self.model, window, [(0.0, duration)], num_workers=1, language=self.language
+            )
+        self.language = transcription["language"]
+
+        with engine.slot_for(self.pipeline):
+            segments, embeddings = engine.diarize_waveform(self.pipeline, window, max_speakers=self.num_speakers)
+        durations: Dict[str, float] = {}
+        for segment in segments:
+            durations[segment["speaker"]] = durations.get(segment["speaker"], 0.0) + segment["end"] - segment["start"]
+        labels = self.registry.match(embeddings, durations)
+        for segment in segments:
+            segment["speaker"] = labels.get(segment["speaker"], segment["speaker"])
+
+        aligned = engine.align_words(transcription, segments, strategy=self.strategy).shifted(offset)
+        for segment in segments:
+            segment["start"] += offset
+            segment["end"] += offset
+        print(f"Live: committed {duration:.1f}s at {offset:.1f}s ({len(aligned)} words).")
+        return aligned, segments
@@ -0,0 +1,510 @@
+"""Streamlit-free summarization engine.
+
+Token-aware chunking, pooled OpenAI-compatible clients, parallel map and tree
+reduce. Used by the Streamlit app (via `src.summarization`) and the batch CLI.
+Progress and problems are reported through callbacks instead of `st.*` calls.
+"""
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, Optional, Tuple
+
+from src import profiling
+from src.cache import make_cache_key, cache_get, cache_put
+
+# openai, httpx, langchain and tiktoken are imported on first use: together they take
+# over a second to import, which would otherwise delay the app's first page render
+if TYPE_CHECKING:
+    import tiktoken
+    from openai import OpenAI
+
+# --- Constants ---
+LMSTUDIO_DEFAULT_URL = "http://localhost:1234/v1"
+# Model name might be ignored by LM Studio if only one model loaded, use a placeholder
+DEFAULT_LOCAL_MODEL = "gemma-3-4b-it"#"deepseek-r1-distill-qwen-7b"
+DEFAULT_PROMPTS_PATH = Path(__file__).parent.parent / "config" / "prompts.yaml"
+# Concurrent chunk requests; local servers (LM Studio, llama.cpp, vLLM) batch these
+DEFAULT_MAX_CONCURRENCY = 4
+# HTTP client settings; local models can take minutes on a long chunk
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "300"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_MAX_CONNECTIONS = 16
+SYSTEM_PROMPT = "Du bist ein hilfreicher Assistent, der auf das Zusammenfassen von Inhalten spezialisiert ist."
+
+# --- Token Budget ---
+# Local models use their own tokenizers; cl100k_base is a close enough estimate for budgeting
+TOKEN_ENCODING = "cl100k_base"
+CHARS_PER_TOKEN = 4  # Fallback estimate if the encoding cannot be loaded (e.g. offline)
+DEFAULT_CONTEXT_WINDOW = 8192
+DEFAULT_MAX_OUTPUT_TOKENS = 1024  # Room left in the context for the model's answer
+DEFAULT_CHUNK_SIZE_TOKENS = 1000
+DEFAULT_CHUNK_OVERLAP_TOKENS = 40
+MESSAGE_OVERHEAD_TOKENS = 16  # Chat template tokens around the system and user messages
+# Tree reduce: at most this many summaries are combined per call, for at most this many levels
+DEFAULT_REDUCE_FAN_IN = 8
+DEFAULT_REDUCE_MAX_DEPTH = 4
+SUMMARY_SEPARATOR = "\n\n"
+
+# Timing of recent LLM calls (latency, time to first token, tokens/second), newest last
+LLM_CALL_METRICS: Deque[Dict] = deque(maxlen=1000)
+
+# report(level, message) with level in "info", "success", "warning", "error"
+Reporter = Callable[[str, str], None]
+# on_progress(completed, total, label)
+ProgressCallback = Callable[[int, int, str], None]
+
+
+def print_report(level: str, message: str) -> None:
+    """Default reporter: logs to stdout."""
+    print(f"[{level.upper()}] {message}")
+
+
+# --- Prompts ---
+
+def read_prompts(path: Path = DEFAULT_PROMPTS_PATH) -> Dict[str, str]:
+    """Reads prompt templates from the YAML file; raises if it is missing, invalid or empty."""
+    import yaml
+    with open(path, 'r', encoding='utf-8') as f:
+        prompts = yaml.safe_load(f)
+    if prompts is None:
+        raise ValueError(f"Prompts file at {path} is empty.")
+    return prompts
+
+
+# --- Token Counting and Chunking ---
+
+@functools.lru_cache(maxsize=1)
+def get_token_encoder() -> Optional["tiktoken.Encoding"]:
+    """Loads the tiktoken encoding once; returns None if it is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        # tiktoken downloads encodings on first use, which fails on offline machines
+        print(f"Could not load tiktoken encoding '{TOKEN_ENCODING}', estimating tokens from characters: {e}")
+        return None
+
+def count_tokens(text: str) -> int:
+    """Counts the tokens in `text`."""
+    encoder = get_token_encoder()
+    if encoder is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoder.encode(text, disallowed_special=()))
+
+def max_chunk_tokens(
+    prompt_template: str,
+    context_window: int = DEFAULT_CONTEXT_WINDOW,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+) -> int:
+    """Tokens available for the text inserted into `prompt_template` without overflowing the context."""
+    prompt_tokens = count_tokens(SYSTEM_PROMPT) + count_tokens(prompt_template.replace("{input_text}", ""))
+    return context_window - prompt_tokens - MESSAGE_OVERHEAD_TOKENS - max_output_tokens
+
+@profiling.profiled("text_chunking")
+def split_text_into_chunks(
+    text: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    prompt_template: str,
+    context_window: int = DEFAULT_CONTEXT_WINDOW,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+) -> List[str]:
+    """Splits text into chunks of at most `chunk_size` tokens.
+
+    `chunk_size` is capped at what fits into the context window next to the prompt,
+    so no request overflows the model's context.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    budget = max_chunk_tokens(prompt_template, context_window, max_output_tokens)
+    if budget <= 0:
+        raise ValueError(f"The prompt alone needs more than the context window of {context_window} tokens.")
+    effective_chunk_size = min(chunk_size, budget)
+    if effective_chunk_size < chunk_size:
+        print(f"Chunk size capped from {chunk_size} to {effective_chunk_size} tokens to fit the context window.")
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=effective_chunk_size,
+        chunk_overlap=min(chunk_overlap, effective_chunk_size // 2),
+        length_function=count_tokens,
+        is_separator_regex=False,
+    )
+    return text_splitter.split_text(text)
+
+
+# --- Shared LLM Clients ---
+
+_llm_clients: Dict[Tuple[str, float, int], "OpenAI"] = {}
+_llm_clients_lock = threading.Lock()
+
+def get_llm_client(
+    base_url: str,
+    timeout: float = LLM_REQUEST_TIMEOUT,
+    max_retries: int = LLM_MAX_RETRIES
+) -> "OpenAI":
+    """Returns the shared OpenAI client for `base_url`, creating it on first use.
+
+    Clients keep their HTTP connections alive between calls and are safe to use from
+    several threads. Connection errors, timeouts, 429 and 5xx responses are retried by
+    the OpenAI library with exponential backoff, up to `max_retries` times.
+    """
+    import httpx
+    # Use the OpenAI library pointed at the local server
+    from openai import OpenAI
+    key = (base_url.rstrip('/'), timeout, max_retries)
+    with _llm_clients_lock:
+        client = _llm_clients.get(key)
+        if client is None:
+            http_client = httpx.Client(
+                timeout=httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS
+                )
+            )
+            # Use a dummy API key as required by the library, LM Studio ignores it
+            client = OpenAI(
+                base_url=key[0],
+                api_key="lm-studio",
+                timeout=httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT),
+                max_retries=max_retries,
+                http_client=http_client
+            )
+            _llm_clients[key] = client
+        return client
+
+def describe_llm_error(error: Exception, base_url: str) -> str:
+    """Turns an exception from an LLM call into a message for the user."""
+    from openai import APIConnectionError, RateLimitError
+    if isinstance(error, APIConnectionError):
+        return (f"LM Studio Connection Error (after {LLM_MAX_RETRIES} retries): {error}. "
+                f"Is LM Studio running and the server started at {base_url}?")
+    if isinstance(error, RateLimitError):
+        return f"LM Studio Rate Limit Error (after {LLM_MAX_RETRIES} retries): {error}" # Unlikely for local, but possible
+    return f"Error during local LLM call: {error}"
+
+
+# --- LLM Call Metrics ---
+
+def record_llm_call_metrics(
+    model_name: str,
+    start_time: float,
+    first_token_time: Optional[float],
+    end_time: float,
+    completion_tokens: int,
+    streamed: bool
+) -> Dict:
+    """Appends the timing of one LLM call to `LLM_CALL_METRICS` and returns it."""
+    latency = end_time - start_time
+    # Without streaming the first token only becomes visible with the full response
+    time_to_first_token = (first_token_time or end_time) - start_time
+    generation_time = end_time - (first_token_time or start_time)
+    metrics = {
+        "model": model_name,
+        "streamed": streamed,
+        "latency_s": round(latency, 3),
+        "time_to_first_token_s": round(time_to_first_token, 3),
+        "completion_tokens": completion_tokens,
+        "tokens_per_second": round(completion_tokens / generation_time, 2) if generation_time > 0 else None,
+    }
+    LLM_CALL_METRICS.append(metrics)
+    print(f"LLM call: {metrics['latency_s']}s, first token after {metrics['time_to_first_token_s']}s, "
+          f"{metrics['completion_tokens']} tokens at {metrics['tokens_per_second']} tok/s")
+    return metrics
+
+
+# --- Single LLM Call ---
+
+@profiling.profiled("llm_call")
+def complete_summary(
+    base_url: str,
+    text_to_summarize: str,
+    prompt_template: str,
+    model_name: str = DEFAULT_LOCAL_MODEL,
+    temperature: float = 0,
+    use_cache: bool = True,
+    on_token: Optional[Callable[[str], None]] = None,
+    call_metrics: Optional[List[Dict]] = None
+) -> str:
+    """Summarizes one text with the local LLM server; raises on failure.
+
+    Responses are memoized on disk by text, prompt template, model name and temperature,
+    so changing settings or prompts only sends the combinations not seen before.
+    If `on_token` is given, the response is streamed and `on_token` receives each text
+    delta as it arrives. Timing of every call is appended to `LLM_CALL_METRICS` and, for
+    the caller's own run, to `call_metrics`; a cached response records none.
+    """
+    cache_key = None
+    if use_cache:
+        cache_key = make_cache_key(text_to_summarize, prompt_template, SYSTEM_PROMPT, model_name, temperature)
+        cached_summary = cache_get("summaries", cache_key)
+        if cached_summary is not None:
+            profiling.annotate(cached=True)
+            return cached_summary
+
+    # Shared client pointed at the local server (pooled connections, retries)
+    client = get_llm_client(base_url)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt_template.format(input_text=text_to_summarize)}
+    ]
+    start_time = time.perf_counter()
+    first_token_time = None
+    completion_tokens = None
+    if on_token:
+        parts = []
+        stream = client.chat.completions.create(
+            model=model_name, # Model served by LM Studio
+            messages=messages,
+            temperature=temperature, # Lower temperature for factual summary
+            stream=True,
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                parts.append(delta)
+                on_token(delta)
+        summary = "".join(parts).strip()
+    else:
+        completion = client.chat.completions.create(
+            model=model_name, # Model served by LM Studio
+            messages=messages,
+            temperature=temperature, # Lower temperature for factual summary
+        )
+        summary = completion.choices[0].message.content.strip()
+        if completion.usage:
+            completion_tokens = completion.usage.completion_tokens
+    end_time = time.perf_counter()
+
+    metrics = record_llm_call_metrics(
+        model_name, start_time, first_token_time, end_time,
+        completion_tokens if completion_tokens is not None else count_tokens(summary),
+        streamed=bool(on_token)
+    )
+    if call_metrics is not None:
+        call_metrics.append(metrics)
+    profiling.annotate(tokens=metrics["completion_tokens"], time_to_first_token_s=metrics["time_to_first_token_s"])
+    if cache_key and summary:
+        cache_put("summaries", cache_key, summary)
+    return summary
+
+
+# --- Map and Reduce ---
+
+def summarize_texts_parallel(
+    texts: List[str],
+    prompt_template: str,
+    base_url: str,
+    model_name: str,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    progress_label: str = "chunks",
+    report: Reporter = print_report,
+    on_progress: Optional[ProgressCallback] = None,
+    call_metrics: Optional[List[Dict]] = None
+) -> List[Optional[str]]:
+    """Summarizes `texts` concurrently; the result list keeps their order (None where a call failed).
+
+    `report` and `on_progress` are only called from the calling thread.
+    """
+    results: List[Optional[str]] = [None] * len(texts)
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="transcibio-llm") as executor:
+        futures = {
+            executor.submit(
+                profiling.in_current_context(complete_summary), base_url, text, prompt_template, model_name,
+                call_metrics=call_metrics
+            ): i
+            for i, text in enumerate(texts)
+        }
+        for completed, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                results[i] = future.result() or None
+            except Exception as e:
+                report("warning", f"Could not summarize {progress_label} {i+1}/{len(texts)}: {describe_llm_error(e, base_url)}")
+            if on_progress:
+                on_progress(completed, len(texts), progress_label)
+    return results
+
+def split_oversized_summaries(
+    summaries: List[str],
+    token_budget: int,
+    combine_prompt_template: str,
+    context_window: int = DEFAULT_CONTEXT_WINDOW
+) -> List[str]:
+    """Splits every summary that would not fit into a combine request on its own, keeping the order."""
+    piece_size = token_budget - count_tokens(SUMMARY_SEPARATOR)
+    pieces: List[str] = []
+    for summary in summaries:
+        if count_tokens(summary) <= piece_size:
+            pieces.append(summary)
+        else:
+            pieces.extend(split_text_into_chunks(summary, piece_size, 0, combine_prompt_template, context_window))
+    return pieces
+
+def group_summaries(summaries: List[str], token_budget: int, max_fan_in: int) -> List[List[str]]:
+    """Packs consecutive summaries into groups that fit `token_budget` and hold at most `max_fan_in` items."""
+    separator_tokens = count_tokens(SUMMARY_SEPARATOR)
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for summary in summaries:
+        summary_tokens = count_tokens(summary) + separator_tokens
+        if current and (current_tokens + summary_tokens > token_budget or len(current) >= max_fan_in):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += summary_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+@profiling.profiled("summary_reduce")
+def reduce_summaries(
+    summaries: List[str],
+    base_url: str,
+    model_name: str,
+    combine_prompt_template: str,
+    context_window: int = DEFAULT_CONTEXT_WINDOW,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_fan_in: int = DEFAULT_REDUCE_FAN_IN,
+    max_depth: int = DEFAULT_REDUCE_MAX_DEPTH,
+    on_token: Optional[Callable[[str], None]] = None,
+    report: Reporter = print_report,
+    on_progress: Optional[ProgressCallback] = None,
+    call_metrics: Optional[List[Dict]] = None
+) -> Tuple[str, bool]:
+    """Combines summaries level by level until one remains (tree reduce).
+
+    Each level splits summaries too long for one request, packs them into groups
+    that fit the context window and combines the groups in parallel. A group whose call fails is carried up as its
+    joined text. The final single-group call is streamed to `on_token`, if given.
+
+    Returns:
+        Tuple of (final text, whether it was reduced to a single summary)
+    """
+    token_budget = max_chunk_tokens(combine_prompt_template, context_window)
+    max_fan_in = max(2, max_fan_in)
+    failed = 0
+    for level in range(1, max_depth + 1):
+        if len(summaries) <= 1:
+            break
+        # A summary larger than the budget (e.g. a failed call's joined text) would overflow the context
+        pieces = split_oversized_summaries(summaries, token_budget, combine_prompt_template, context_window)
+        split = len(pieces) > len(summaries)
+        summaries = pieces
+        groups = group_summaries(summaries, token_budget, max_fan_in)
+        if len(groups) == len(summaries) and not split:
+            report("warning", "Summaries are too long to combine within the context window.")
+            break
+
+        report("info", f"Reduce level {level}: combining {len(summaries)} summaries in {len(groups)} group(s)...")
+        group_texts = [SUMMARY_SEPARATOR.join(group) for group in groups]
+        if len(groups) == 1 and on_token:
+            try:
+                combined = [complete_summary(
+                    base_url, group_texts[0], combine_prompt_template, model_name, on_token=on_token,
+                    call_metrics=call_metrics
+                )]
+            except Exception as e:
+                report("warning", describe_llm_error(e, base_url))
+                combined = [None]
+        else:
+            combined = summarize_texts_parallel(
+                group_texts, combine_prompt_template, base_url, model_name,
+                max_concurrency=max_concurrency, progress_label="groups",
+                report=report, on_progress=on_progress, call_metrics=call_metrics
+            )
+        failed = sum(1 for summary in combined if not summary)
+        if failed:
+            report("warning", f"Could not combine {failed}/{len(groups)} group(s) at reduce level {level}.")
+        summaries = [summary or text for summary, text in zip(combined, group_texts)]
+        if failed == len(groups):
+            break
+
+    # A failed last level leaves joined text rather than a real combined summary
+    return SUMMARY_SEPARATOR.join(summaries), len(summaries) == 1 and not failed
+
+def summarize_map_reduce(
+    full_text: str,
+    prompt_template: str,
+    combine_prompt_template: str,
+    base_url: str,
+    model_name: str = DEFAULT_LOCAL_MODEL,
+    chunk_size: int = DEFAULT_CHUNK_SIZE_TOKENS,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP_TOKENS,
+    combine_summaries: bool = True,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    context_window: int = DEFAULT_CONTEXT_WINDOW,
+    reduce_fan_in: int = DEFAULT_REDUCE_FAN_IN,
+    reduce_max_depth: int = DEFAULT_REDUCE_MAX_DEPTH,
+    on_token: Optional[Callable[[str], None]] = None,
+    report: Reporter = print_report,
+    on_progress: Optional[ProgressCallback] = None,
+    call_metrics: Optional[List[Dict]] = None
+) -> Optional[str]:
+    """Summarizes text with a parallel map phase and a tree reduce.
+
+    `chunk_size` and `chunk_overlap` are in tokens; chunks are capped so each request
+    fits into `context_window` together with the prompt. Map summaries keep the order
+    of their chunks. `on_token` receives the streamed final combine step. If given,
+    `call_metrics` collects the timing of every LLM call of this run (not of cached ones).
+    """
+    # 1. Split the text into token-sized chunks
+    try:
+        chunks = split_text_into_chunks(full_text, chunk_size, chunk_overlap, prompt_template, context_window)
+    except ValueError as e:
+        report("error", f"Cannot summarize: {e}")
+        return None
+
+    if not chunks:
+        report("warning", "Text could not be split into chunks.")
+        return None
+
+    report("info", f"Text split into {len(chunks)} chunks for summarization.")
+
+    # 2. Map: Summarize chunks concurrently
+    with profiling.stage("summary_map", chunks=len(chunks)):
+        results = summarize_texts_parallel(
+            chunks, prompt_template, base_url, model_name,
+            max_concurrency=max_concurrency, report=report, on_progress=on_progress,
+            call_metrics=call_metrics
+        )
+    chunk_summaries = [summary for summary in results if summary]
+
+    if not chunk_summaries:
+        report("error", "Failed to generate summaries for any chunk.")
+        return None
+
+    report("info", f"Generated {len(chunk_summaries)} chunk summaries.")
+
+    # 3. Reduce: Combine chunk summaries and summarize again if needed
+    if len(chunk_summaries) == 1 or not combine_summaries:
+        if len(chunk_summaries) == 1:
+            report("success", "Generated final summary from single chunk.")
+        else:
+            report("success", "Returning individual chunk summaries as requested.")
+        return SUMMARY_SEPARATOR.join(chunk_summaries)
+
+    report("info", "Combining chunk summaries into a final summary...")
+    final_summary, fully_reduced = reduce_summaries(
+        chunk_summaries, base_url, model_name, combine_prompt_template,
+        context_window=context_window,
+        max_concurrency=max_concurrency,
+        max_fan_in=reduce_fan_in,
+        max_depth=reduce_max_depth,
+        on_token=on_token,
+        report=report,
+        on_progress=on_progress,
+        call_metrics=call_metrics
+    )
+    if fully_reduced:
+        report("success", "Generated final combined summary.")
+    else:
+        report("error", "Failed to generate the final combined summary. Returning partially combined summaries instead.")
+    return final_summary
@@ -1,68 +1,121 @@
-import whisper
-import torch
-from pyannote.audio import Pipeline
-import pandas as pd
 import os
-from typing import List, Dict, Optional
-import streamlit as st # Import Streamlit for caching
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
+import streamlit as st # Import Streamlit for spinners and error display
+from src import engine, jobs, live, profiling
+from src.engine import (
+    SUPPORTED_WHISPER_MODELS,
+    DEFAULT_WHISPER_MODEL,
+    WHISPER_PRECISIONS,
+    DEFAULT_WHISPER_PRECISION,
+    DEFAULT_PYANNOTE_PIPELINE,
+    SAMPLE_RATE,
+    SUPPORTED_AUDIO_FORMATS,
+    UNKNOWN_SPEAKER,
+    ALIGNMENT_STRATEGIES,
+    ALIGNMENT_FALLBACKS,
+    CHUNK_SPLIT_MODES,
+    DEFAULT_MAX_CHUNK_SECONDS,
+    DEFAULT_DIARIZATION_WINDOW_SECONDS,
+    start_prewarm,
+    SpeakerIndex,
+    build_speaker_index,
+    assign_speakers,
+    split_thread_budget,
+)
+from src.transcript import Transcript
+from src.utils import run_in_script_context
 
-# --- Constants ---
-SUPPORTED_WHISPER_MODELS = ["tiny", "base", "small", "medium", "large"]
-DEFAULT_WHISPER_MODEL = "tiny"
-DEFAULT_PYANNOTE_PIPELINE = "pyannote/speaker-diarization-3.1"
+if TYPE_CHECKING:  # Imported on first use by src.engine, see there
+    import whisper
+    from pyannote.audio import Pipeline
 
-# --- Device Selection ---
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"Processing device: {DEVICE}") # Log device choice
+# Streamlit-facing wrappers around `src.engine`: same pipeline, but errors and
+# progress are shown in the app instead of being raised.
 
 # --- Model Loading (Cached) ---
 
-@st.cache_resource(show_spinner="Loading Diarization Pipeline...")
 def load_diarization_pipeline(pipeline_name: str = DEFAULT_PYANNOTE_PIPELINE, auth_token: Optional[str] = None):
     """Loads the Pyannote diarization pipeline."""
-    print(f"Loading Pyannote pipeline: {pipeline_name}")
     try:
-        pipeline = Pipeline.from_pretrained(pipeline_name, use_auth_token=auth_token)
-        pipeline.to(torch.device(DEVICE))
-        print("Pyannote pipeline loaded successfully.")
-        return pipeline
+        with st.spinner("Loading Diarization Pipeline..."):
+            return engine.load_diarization_pipeline(pipeline_name, auth_token)
     except Exception as e:
         st.error(f"Error loading diarization pipeline '{pipeline_name}': {e}\n"
                  "Please ensure you have accepted user conditions on Hugging Face Hub "
                  "and provided a valid Hugging Face token (HF_TOKEN) in secrets or .env.")
         return None
 
-@st.cache_resource(show_spinner="Loading Transcription Model...")
-def load_transcription_model(model_name: str = DEFAULT_WHISPER_MODEL):
-    """Loads the Whisper transcription model."""
-    print(f"Loading Whisper model: {model_name}")
+def load_transcription_model(model_name: str = DEFAULT_WHISPER_MODEL, precision: str = "fp32"):
+    """Loads the Whisper transcription model, optionally int8-quantized for CPU."""
     try:
-        model = whisper.load_model(model_name, device=DEVICE)
-        print("Whisper model loaded successfully.")
-        return model
+        with st.spinner("Loading Transcription Model..."):
+            return engine.load_transcription_model(model_name, precision)
     except Exception as e:
         st.error(f"Error loading Whisper model '{model_name}': {e}")
         return None
 
+# --- Audio Decoding ---
+
+def decode_audio(audio_path: str) -> Optional[np.ndarray]:
+    """Decodes any ffmpeg-readable file once to 16 kHz mono float32.
+
+    The returned array can be passed as `waveform` to both `perform_diarization`
+    and `transcribe_audio`, so the file is not decoded twice.
+    """
+    try:
+        with st.spinner("Decoding audio..."):
+            return engine.decode_audio(audio_path)
+    except Exception as e:
+        st.error(f"Error decoding audio file: {e}")
+        return None
+
 # --- Core Processing Functions ---
 
-@st.cache_data(show_spinner="Performing Speaker Diarization...")
-def perform_diarization(_pipeline: Pipeline, audio_path: str, num_speakers: Optional[int] = None):
-    """Performs speaker diarization on the audio file."""
-    print(f"Starting diarization for: {audio_path}")
+def perform_diarization(
+    _pipeline: "Pipeline",
+    audio_path: str,
+    num_speakers: Optional[int] = None,
+    pipeline_name: str = DEFAULT_PYANNOTE_PIPELINE,
+    use_cache: bool = True,
+    waveform: Optional[np.ndarray] = None,
+    skip_silence: bool = False,
+    diarization_window: Optional[float] = None,
+    speech_regions: Optional[List[Tuple[float, float]]] = None
+):
+    """Performs speaker diarization on the audio file.
+
+    Results are cached on disk by audio content, pipeline name and `num_speakers`,
+    so re-processing the same recording skips pyannote entirely. If `waveform`
+    (from `decode_audio`) is given, pyannote uses it instead of reading the file.
+    With `skip_silence`, only detected speech is diarized (see `engine.speech_only_audio`);
+    pass `speech_regions` when they were already detected on `waveform`.
+    With `diarization_window`, long recordings are diarized window by window with a progress bar.
+    The pipeline's model slot is held meanwhile, shared with queued jobs (see `engine.model_slot`).
+    """
     if not _pipeline:
         st.error("Diarization pipeline not loaded. Cannot perform diarization.")
         return []
     try:
-        diarization = _pipeline(audio_path, num_speakers=num_speakers)
-        speaker_segments = []
-        for turn, _, speaker in diarization.itertracks(yield_label=True):
-            speaker_segments.append({
-                "start": turn.start,
-                "end": turn.end,
-                "speaker": speaker
-            })
-        print(f"Diarization complete. Found {len(speaker_segments)} speaker turns.")
+        with st.spinner("Performing Speaker Diarization..."):
+            progress_bar = st.progress(0.0, text="Diarizing...") if diarization_window else None
+
+            def report_progress(done_seconds: float, total_seconds: float) -> None:
+                progress_bar.progress(
+                    min(done_seconds / total_seconds, 1.0),
+                    text=f"Diarized {done_seconds / 60:.0f} of {total_seconds / 60:.0f} min"
+                )
+
+            with engine.slot_for(_pipeline):
+                speaker_segments = engine.diarize(
+                    _pipeline, audio_path, num_speakers,
+                    pipeline_name=pipeline_name, use_cache=use_cache, waveform=waveform, skip_silence=skip_silence,
+                    diarization_window=diarization_window, progress=report_progress if progress_bar else None,
+                    speech_regions=speech_regions
+                )
+            if progress_bar is not None:
+                progress_bar.empty()
         if not speaker_segments:
              st.warning("No speaker segments found by pyannote. Alignment might be inaccurate.")
         return speaker_segments
@@ -70,22 +123,203 @@ def perform_diarization(_pipeline: Pipeline, audio_path: str, num_speakers: Opti
         st.error(f"Error during diarization: {e}")
         return []
 
-@st.cache_data(show_spinner="Transcribing Audio...")
-def transcribe_audio(_model: whisper.Whisper, audio_path: str):
-    """Transcribes the audio file using Whisper with word timestamps."""
-    print(f"Starting transcription for: {audio_path}")
+def transcribe_audio(
+    _model: "whisper.Whisper",
+    audio_path: str,
+    model_name: Optional[str] = None,
+    use_cache: bool = True,
+    waveform: Optional[np.ndarray] = None,
+    chunked: bool = False,
+    chunk_split: str = "silence",
+    max_chunk_seconds: float = DEFAULT_MAX_CHUNK_SECONDS,
+    speaker_segments: Optional[List[Dict]] = None,
+    skip_silence: bool = False,
+    speech_regions: Optional[List[Tuple[float, float]]] = None
+):
+    """Transcribes the audio file using Whisper with word timestamps.
+
+    When `model_name` is given, results are cached on disk by audio content and model name.
+    If `waveform` (from `decode_audio`) is given, Whisper uses it instead of running ffmpeg again.
+    With `chunked`, pauses split the audio into chunks that are transcribed in parallel;
+    with `skip_silence`, Whisper only sees detected speech (see `engine.transcribe`), using
+    `speech_regions` when they were already detected on `waveform`.
+    The model's slot is held meanwhile, shared with queued jobs (see `engine.model_slot`).
+    """
     if not _model:
         st.error("Transcription model not loaded. Cannot perform transcription.")
         return None
     try:
-        options = whisper.DecodingOptions(fp16 = (DEVICE == "cuda")) # fp16 only works on CUDA
-        result = _model.transcribe(audio_path, word_timestamps=True, **vars(options))
-        print("Transcription complete.")
-        return result
+        with st.spinner("Transcribing Audio..."), engine.slot_for(_model):
+            return engine.transcribe(
+                _model, audio_path, model_name=model_name, use_cache=use_cache, waveform=waveform,
+                chunked=chunked, chunk_split=chunk_split, max_chunk_seconds=max_chunk_seconds,
+                speaker_segments=speaker_segments, skip_silence=skip_silence, speech_regions=speech_regions
+            )
     except Exception as e:
         st.error(f"Error during transcription: {e}")
         return None
 
+# --- Concurrent Stage Execution ---
+
+def run_diarization_and_transcription(
+    pipeline: "Pipeline",
+    model: "whisper.Whisper",
+    audio_path: str,
+    num_speakers: Optional[int] = None,
+    model_name: Optional[str] = None,
+    pipeline_name: str = DEFAULT_PYANNOTE_PIPELINE,
+    parallel: bool = True,
+    diarization_threads: Optional[int] = None,
+    transcription_threads: Optional[int] = None,
+    chunked: bool = False,
+    chunk_split: str = "silence",
+    max_chunk_seconds: float = DEFAULT_MAX_CHUNK_SECONDS,
+    skip_silence: bool = False,
+    diarization_window: Optional[float] = None
+) -> Tuple[List[Dict], Optional[Dict]]:
+    """Runs diarization and transcription, concurrently by default.
+
+    Neither stage needs the other's output before alignment, so with `parallel=True` both
+    run on a two-worker thread pool (torch releases the GIL during inference) and the wall
+    time is roughly that of the slower stage.
+
+    The file is decoded once and the waveform shared by both models, unless both
+    results are already cached.
+
+    With `chunked`, the transcription itself is split into chunks that run in parallel.
+    Chunks cut at speaker turns (`chunk_split="speakers"`) need the diarization first,
+    so the two stages then run one after the other. With `skip_silence`, both models
+    only see detected speech; timestamps stay on the original timeline.
+    `diarization_window` selects windowed diarization (see `engine.diarize`).
+
+    Returns:
+        Tuple of (speaker_segments, transcription_result)
+    """
+    chunking = (chunk_split, max_chunk_seconds) if chunked else None
+    waveform = None
+    if engine.needs_decoding(
+        audio_path, model_name, pipeline_name, num_speakers, chunking, skip_silence, engine.model_precision(model),
+        diarization_window
+    ):
+        waveform = decode_audio(audio_path)
+    # Detected once and shared, so both stages cut the same speech out of the recording
+    speech_regions = engine.detect_speech_regions(waveform) if skip_silence and waveform is not None else None
+    transcription_options = {
+        "model_name": model_name,
+        "waveform": waveform,
+        "chunked": chunked,
+        "chunk_split": chunk_split,
+        "max_chunk_seconds": max_chunk_seconds,
+        "skip_silence": skip_silence,
+        "speech_regions": speech_regions,
+    }
+
+    if not parallel or (chunked and chunk_split == "speakers"):
+        speaker_segments = perform_diarization(
+            pipeline, audio_path, num_speakers, pipeline_name=pipeline_name, waveform=waveform,
+            skip_silence=skip_silence, diarization_window=diarization_window, speech_regions=speech_regions
+        )
+        transcription_result = transcribe_audio(
+            model, audio_path, speaker_segments=speaker_segments, **transcription_options
+        )
+        return speaker_segments, transcription_result
+
+    default_diarization_threads, default_transcription_threads = split_thread_budget()
+    diarization_threads = diarization_threads or default_diarization_threads
+    transcription_threads = transcription_threads or default_transcription_threads
+    print(f"Running diarization ({diarization_threads} threads) and transcription "
+          f"({transcription_threads} threads) concurrently.")
+
+    # Both workers report to this session's page and record their stages under the caller's profile run
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="transcibio-stage") as executor:
+        diarization_future = executor.submit(
+            profiling.in_current_context(run_in_script_context(engine.run_with_thread_budget)), diarization_threads,
+            perform_diarization, pipeline, audio_path, num_speakers,
+            pipeline_name=pipeline_name, waveform=waveform, skip_silence=skip_silence,
+            diarization_window=diarization_window, speech_regions=speech_regions
+        )
+        transcription_future = executor.submit(
+            profiling.in_current_context(run_in_script_context(engine.run_with_thread_budget)), transcription_threads,
+            transcribe_audio, model, audio_path, **transcription_options
+        )
+        speaker_segments = diarization_future.result()
+        transcription_result = transcription_future.result()
+
+    return speaker_segments, transcription_result
+
+# --- Background Jobs ---
+
+def submit_processing_job(
+    audio_path: str,
+    model_name: str,
+    pipeline_name: str = DEFAULT_PYANNOTE_PIPELINE,
+    num_speakers: Optional[int] = None,
+    strategy: str = "midpoint",
+    auth_token: Optional[str] = None,
+    chunked: bool = False,
+    chunk_split: str = "silence",
+    max_chunk_seconds: float = DEFAULT_MAX_CHUNK_SECONDS,
+    skip_silence: bool = False,
+    precision: str = "fp32",
+    diarization_window: Optional[float] = None
+) -> Optional[str]:
+    """Moves `audio_path` into the job store and queues it; returns the job id.
+
+    See `src.jobs` for admission control and per-model concurrency.
+    """
+    stored_path = None
+    try:
+        stored_path = jobs.store_file(audio_path)
+        params = {
+            "model_name": model_name,
+            "precision": precision,
+            "pipeline_name": pipeline_name,
+            "num_speakers": num_speakers,
+            "strategy": strategy,
+            "chunked": chunked,
+            "chunk_split": chunk_split,
+            "max_chunk_seconds": max_chunk_seconds,
+            "skip_silence": skip_silence,
+            "diarization_window": diarization_window,
+        }
+        return jobs.get_job_queue().submit(stored_path, params, auth_token=auth_token)
+    except jobs.QueueFullError as e:
+        st.warning(str(e))
+    except Exception as e:
+        st.error(f"Could not queue processing job: {e}")
+    if stored_path:
+        try: os.remove(stored_path)
+        except OSError: pass
+    return None
+
+def get_processing_job(job_id: str) -> Optional[Dict]:
+    """Returns the job's current state, see `jobs.JobQueue.get`."""
+    return jobs.get_job_queue().get(job_id)
+
+# --- Live Transcription ---
+
+def start_live_session(
+    model: "whisper.Whisper",
+    pipeline: "Pipeline",
+    num_speakers: Optional[int] = None,
+    strategy: str = "midpoint"
+) -> Optional[live.LiveSession]:
+    """Starts incremental processing for a recording, see `src.live`."""
+    try:
+        return live.LiveSession(model, pipeline, num_speakers=num_speakers, strategy=strategy)
+    except Exception as e:
+        st.error(f"Could not start live transcription: {e}")
+        return None
+
+def finish_live_session(session: live.LiveSession) -> Optional[Dict]:
+    """Processes the rest of the recording; returns the session result or None on error."""
+    try:
+        with st.spinner("Transcribing the rest of the recording..."):
+            return session.finish()
+    except Exception as e:
+        st.error(f"An error occurred during live Transcription/Diarization: {e}")
+        return None
+
 # --- Alignment Function ---
 
 def get_speaker_for_timestamp(timestamp: float, segments: List[Dict]) -> str:
@@ -93,53 +327,25 @@ def get_speaker_for_timestamp(timestamp: float, segments: List[Dict]) -> str:
     for segment in segments:
         if segment["start"] <= timestamp < segment["end"]:
             return segment["speaker"]
-    # Basic fallback: Assign to nearest segment if no direct overlap?
-    # For simplicity now, return UNKNOWN
-    return "UNKNOWN_SPEAKER"
+    return UNKNOWN_SPEAKER
 
 def align_transcription_with_diarization(
     transcription_result: Optional[Dict],
-    speaker_segments: List[Dict]
-) -> List[Dict]:
-    """Aligns Whisper word timestamps with Pyannote speaker segments."""
-    aligned_transcript = []
+    speaker_segments: List[Dict],
+    strategy: str = "midpoint",
+    fallback: str = "nearest"
+) -> Transcript:
+    """Aligns Whisper word timestamps with Pyannote speaker segments.
+
+    See `engine.align_words` for the interval-index lookup, `strategy` and `fallback`.
+    """
     if not transcription_result or 'segments' not in transcription_result:
         st.warning("Transcription result is missing or invalid. Cannot perform alignment.")
-        return []
+        return Transcript.from_words([])
     if not speaker_segments:
         st.warning("No speaker segments available. Assigning all words to UNKNOWN_SPEAKER.")
-        # Assign all words to UNKNOWN if no diarization
-        for segment in transcription_result.get('segments', []):
-            for word_info in segment.get('words', []):
-                 aligned_transcript.append({
-                        "start": word_info.get('start', 0),
-                        "end": word_info.get('end', 0),
-                        "word": word_info.get('word', ""),
-                        "speaker": "UNKNOWN_SPEAKER"
-                    })
-        return aligned_transcript
-
 
     print("Aligning transcription with speaker segments...")
-    for segment in transcription_result.get('segments', []):
-        for word_info in segment.get('words', []):
-            word_start = word_info.get('start', None)
-            word_end = word_info.get('end', None)
-            word_text = word_info.get('word', "")
-
-            if word_start is None or word_end is None:
-                speaker_label = "UNKNOWN_SPEAKER" # Cannot align without timestamp
-            else:
-                # Use the middle of the word time to find the speaker
-                word_mid_time = word_start + (word_end - word_start) / 2
-                speaker_label = get_speaker_for_timestamp(word_mid_time, speaker_segments)
-            # Aligned transcript on word level
-            aligned_transcript.append({
-                "start": word_start,
-                "end": word_end,
-                "word": word_text,
-                "speaker": speaker_label
-            })
-
+    aligned_transcript = engine.align_words(transcription_result, speaker_segments, strategy, fallback)
     print("Alignment complete.")
-    return aligned_transcript
\ No newline at end of file
+    return aligned_transcript
@@ -0,0 +1,224 @@
+"""Per-stage timing and resource measurements.
+
+Wrap a piece of work in `stage("name")` (or decorate a function with
+`profiled("name")`) to record its wall time, process CPU time and peak
+resident memory. Code inside a stage can `annotate` it with the amount of
+audio or the number of tokens it handled, from which the real-time factor
+(wall time / audio duration, lower is faster) and tokens per second are derived.
+
+Stages opened inside `profile_run` are collected on the run, so the app, the
+job queue and the CLI can show or store the breakdown of one request. If
+`TRANSCIBIO_PROFILE_LOG` names a file, every stage is also appended to it as
+JSONL for comparing runs over time; the file is not rotated, so this is off by
+default. Thread pools do not inherit the caller's run and stage; submit work
+through `in_current_context` so nested stages are attributed correctly.
+"""
+import contextvars
+import functools
+import json
+import os
+import platform
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+import psutil
+
+# --- Constants ---
+PROFILING_ENABLED = os.getenv("TRANSCIBIO_PROFILING", "1") != "0"
+# One JSON object per line, e.g. .profiles/stages.jsonl; unset or empty keeps measurements in memory only
+PROFILE_LOG_PATH = os.getenv("TRANSCIBIO_PROFILE_LOG", "")
+MEMORY_SAMPLE_SECONDS = 0.05  # Peak RSS is sampled this often while a stage is open
+
+# Recent stage records from all runs, newest last
+STAGE_METRICS: Deque[Dict] = deque(maxlen=1000)
+
+_current_run: contextvars.ContextVar[Optional["ProfileRun"]] = contextvars.ContextVar("transcibio_run", default=None)
+_current_stage: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("transcibio_stage", default=None)
+_log_lock = threading.Lock()
+_process = psutil.Process()
+
+
+# --- System Information ---
+
+@functools.lru_cache(maxsize=1)
+def system_info() -> Dict:
+    """Hardware and software the measurements were taken on, logged with every run."""
+    try:
+        import GPUtil  # Slow to import; only needed once per process
+        gpus = [{"name": gpu.name, "memory_mb": gpu.memoryTotal} for gpu in GPUtil.getGPUs()]
+    except Exception:
+        gpus = []  # No NVIDIA driver / nvidia-smi
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": psutil.cpu_count(logical=True),
+        "memory_mb": round(psutil.virtual_memory().total / 2**20),
+        "gpus": gpus,
+    }
+
+
+# --- Peak Memory Sampling ---
+
+_open_stages: Dict[int, Dict] = {}
+_sampler_lock = threading.Lock()
+_sampler_thread: Optional[threading.Thread] = None
+
+def _sample_memory() -> None:
+    """Raises the peak RSS of every open stage to the current RSS, until the process exits."""
+    while True:
+        time.sleep(MEMORY_SAMPLE_SECONDS)
+        with _sampler_lock:
+            if not _open_stages:
+                continue
+            rss = _process.memory_info().rss
+            for record in _open_stages.values():
+                record["_peak_rss"] = max(record["_peak_rss"], rss)
+
+def _track_stage(record: Dict) -> None:
+    global _sampler_thread
+    with _sampler_lock:
+        _open_stages[id(record)] = record
+        if _sampler_thread is None:
+            _sampler_thread = threading.Thread(target=_sample_memory, name="transcibio-memory", daemon=True)
+            _sampler_thread.start()
+
+def _untrack_stage(record: Dict) -> None:
+    with _sampler_lock:
+        _open_stages.pop(id(record), None)
+
+
+# --- Runs and Stages ---
+
+class ProfileRun:
+    """Stages recorded for one request (a processed file, a summary, a job)."""
+
+    def __init__(self, label: str):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.records: List[Dict] = []  # Finished stages in completion order; list.append is thread-safe
+
+@contextmanager
+def profile_run(label: str) -> Iterator[ProfileRun]:
+    """Collects all stages opened in this context (and in pools via `in_current_context`) on one run."""
+    run = ProfileRun(label)
+    token = _current_run.set(run)
+    start_time = time.time()
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+        if PROFILING_ENABLED and PROFILE_LOG_PATH:  # The run record only goes to the log file
+            _write_log({
+                "type": "run", "run_id": run.run_id, "run": label, "started_at": round(start_time, 3),
+                "wall_s": round(time.time() - start_time, 3), "stages": len(run.records), "system": system_info(),
+            })
+
+@contextmanager
+def stage(name: str, **attributes) -> Iterator[Dict]:
+    """Measures the enclosed work as one stage; yields its record for further attributes.
+
+    `cpu_s` is the CPU time of the whole process while the stage was open, so it
+    includes stages running concurrently; `cpu_s / wall_s` above 1 means several
+    cores were busy.
+    """
+    if not PROFILING_ENABLED:
+        yield dict(attributes)
+        return
+    parent = _current_stage.get()
+    run = _current_run.get()
+    record: Dict = {
+        "type": "stage",
+        "run_id": run.run_id if run else None,
+        "run": run.label if run else None,
+        "stage": name,
+        "parent": parent["stage"] if parent else None,
+        **attributes,
+    }
+    rss_before = _process.memory_info().rss
+    record["_peak_rss"] = rss_before
+    _track_stage(record)
+    token = _current_stage.set(record)
+    started_at = time.time()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        wall_s = time.perf_counter() - wall_start
+        cpu_s = time.process_time() - cpu_start
+        _current_stage.reset(token)
+        _untrack_stage(record)
+        peak_rss = max(record.pop("_peak_rss"), _process.memory_info().rss)
+        record.update({
+            "started_at": round(started_at, 3),
+            "wall_s": round(wall_s, 4),
+            "cpu_s": round(cpu_s, 4),
+            "peak_rss_mb": round(peak_rss / 2**20, 1),
+            "rss_delta_mb": round((peak_rss - rss_before) / 2**20, 1),
+        })
+        if record.get("audio_seconds"):
+            record["rtf"] = round(wall_s / record["audio_seconds"], 4)
+        if record.get("tokens") is not None and wall_s > 0:
+            record["tokens_per_second"] = round(record["tokens"] / wall_s, 2)
+        if run:
+            run.records.append(record)
+        STAGE_METRICS.append(record)
+        _write_log(record)
+
+def profiled(name: str) -> Callable:
+    """Decorator form of `stage`: every call of the function is one stage."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def annotate(**attributes) -> None:
+    """Adds attributes to the innermost open stage, e.g. `audio_seconds`, `tokens` or `cached`."""
+    record = _current_stage.get()
+    if record is not None:
+        record.update(attributes)
+
+def in_current_context(func: Callable) -> Callable:
+    """Wraps `func` to run in a copy of the caller's context, so pool threads see its run and stage."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # One context cannot be entered by two threads at once, so every call gets its own copy
+        return context.copy().run(func, *args, **kwargs)
+
+    return wrapper
+
+
+# --- Log ---
+
+def _write_log(record: Dict) -> None:
+    if not PROFILE_LOG_PATH:
+        return
+    try:
+        line = json.dumps(record, default=str)
+        with _log_lock:
+            Path(PROFILE_LOG_PATH).parent.mkdir(parents=True, exist_ok=True)
+            with open(PROFILE_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        print(f"Could not write profile log: {e}")
+
+def summarize_stages(records: List[Dict]) -> List[Dict]:
+    """Flat table rows for display: one per stage, in start order, with the main measurements."""
+    columns = ["stage", "parent", "wall_s", "cpu_s", "peak_rss_mb", "rtf", "tokens_per_second", "cached"]
+    return [
+        {column: record.get(column) for column in columns}
+        for record in sorted(records, key=lambda record: record.get("started_at", 0))
+    ]
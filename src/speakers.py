@@ -0,0 +1,100 @@
+"""Consistent speaker labels across separately diarized pieces of a recording.
+
+pyannote labels speakers per call (SPEAKER_00, SPEAKER_01, ...), so the same
+person can get different labels in two pieces. `SpeakerRegistry` keeps one
+embedding centroid per global speaker and maps each piece's local labels onto
+them by cosine similarity, adding a new global speaker when nobody matches
+(unless the number of speakers is capped and reached, see `max_speakers`).
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# --- Constants ---
+# Minimum cosine similarity between a local speaker and a global centroid to count as the same person.
+# pyannote 3.1 clusters at a cosine distance of ~0.70, i.e. similarity ~0.30; slightly stricter here
+# because piece-level centroids come from less speech than whole-recording ones.
+SPEAKER_MATCH_THRESHOLD = 0.35
+UNMATCHED_SPEAKER = "UNKNOWN_SPEAKER"  # Same label as engine.UNKNOWN_SPEAKER
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class SpeakerRegistry:
+    """Global speaker centroids, updated as pieces are diarized."""
+
+    def __init__(self, threshold: float = SPEAKER_MATCH_THRESHOLD, max_speakers: Optional[int] = None):
+        self.threshold = threshold
+        self.max_speakers = max_speakers  # Once reached, unmatched speakers join the closest centroid
+        self.labels: List[str] = []
+        self._centroids: List[np.ndarray] = []
+        self._weights: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def match(self, embeddings: Dict[str, np.ndarray], durations: Dict[str, float]) -> Dict[str, str]:
+        """Maps a piece's local speaker labels to global labels and updates the centroids.
+
+        Args:
+            embeddings: Local label -> speaker embedding (from `engine.diarize_waveform`)
+            durations: Local label -> seconds of speech in the piece, used to weight centroid updates
+
+        Returns:
+            Local label -> global label. Two local speakers never map to the same global one,
+            since pyannote already separated them within the piece, unless `max_speakers`
+            global speakers exist already; further speakers then join the closest one.
+        """
+        mapping: Dict[str, str] = {}
+        local_labels = [label for label, emb in embeddings.items() if emb is not None and np.all(np.isfinite(emb))]
+        if self._centroids and local_labels:
+            local = np.stack([_normalize(embeddings[label]) for label in local_labels])
+            centroids = np.stack([_normalize(centroid) for centroid in self._centroids])
+            similarity = local @ centroids.T
+            # Greedy one-to-one assignment, most similar pairs first
+            for flat_index in np.argsort(-similarity, axis=None):
+                i, j = np.unravel_index(flat_index, similarity.shape)
+                label, global_label = local_labels[i], self.labels[j]
+                if label in mapping or global_label in mapping.values():
+                    continue
+                if similarity[i, j] < self.threshold and not self._at_capacity():
+                    break  # Remaining pairs are even less similar
+                mapping[label] = global_label
+                self._update(j, embeddings[label], durations.get(label, 1.0))
+
+        for label in embeddings:
+            if label in mapping:
+                continue
+            if label in local_labels and self._at_capacity():
+                mapping[label] = self._join_closest(embeddings[label], durations.get(label, 1.0))
+            elif label in local_labels:
+                mapping[label] = self._add(embeddings[label], durations.get(label, 1.0))
+            else:
+                # Too little speech for an embedding: cannot tell who it is
+                mapping[label] = UNMATCHED_SPEAKER
+        return mapping
+
+    def _at_capacity(self) -> bool:
+        return self.max_speakers is not None and len(self.labels) >= self.max_speakers
+
+    def _join_closest(self, embedding: np.ndarray, weight: float) -> str:
+        centroids = np.stack([_normalize(centroid) for centroid in self._centroids])
+        index = int(np.argmax(centroids @ _normalize(embedding)))
+        self._update(index, embedding, weight)
+        return self.labels[index]
+
+    def _add(self, embedding: np.ndarray, weight: float) -> str:
+        label = f"SPEAKER_{len(self.labels):02d}"
+        self.labels.append(label)
+        self._centroids.append(np.asarray(embedding, dtype=np.float64))
+        self._weights.append(weight)
+        return label
+
+    def _update(self, index: int, embedding: np.ndarray, weight: float) -> None:
+        total = self._weights[index] + weight
+        if total > 0:
+            self._centroids[index] = (self._centroids[index] * self._weights[index] + embedding * weight) / total
+        self._weights[index] = total
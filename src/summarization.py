@@ -1,18 +1,24 @@
 import streamlit as st
-# Use the OpenAI library pointed at the local server
-from openai import OpenAI, APIConnectionError, RateLimitError # Import specific errors
-from typing import List, Dict, Optional
-import os
+import functools
+import time
+from typing import Callable, List, Dict, Optional
 import yaml
 from pathlib import Path
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
+from src import llm
+from src.llm import (
+    DEFAULT_LOCAL_MODEL,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_CONTEXT_WINDOW,
+    DEFAULT_REDUCE_FAN_IN,
+    DEFAULT_REDUCE_MAX_DEPTH,
+    read_prompts,
+)
+
+# Streamlit-facing layer over `src.llm`: prompt loading and editing, and
+# summarization with progress, messages and streaming rendered in the app.
 
 # --- Constants ---
-LMSTUDIO_DEFAULT_URL = "http://localhost:1234/v1"
-# Model name might be ignored by LM Studio if only one model loaded, use a placeholder
-# Or allow user to specify which loaded model to use via app UI later if needed
-DEFAULT_LOCAL_MODEL = "gemma-3-4b-it"#"deepseek-r1-distill-qwen-7b"
+STREAM_RENDER_INTERVAL = 0.05  # Seconds between UI updates while streaming
 
 # --- Load Prompts from External YAML File ---
 def load_prompts(config_path: str = "config/prompts.yaml") -> Dict[str, str]:
@@ -21,23 +27,28 @@ def load_prompts(config_path: str = "config/prompts.yaml") -> Dict[str, str]:
     full_path = project_root / config_path
     
     try:
-        with open(full_path, 'r', encoding='utf-8') as f:
-            prompts = yaml.safe_load(f)
-            if prompts is None:
-                raise ValueError(f"Prompts file at {full_path} is empty.")
-            return prompts
+        return read_prompts(full_path)
     except (FileNotFoundError, yaml.YAMLError, ValueError) as e:
         # Critical error - cannot proceed without prompts
         st.error(f"CRITICAL: Cannot load prompts from {full_path}: {e}")
         st.error("Please ensure config/prompts.yaml exists and is properly formatted.")
         st.stop()  # Stop Streamlit execution
 
-# Load prompts at module level
-PROMPTS = load_prompts()
-DEFAULT_SUMMARY_PROMPT_TEMPLATE = PROMPTS.get("DEFAULT_SUMMARY_PROMPT_TEMPLATE", "Fasse den folgenden Text zusammen:\n\n{input_text}")
-PROTOCOL_PROMPT_TEMPLATE = PROMPTS.get("PROTOCOL_PROMPT_TEMPLATE", "Fasse den folgenden Text im Stil eines Protokolls zusammen:\n\n{input_text}")
-ORDER_PROMPT_TEMPLATE = PROMPTS.get("ORDER_PROMPT_TEMPLATE", "Fasse den folgenden Text als Auftragserstellung zusammen:\n\n{input_text}")
-DEFAULT_COMBINE_PROMPT_TEMPLATE = PROMPTS.get("DEFAULT_COMBINE_PROMPT_TEMPLATE", "Fasse die folgenden Zusammenfassungen zusammen:\n\n{input_text}")
+# Used when config/prompts.yaml lacks a template
+PROMPT_FALLBACKS = {
+    "DEFAULT_SUMMARY_PROMPT_TEMPLATE": "Fasse den folgenden Text zusammen:\n\n{input_text}",
+    "PROTOCOL_PROMPT_TEMPLATE": "Fasse den folgenden Text im Stil eines Protokolls zusammen:\n\n{input_text}",
+    "ORDER_PROMPT_TEMPLATE": "Fasse den folgenden Text als Auftragserstellung zusammen:\n\n{input_text}",
+    "DEFAULT_COMBINE_PROMPT_TEMPLATE": "Fasse die folgenden Zusammenfassungen zusammen:\n\n{input_text}",
+}
+
+@functools.lru_cache(maxsize=1)
+def _cached_prompts() -> Dict[str, str]:
+    return load_prompts()
+
+def get_prompt_template(name: str) -> str:
+    """Prompt template by key; the YAML file is read on first use, not when the app starts."""
+    return _cached_prompts().get(name, PROMPT_FALLBACKS[name])
 
 
 # --- UI Component for Prompt Customization ---
@@ -53,12 +64,12 @@ def render_prompt_editor(summary_type: str = "default") -> str:
     """
     # Map summary type to default prompts
     prompt_defaults = {
-        "default": DEFAULT_SUMMARY_PROMPT_TEMPLATE,
-        "protocol": PROTOCOL_PROMPT_TEMPLATE,
-        "order": ORDER_PROMPT_TEMPLATE
+        "default": "DEFAULT_SUMMARY_PROMPT_TEMPLATE",
+        "protocol": "PROTOCOL_PROMPT_TEMPLATE",
+        "order": "ORDER_PROMPT_TEMPLATE"
     }
     
-    default_prompt = prompt_defaults.get(summary_type, DEFAULT_SUMMARY_PROMPT_TEMPLATE)
+    default_prompt = get_prompt_template(prompt_defaults.get(summary_type, "DEFAULT_SUMMARY_PROMPT_TEMPLATE"))
     
     with st.expander("⚙️ Customize Prompt (Advanced)", expanded=False):
         st.info("💡 You can customize the prompt below. Use `{input_text}` as a placeholder for the text to be summarized.")
@@ -99,54 +110,71 @@ def render_prompt_editor(summary_type: str = "default") -> str:
             return default_prompt
 
 
+# --- Streamlit Adapters ---
+
+def report_to_streamlit(level: str, message: str) -> None:
+    """Shows an engine message as st.info/st.success/st.warning/st.error."""
+    getattr(st, level, st.info)(message)
+
+def make_progress_callback() -> Callable[[int, int, str], None]:
+    """Returns an `on_progress` callback that shows one progress bar per phase."""
+    bars = {}
+
+    def on_progress(completed: int, total: int, label: str) -> None:
+        if label not in bars:
+            bars[label] = st.progress(0, text=f"Summarizing {label} via local LLM...")
+        bars[label].progress(completed / total, text=f"Summarized {completed}/{total} {label}...")
+        if completed == total:
+            bars.pop(label).empty() # Remove progress bar once the phase is done
+
+    return on_progress
+
+def make_stream_renderer(placeholder) -> Callable[[str], None]:
+    """Returns an `on_token` callback that renders the growing response into a Streamlit placeholder."""
+    parts: List[str] = []
+    last_render = [0.0]
+
+    def on_token(delta: str) -> None:
+        parts.append(delta)
+        now = time.perf_counter()
+        if now - last_render[0] >= STREAM_RENDER_INTERVAL:  # Throttle reruns of the markdown element
+            placeholder.markdown("".join(parts) + " ▌")
+            last_render[0] = now
+
+    return on_token
+
+
 # --- API Call Function for Local LLM (using OpenAI library) ---
 
 def call_local_llm_summarize(
     base_url: str,
     text_to_summarize: str,
     prompt_template: str,
-    model_name: str = DEFAULT_LOCAL_MODEL
+    model_name: str = DEFAULT_LOCAL_MODEL,
+    temperature: float = 0,
+    use_cache: bool = True,
+    on_token: Optional[Callable[[str], None]] = None
 ) -> Optional[str]:
-    """Calls the local LLM server (like LM Studio) for summarization using the OpenAI library."""
+    """Calls the local LLM server (like LM Studio) for summarization using the OpenAI library.
+
+    See `llm.complete_summary` for caching, streaming and metrics.
+    """
     if not base_url:
         st.error("LM Studio API URL is missing.")
         return None
 
     try:
-        # Point OpenAI client to the local server
-        # Use a dummy API key as required by the library, LM Studio ignores it
-        client = OpenAI(base_url=base_url.rstrip('/'), api_key="lm-studio")
-
-        prompt = prompt_template.format(input_text=text_to_summarize)
-
-        completion = client.chat.completions.create(
-            model=model_name, # Model served by LM Studio
-            messages=[
-                
-                {"role": "system", "content": "Du bist ein hilfreicher Assistent, der auf das Zusammenfassen von Inhalten spezialisiert ist."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0, # Lower temperature for factual summary
-            
+        return llm.complete_summary(
+            base_url, text_to_summarize, prompt_template, model_name,
+            temperature=temperature, use_cache=use_cache, on_token=on_token
         )
-        summary = completion.choices[0].message.content.strip()
-        return summary
-
-    except APIConnectionError as e:
-        st.error(f"LM Studio Connection Error: {e}. Is LM Studio running and the server started at {base_url}?")
-        return None
-    except RateLimitError as e:
-         st.error(f"LM Studio Rate Limit Error: {e}") # Unlikely for local, but possible
-         return None
     except Exception as e:
-        # Catch other potential errors from the OpenAI client or LM Studio response
-        st.error(f"Error during local LLM call: {e}")
+        st.error(llm.describe_llm_error(e, base_url))
         return None
 
 
 # --- Main Map-Reduce Summarization Logic ---
 
-@st.cache_data(show_spinner="Generating summary with local LLM...")
 def summarize_text_map_reduce(
     full_text: str,
     chunk_size: int,
@@ -154,77 +182,49 @@ def summarize_text_map_reduce(
     SUMMARY_PROMPT_TEMPLATE: str,
     base_url: Optional[str] = None,
     model_name: Optional[str] = None,
-    combine_summaries: bool = True  # Add this parameter
+    combine_summaries: bool = True,  # Add this parameter
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    context_window: int = DEFAULT_CONTEXT_WINDOW,
+    reduce_fan_in: int = DEFAULT_REDUCE_FAN_IN,
+    reduce_max_depth: int = DEFAULT_REDUCE_MAX_DEPTH,
+    stream_output: bool = False,
+    call_metrics: Optional[List[Dict]] = None
 ) -> Optional[str]:
-    """Summarizes text using Map-Reduce strategy with the configured local LLM."""
+    """Summarizes text using Map-Reduce strategy with the configured local LLM.
+
+    `chunk_size` and `chunk_overlap` are in tokens; chunks are capped so each request
+    fits into `context_window` together with the prompt. The map phase sends up to
+    `max_concurrency` chunk requests at once; summaries keep the order of their chunks
+    regardless of completion order. The reduce phase is a tree reduce, see `llm.reduce_summaries`.
+    Each LLM call is memoized on disk, so re-running with other settings only
+    sends the chunks and combine steps that changed. With `stream_output`, the final
+    combine step is rendered token by token while it is generated. `call_metrics`
+    collects the timing of this run's LLM calls, see `llm.summarize_map_reduce`.
+    """
 
     if not base_url:
          st.error("Cannot summarize: LM Studio API URL is not configured.")
          return None
 
-    model_to_use = model_name or DEFAULT_LOCAL_MODEL
-
-    # 1. Split the text into chunks
-    # (Keep Langchain splitting logic as before)
-    text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            is_separator_regex=False,
-        )
-    chunks = text_splitter.split_text(full_text)
-
-
-    if not chunks:
-        st.warning("Text could not be split into chunks.")
-        return None
-
-    st.info(f"Text split into {len(chunks)} chunks for summarization.")
-
-    # 2. Map: Summarize each chunk individually
-    chunk_summaries = []
-    progress_bar = st.progress(0, text="Summarizing chunks via local LLM...")
-    for i, chunk in enumerate(chunks):
-        summary = call_local_llm_summarize(
-            base_url, chunk, SUMMARY_PROMPT_TEMPLATE, model_to_use
-        )
-
-        if summary:
-            chunk_summaries.append(summary)
-        else:
-            st.warning(f"Could not summarize chunk {i+1}/{len(chunks)}.")
-            # Option: stop? For now, we continue and try to summarize the rest.
-
-        # Update progress bar
-        progress = (i + 1) / len(chunks)
-        progress_bar.progress(progress, text=f"Summarizing chunk {i+1}/{len(chunks)}...")
-
-    progress_bar.empty() # Remove progress bar after loop
-
-    if not chunk_summaries:
-        st.error("Failed to generate summaries for any chunk.")
-        return None
-
-    st.info(f"Generated {len(chunk_summaries)} chunk summaries.")
-
-    # 3. Reduce: Combine chunk summaries and summarize again if needed
-    combined_summaries = "\n\n".join(chunk_summaries)
-
-    if len(chunk_summaries) == 1 or not combine_summaries:  # Check if user wants to skip combining
-        if len(chunk_summaries) == 1:
-            st.success("Generated final summary from single chunk.")
-        else:
-            st.success("Returning individual chunk summaries as requested.")
-        return combined_summaries
-    else:
-        st.info("Combining chunk summaries into a final summary...")
-        final_summary = call_local_llm_summarize(
-            base_url, combined_summaries, DEFAULT_COMBINE_PROMPT_TEMPLATE, model_to_use
-        )
-
-        if final_summary:
-             st.success("Generated final combined summary.")
-             return final_summary
-        else:
-             st.error("Failed to generate the final combined summary. Returning combined chunk summaries instead.")
-             return combined_summaries  # Fallback
\ No newline at end of file
+    stream_placeholder = st.empty() if stream_output else None
+    summary = llm.summarize_map_reduce(
+        full_text,
+        prompt_template=SUMMARY_PROMPT_TEMPLATE,
+        combine_prompt_template=get_prompt_template("DEFAULT_COMBINE_PROMPT_TEMPLATE"),
+        base_url=base_url,
+        model_name=model_name or DEFAULT_LOCAL_MODEL,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        combine_summaries=combine_summaries,
+        max_concurrency=max_concurrency,
+        context_window=context_window,
+        reduce_fan_in=reduce_fan_in,
+        reduce_max_depth=reduce_max_depth,
+        on_token=make_stream_renderer(stream_placeholder) if stream_placeholder else None,
+        report=report_to_streamlit,
+        on_progress=make_progress_callback(),
+        call_metrics=call_metrics
+    )
+    if stream_placeholder:
+        stream_placeholder.empty() # The caller renders the final text
+    return summary
@@ -0,0 +1,285 @@
+"""Compact, array-backed word-level transcript.
+
+`Transcript` stores the aligned words of a recording column by column: start
+and end times as float arrays (NaN where Whisper gave no timestamp), speakers
+as integer codes into a small label table, and all words as one string with
+offsets. A multi-hour transcript then takes a few megabytes instead of one
+dict per word, and speaker turns and the plain text are computed with NumPy
+once and memoized, since the transcript never changes after alignment.
+
+For existing callers it is a read-only sequence of the familiar word dicts
+(start, end, word, speaker), created on access. `to_dicts` gives the plain
+list for JSON output.
+
+`TranscriptBuilder` keeps the display lines and plain text of a transcript
+that is still growing (live transcription) and only groups the new words.
+"""
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+# --- Constants ---
+UNKNOWN_SPEAKER = "UNKNOWN_SPEAKER"
+
+
+class TranscriptTurns(NamedTuple):
+    """Consecutive words of one speaker, merged; one entry per non-empty turn."""
+    starts: np.ndarray   # First word's start (previous known end if missing)
+    ends: np.ndarray     # Last known word end up to the turn's last word, NaN if none yet
+    speakers: List[str]
+    texts: List[str]     # Joined words, stripped
+
+
+def _optional_time(value: float) -> Optional[float]:
+    return None if value != value else value  # NaN -> None
+
+
+class Transcript(Sequence[Dict]):
+    """Aligned words as columns; behaves like a read-only list of word dicts."""
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, codes: np.ndarray, speakers: List[str], text: str, offsets: np.ndarray):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.codes = np.asarray(codes, dtype=np.int32)  # Indices into `speakers`
+        self.speakers = list(speakers)
+        self.text = text                                # All words concatenated, as transcribed
+        self.offsets = np.asarray(offsets, dtype=np.int64)  # Word i is text[offsets[i]:offsets[i + 1]]
+        self._turns: Optional[TranscriptTurns] = None  # Memoized views, see `_build_views`
+        self._plain_text: Optional[str] = None
+
+    # --- Construction ---
+
+    @classmethod
+    def from_columns(cls, starts, ends, speaker_codes, speakers: List[str], words: List[str]) -> "Transcript":
+        """Builds a transcript from per-word times, speaker codes and word strings."""
+        offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum([len(word) for word in words], out=offsets[1:])
+        return cls(starts, ends, speaker_codes, speakers, "".join(words), offsets)
+
+    @classmethod
+    def from_words(cls, words: Union["Transcript", Iterable[Dict]]) -> "Transcript":
+        """Converts word dicts (e.g. loaded from JSON); a `Transcript` is returned unchanged."""
+        if isinstance(words, Transcript):
+            return words
+        words = list(words)
+        speaker_codes: Dict[str, int] = {}
+        codes = [speaker_codes.setdefault(w.get('speaker') or UNKNOWN_SPEAKER, len(speaker_codes)) for w in words]
+        return cls.from_columns(
+            np.array([w.get('start') for w in words], dtype=np.float64),  # None -> NaN
+            np.array([w.get('end') for w in words], dtype=np.float64),
+            np.array(codes, dtype=np.int32),
+            list(speaker_codes),
+            [w.get('word') or "" for w in words],
+        )
+
+    @classmethod
+    def concat(cls, transcripts: Sequence["Transcript"]) -> "Transcript":
+        """Joins transcripts in order; speaker labels with the same name share a code."""
+        speakers: List[str] = []
+        for transcript in transcripts:
+            speakers.extend(label for label in transcript.speakers if label not in speakers)
+        codes, offsets, base = [], [np.zeros(1, dtype=np.int64)], 0
+        for transcript in transcripts:
+            remap = np.array([speakers.index(label) for label in transcript.speakers] or [0], dtype=np.int32)
+            codes.append(remap[transcript.codes])
+            offsets.append(transcript.offsets[1:] + base)
+            base += len(transcript.text)
+        return cls(
+            np.concatenate([t.starts for t in transcripts] + [np.zeros(0)]),
+            np.concatenate([t.ends for t in transcripts] + [np.zeros(0)]),
+            np.concatenate(codes + [np.zeros(0, dtype=np.int32)]),
+            speakers,
+            "".join(t.text for t in transcripts),
+            np.concatenate(offsets),
+        )
+
+    def shifted(self, offset: float) -> "Transcript":
+        """Copy with all times moved by `offset` seconds (missing times stay missing)."""
+        return Transcript(self.starts + offset, self.ends + offset, self.codes, self.speakers, self.text, self.offsets)
+
+    # --- Sequence View ---
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def word(self, i: int) -> str:
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            indices = range(len(self))[i]
+            if indices.step != 1:
+                return Transcript.from_words(self[j] for j in indices)
+            first, last = indices.start, max(indices.start, indices.stop)
+            base = self.offsets[first]
+            return Transcript(
+                self.starts[first:last], self.ends[first:last], self.codes[first:last], self.speakers,
+                self.text[base:self.offsets[last]], self.offsets[first:last + 1] - base
+            )
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("transcript index out of range")
+        return {
+            "start": _optional_time(float(self.starts[i])),
+            "end": _optional_time(float(self.ends[i])),
+            "word": self.word(i),
+            "speaker": self.speakers[self.codes[i]],
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        offsets = self.offsets.tolist()
+        for i, (start, end, code) in enumerate(zip(self.starts.tolist(), self.ends.tolist(), self.codes.tolist())):
+            yield {
+                "start": _optional_time(start),
+                "end": _optional_time(end),
+                "word": self.text[offsets[i]:offsets[i + 1]],
+                "speaker": self.speakers[code],
+            }
+
+    def __repr__(self) -> str:
+        return f"Transcript({len(self)} words, {len(self.speakers)} speakers)"
+
+    def to_dicts(self) -> List[Dict]:
+        """Plain list of word dicts, e.g. for JSON output."""
+        return list(self)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns and the text buffer."""
+        return self.starts.nbytes + self.ends.nbytes + self.codes.nbytes + self.offsets.nbytes + len(self.text)
+
+    # --- Derived Views ---
+
+    def turns(self) -> TranscriptTurns:
+        """Merges consecutive words of the same speaker; a word without start time opens a new turn."""
+        if self._turns is None:
+            self._build_views()
+        return self._turns
+
+    def plain_text(self) -> str:
+        """All words stripped and joined with single spaces, as used for summarization."""
+        if self._plain_text is None:
+            self._build_views()
+        return self._plain_text
+
+    def stripped_words(self) -> List[str]:
+        """Every word without surrounding whitespace (empty for blank words)."""
+        offsets = self.offsets.tolist()
+        text = self.text
+        return [text[start:end].strip() for start, end in zip(offsets, offsets[1:])]
+
+    def _build_views(self) -> None:
+        """Fills turns and plain text in one traversal; both are needed by every view of a finished transcript."""
+        groups = self._group_words()
+        keep = np.array([bool(text) for text in groups.texts], dtype=bool)
+        self._turns = TranscriptTurns(
+            groups.starts[keep],
+            groups.ends[keep],
+            [self.speakers[code] for code in self.codes[groups.firsts[keep]].tolist()],
+            [text for text in groups.texts if text],
+        )
+        self._plain_text = " ".join(filter(None, self.stripped_words()))
+
+    def _group_words(self, previous_end: float = np.nan) -> "_WordGroups":
+        """Splits the words into speaker turns, including blank ones.
+
+        `previous_end` is the last known end time before the first word, so a
+        transcript continued from an earlier one (see `TranscriptBuilder`) gets
+        the same times as if both had been grouped together.
+        """
+        num_words = len(self)
+        if num_words == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return _WordGroups(empty, np.zeros(0), np.zeros(0), [], np.zeros(0))
+        missing_start = np.isnan(self.starts)
+        opens_turn = np.ones(num_words, dtype=bool)
+        opens_turn[1:] = (self.codes[1:] != self.codes[:-1]) | missing_start[1:]
+        firsts = np.flatnonzero(opens_turn)
+        lasts = np.append(firsts[1:] - 1, num_words - 1)
+
+        # Last known end time at every word (forward fill over missing ends)
+        known = np.where(np.isnan(self.ends), -1, np.arange(num_words))
+        np.maximum.accumulate(known, out=known)
+        last_end = np.where(known >= 0, self.ends[np.maximum(known, 0)], previous_end)
+        end_before = np.concatenate([[previous_end], last_end[:-1]])
+
+        starts = np.where(missing_start[firsts], np.nan_to_num(end_before[firsts], nan=0.0), self.starts[firsts])
+        offsets = self.offsets.tolist()
+        texts = [self.text[offsets[first]:offsets[last + 1]].strip() for first, last in zip(firsts.tolist(), lasts.tolist())]
+        return _WordGroups(firsts, starts, last_end[lasts], texts, end_before[firsts])
+
+
+class _WordGroups(NamedTuple):
+    firsts: np.ndarray      # Index of each turn's first word
+    starts: np.ndarray
+    ends: np.ndarray
+    texts: List[str]        # Stripped; empty for turns of blank words
+    end_before: np.ndarray  # Last known end before each turn's first word (NaN if none)
+
+
+def format_turn(start: float, end: float, speaker: str, text: str) -> str:
+    """One display line of a speaker turn; a missing end time shows as 0."""
+    return f"[{start:.2f}s - {0.0 if end != end else end:.2f}s] **{speaker}:** {text}"
+
+
+# --- Incremental Builder ---
+
+class TranscriptBuilder:
+    """Display lines and plain text of a transcript that grows at the end, e.g. during live transcription.
+
+    `extend` only groups the appended words together with the last, still open
+    turn, which they may continue. Closed turns are formatted once, so the cost
+    of an update does not grow with the length of the transcript.
+    """
+
+    def __init__(self):
+        self.num_words = 0
+        self._lines: List[str] = []     # Closed turns
+        self._open_line: Optional[str] = None
+        self._tail = Transcript.from_words([])  # Words of the open turn
+        self._tail_end_before = np.nan  # Last known end before the open turn
+        self._words: List[str] = []     # Non-empty stripped words of all turns
+        self._plain_text: Optional[str] = ""
+
+    def extend(self, words: Union[Transcript, Iterable[Dict]]) -> None:
+        """Appends words (a `Transcript` or word dicts) at the end of the transcript."""
+        words = Transcript.from_words(words)
+        if not len(words):
+            return
+        self.num_words += len(words)
+        self._words.extend(filter(None, words.stripped_words()))
+        self._plain_text = None
+
+        tail = Transcript.concat([self._tail, words])
+        groups = tail._group_words(self._tail_end_before)
+        lines = [
+            format_turn(start, end, tail.speakers[code], text)
+            for start, end, code, text in zip(
+                groups.starts.tolist(), groups.ends.tolist(), tail.codes[groups.firsts].tolist(), groups.texts
+            )
+            if text
+        ]
+        last_open = bool(groups.texts[-1])
+        self._open_line = lines.pop() if last_open else None
+        self._lines.extend(lines)
+        self._tail = tail[int(groups.firsts[-1]):]
+        self._tail_end_before = float(groups.end_before[-1])
+
+    @property
+    def num_turns(self) -> int:
+        return len(self._lines) + (self._open_line is not None)
+
+    def lines(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """Display lines of turns `start` to `stop` (exclusive, negative counts from the end)."""
+        indices = range(self.num_turns)[start:stop]
+        lines = self._lines[indices.start:min(indices.stop, len(self._lines))]
+        if self._open_line is not None and indices.stop > len(self._lines) and indices.start < indices.stop:
+            lines.append(self._open_line)
+        return lines
+
+    def plain_text(self) -> str:
+        """All words stripped and joined with single spaces, like `Transcript.plain_text`."""
+        if self._plain_text is None:
+            self._plain_text = " ".join(self._words)
+        return self._plain_text
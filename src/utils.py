@@ -1,89 +1,108 @@
 import streamlit as st
 import tempfile
 import os
-from typing import List, Dict, IO, Optional
+from typing import List, Dict, IO, Optional, Sequence
 import wave
-import psutil
-import GPUtil
-import torch
-import platform
+import numpy as np
 from datetime import datetime
+import functools
+import hashlib
+import threading
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-def format_aligned_transcript(aligned_data: List[Dict]) -> List[str]:
-    """Formats the aligned transcript data into readable strings."""
+from src.cache import HASH_CHUNK_SIZE, register_file_hash
+from src.transcript import Transcript, format_turn
+
+def format_aligned_transcript(aligned_data: Sequence[Dict]) -> List[str]:
+    """Formats the aligned transcript data into readable strings, one per speaker turn."""
     if not aligned_data:
         return ["No transcription data found or alignment failed."]
+    transcript = Transcript.from_words(aligned_data)
+    return format_transcript_turns(transcript, 0, len(transcript.turns().texts))
+
+
+def format_transcript_turns(transcript: Transcript, start: int, stop: int) -> List[str]:
+    """Formats speaker turns `start` to `stop` (exclusive), e.g. one page of the transcript viewer."""
+    turns = transcript.turns()
+    return [
+        format_turn(*turn) for turn in zip(
+            turns.starts[start:stop].tolist(), turns.ends[start:stop].tolist(),
+            turns.speakers[start:stop], turns.texts[start:stop]
+        )
+    ]
+
 
-    output_lines = []
-    current_speaker = None
-    current_segment_start = None
-    current_text = ""
-    last_end_time = 0.0
-
-    for i, word_data in enumerate(aligned_data):
-        speaker = word_data.get('speaker', "UNKNOWN")
-        word = word_data.get('word', "")
-        start_time = word_data.get('start', None)
-        end_time = word_data.get('end', None)
-
-        # Initialize on first word or if start_time is None
-        if current_speaker is None or start_time is None:
-            current_speaker = speaker
-            current_segment_start = start_time if start_time is not None else last_end_time
-            current_text = "" # Reset text
-
-        # If speaker changes, or if start_time is missing (treat as new segment)
-        if speaker != current_speaker or start_time is None:
-            if current_text.strip(): # Print previous segment if it had text
-                 segment_start_str = f"{current_segment_start:.2f}s" if current_segment_start is not None else "??"
-                 segment_end_str = f"{last_end_time:.2f}s" if last_end_time is not None else "??"
-                 output_lines.append(f"[{segment_start_str} - {segment_end_str}] **{current_speaker}:** {current_text.strip()}")
-
-            # Start new segment
-            current_speaker = speaker
-            current_segment_start = start_time if start_time is not None else last_end_time
-            current_text = word
-        else:
-            # Append word to current segment's text
-            current_text += word
-
-        # Update last known end time
-        if end_time is not None:
-            last_end_time = end_time
-
-        # Print the very last segment after the loop finishes
-        if i == len(aligned_data) - 1 and current_text.strip():
-            segment_start_str = f"{current_segment_start:.2f}s" if current_segment_start is not None else "??"
-            segment_end_str = f"{last_end_time:.2f}s" if last_end_time is not None else "??"
-            output_lines.append(f"[{segment_start_str} - {segment_end_str}] **{current_speaker}:** {current_text.strip()}")
-
-    return output_lines
+def find_turn_at(transcript: Transcript, seconds: float) -> int:
+    """Index of the speaker turn that is running (or last started) at `seconds`."""
+    return max(0, int(np.searchsorted(transcript.turns().starts, seconds, side="right")) - 1)
+
+
+def parse_timestamp(text: str) -> Optional[float]:
+    """Parses "ss", "mm:ss" or "hh:mm:ss" (seconds may have decimals); None if invalid."""
+    try:
+        parts = [float(part) for part in text.strip().split(":")]
+    except ValueError:
+        return None
+    if not 1 <= len(parts) <= 3 or any(part < 0 for part in parts):
+        return None
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
+
+
+def format_clock(seconds: float) -> str:
+    """h:mm:ss (or m:ss below an hour) for display."""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def save_stream_to_temp_file(stream: IO[bytes], suffix: str) -> str:
+    """Copies a binary stream to a temporary file in bounded chunks, hashing the content on the way.
+
+    The SHA-256 is registered with the cache, so the processing cache keys do not
+    read the file a second time. Returns the file path.
+    """
+    hasher = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        try:
+            for block in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+                hasher.update(block)
+                tmp_file.write(block)
+        except BaseException:
+            tmp_file.close()
+            os.remove(tmp_file.name)  # No half-written files left behind
+            raise
+    register_file_hash(tmp_file.name, hasher.hexdigest())
+    return tmp_file.name
 
 
 def save_uploaded_file(uploaded_file: IO[bytes]) -> str:
     """Saves uploaded file to a temporary path and returns the path."""
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            return tmp_file.name
+        uploaded_file.seek(0)  # Playback may have read it already
+        return save_stream_to_temp_file(uploaded_file, os.path.splitext(uploaded_file.name)[1])
     except Exception as e:
         st.error(f"Error saving uploaded file: {e}")
         return None
+
+
+def copy_audio_file(path: str) -> str:
+    """Copies an audio file (e.g. the recording export) to a new temporary file that can be handed off."""
+    try:
+        with open(path, "rb") as source:
+            return save_stream_to_temp_file(source, os.path.splitext(path)[1])
+    except Exception as e:
+        st.error(f"Error copying audio file: {e}")
+        return None
     
 
-def get_transcript_text(aligned_data: List[Dict]) -> str:
+def get_transcript_text(aligned_data: Sequence[Dict]) -> str:
     """Concatenates words from aligned data into a single string."""
-    full_text = ""
     if not aligned_data:
         return ""
-    # Simple concatenation with space - handles missing 'word' key or None values
-    words = [
-        item.get('word', '').strip()
-        for item in aligned_data
-        if item.get('word') # Only include if 'word' key exists and is not empty/None
-    ]
-    full_text = " ".join(words)
-    return full_text.strip() # Remove leading/trailing spaces
+    return Transcript.from_words(aligned_data).plain_text()
 
 
 
@@ -100,5 +119,22 @@ def save_recorded_audio_to_wav(audio_segment):
     except Exception as e:
         st.error(f"Error saving recorded audio: {e}")
         return None
-    
 
+
+def audio_segment_to_waveform(audio_segment) -> np.ndarray:
+    """Converts a recorded AudioSegment to the 16 kHz mono float32 array the models expect."""
+    audio_segment = audio_segment.set_frame_rate(16000).set_channels(1).set_sample_width(2)
+    return (np.frombuffer(audio_segment.raw_data, dtype=np.int16) / 32768.0).astype(np.float32)
+
+
+def run_in_script_context(func):
+    """Wraps `func` so Streamlit calls made from a worker thread reach the current session."""
+    ctx = get_script_run_ctx()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args, **kwargs)
+
+    return wrapper
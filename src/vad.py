@@ -0,0 +1,220 @@
+"""Energy-based voice activity detection, speech-only timelines and chunk planning.
+
+Used to keep silence away from the models: `build_speech_timeline` cuts a
+recording down to its speech regions, and `TimeMap` maps timestamps on that
+shortened timeline back to the original. `plan_chunks` splits long recordings
+into independent pieces that can be transcribed in parallel (see
+`engine.transcribe`). Cuts are placed in pauses, either found from the signal
+energy or from gaps between diarization turns, so no word is split. Only speech
+that runs longer than a chunk without any pause has to be cut inside; it is cut
+at its quietest moment near the limit.
+"""
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# --- Constants ---
+FRAME_SECONDS = 0.03           # Analysis frame length
+SPEECH_MARGIN_DB = 12.0        # Frames this far above the noise floor count as speech
+SILENCE_FLOOR_DB = -60.0       # Frames at or below this level are never speech
+MIN_SILENCE_SECONDS = 0.5      # Shorter pauses are treated as part of the speech around them
+MIN_SPEECH_SECONDS = 0.25      # Shorter bursts (clicks, breaths) are ignored
+SPEECH_PADDING_SECONDS = 0.2   # Kept around each region so word onsets/endings are not clipped
+DEFAULT_MAX_CHUNK_SECONDS = 120.0
+CUT_SEARCH_SECONDS = 10.0      # Pause-less speech is cut at the quietest frame this far before the chunk limit
+SPEECH_GAP_SECONDS = 0.3       # Silence kept between joined speech regions, so words do not run together
+
+Region = Tuple[float, float]  # (start, end) in seconds
+
+
+# --- Speech Detection ---
+
+def frame_energy_db(waveform: np.ndarray, sample_rate: int, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """RMS energy per non-overlapping frame, in dBFS."""
+    frame_length = max(1, int(sample_rate * frame_seconds))
+    num_frames = len(waveform) // frame_length
+    if num_frames == 0:
+        return np.empty(0, dtype=np.float64)
+    frames = waveform[:num_frames * frame_length].reshape(num_frames, frame_length)
+    # einsum sums the squares per frame without materialising a squared copy of the recording
+    mean_square = np.einsum("ij,ij->i", frames, frames).astype(np.float64) / frame_length
+    return 10 * np.log10(mean_square + 1e-20)
+
+def _merge_regions(regions: List[Region], max_gap: float) -> List[Region]:
+    """Sorts regions and merges those separated by at most `max_gap` seconds."""
+    merged: List[List[float]] = []
+    for start, end in sorted(regions):
+        if merged and start - merged[-1][1] <= max_gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+def detect_speech(
+    waveform: np.ndarray,
+    sample_rate: int,
+    min_silence: float = MIN_SILENCE_SECONDS,
+    min_speech: float = MIN_SPEECH_SECONDS,
+    padding: float = SPEECH_PADDING_SECONDS
+) -> List[Region]:
+    """Finds speech regions from frame energy.
+
+    The threshold adapts to the recording: `SPEECH_MARGIN_DB` above the noise
+    floor (10th percentile of frame energy), but never more than 20 dB below
+    the loud frames, so recordings without pauses are not cut up inside speech.
+    Frames at or below `SILENCE_FLOOR_DB` are always silence.
+    """
+    energy = frame_energy_db(waveform, sample_rate)
+    if len(energy) == 0:
+        return []
+    threshold = min(np.percentile(energy, 10) + SPEECH_MARGIN_DB, np.percentile(energy, 95) - 20.0)
+    threshold = max(threshold, SILENCE_FLOOR_DB)
+    is_speech = energy > threshold
+
+    # Run boundaries of the boolean mask: starts where it turns on, ends where it turns off
+    edges = np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1) * FRAME_SECONDS
+    run_ends = np.flatnonzero(edges == -1) * FRAME_SECONDS
+
+    duration = len(waveform) / sample_rate
+    regions = _merge_regions(list(zip(run_starts.tolist(), run_ends.tolist())), min_silence)
+    return [
+        (max(0.0, start - padding), min(duration, end + padding))
+        for start, end in regions
+        if end - start >= min_speech
+    ]
+
+def regions_from_segments(speaker_segments: List[Dict], min_silence: float = MIN_SILENCE_SECONDS) -> List[Region]:
+    """Speech regions from diarization turns: the union of all turns, ignoring short pauses."""
+    return _merge_regions([(segment["start"], segment["end"]) for segment in speaker_segments], min_silence)
+
+
+# --- Speech-Only Timeline ---
+
+class TimeMap(NamedTuple):
+    """Maps times on a speech-only timeline back to the original recording."""
+    compact_starts: np.ndarray   # Start of each kept region on the speech-only timeline
+    original_starts: np.ndarray  # Start of the same region in the original recording
+    lengths: np.ndarray          # Region durations
+    gap: float                   # Silence inserted between regions on the speech-only timeline
+
+def build_speech_timeline(
+    waveform: np.ndarray,
+    sample_rate: int,
+    regions: List[Region],
+    gap: float = SPEECH_GAP_SECONDS
+) -> Tuple[np.ndarray, TimeMap]:
+    """Joins the speech `regions` of `waveform`, separated by `gap` seconds of silence.
+
+    Returns:
+        Tuple of (speech-only waveform, TimeMap back to the original timeline)
+    """
+    gap_samples = np.zeros(int(gap * sample_rate), dtype=waveform.dtype)
+    pieces: List[np.ndarray] = []
+    compact_starts, original_starts, lengths = [], [], []
+    position = 0
+    for start, end in regions:
+        piece = waveform[int(start * sample_rate):int(end * sample_rate)]
+        if len(piece) == 0:
+            continue
+        if pieces:
+            pieces.append(gap_samples)
+            position += len(gap_samples)
+        compact_starts.append(position / sample_rate)
+        original_starts.append(int(start * sample_rate) / sample_rate)
+        lengths.append(len(piece) / sample_rate)
+        pieces.append(piece)
+        position += len(piece)
+
+    compact = np.concatenate(pieces) if pieces else np.zeros(0, dtype=waveform.dtype)
+    time_map = TimeMap(
+        np.array(compact_starts, dtype=np.float64),
+        np.array(original_starts, dtype=np.float64),
+        np.array(lengths, dtype=np.float64),
+        gap
+    )
+    return compact, time_map
+
+def to_original_times(time_map: TimeMap, times: np.ndarray, is_start: bool = False) -> np.ndarray:
+    """Maps speech-only times to original times.
+
+    A time inside an inserted gap maps to the end of the region before it, or with
+    `is_start` to the start of the region after it, so intervals never grow into the
+    removed silence.
+    """
+    if len(time_map.compact_starts) == 0:
+        return np.asarray(times, dtype=np.float64)
+    times = np.asarray(times, dtype=np.float64)
+    if is_start:
+        compact_ends = time_map.compact_starts + time_map.lengths
+        region = np.clip(np.searchsorted(compact_ends, times, side="right"), 0, len(compact_ends) - 1)
+    else:
+        region = np.clip(np.searchsorted(time_map.compact_starts, times, side="right") - 1, 0, None)
+    offset = np.clip(times - time_map.compact_starts[region], 0.0, time_map.lengths[region])
+    return time_map.original_starts[region] + offset
+
+def to_original_intervals(time_map: TimeMap, starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Maps speech-only (start, end) intervals to original times, see `to_original_times`.
+
+    An interval lying entirely inside an inserted gap would come back inverted (its
+    start moves forward, its end back); it collapses to zero length at the start of
+    the next region instead.
+    """
+    original_starts = to_original_times(time_map, starts, is_start=True)
+    original_ends = np.maximum(to_original_times(time_map, ends), original_starts)
+    return original_starts, original_ends
+
+def speech_fraction(time_map: TimeMap, duration: float) -> float:
+    """Share of the original recording that is kept as speech."""
+    return float(time_map.lengths.sum() / duration) if duration > 0 else 0.0
+
+
+# --- Chunk Planning ---
+
+def plan_chunks(
+    regions: List[Region],
+    max_chunk_seconds: float = DEFAULT_MAX_CHUNK_SECONDS,
+    waveform: Optional[np.ndarray] = None,
+    sample_rate: Optional[int] = None
+) -> List[Region]:
+    """Groups consecutive speech regions into chunks of at most `max_chunk_seconds`.
+
+    Chunks start and end at region boundaries, so every cut falls into a pause;
+    silence between chunks is skipped entirely. A single region longer than the
+    limit (speech without any pause) has to be cut inside: with `waveform`, at the
+    quietest frame in the last `CUT_SEARCH_SECONDS` before each limit, so the cut
+    most likely falls between words. Without it, the region is split into equal
+    parts, which may cut through a word.
+    """
+    energy: Optional[np.ndarray] = None
+    chunks: List[Region] = []
+    for start, end in regions:
+        if chunks and end - chunks[-1][0] <= max_chunk_seconds:
+            chunks[-1] = (chunks[-1][0], end)
+            continue
+        if end - start <= max_chunk_seconds:
+            chunks.append((start, end))
+        elif waveform is not None and sample_rate:
+            if energy is None:
+                energy = frame_energy_db(waveform, sample_rate)
+            chunks.extend(_split_at_quiet_frames(start, end, max_chunk_seconds, energy))
+        else:
+            num_parts = int(np.ceil((end - start) / max_chunk_seconds))
+            bounds = np.linspace(start, end, num_parts + 1).tolist()
+            chunks.extend(zip(bounds[:-1], bounds[1:]))
+    return chunks
+
+def _split_at_quiet_frames(start: float, end: float, max_chunk_seconds: float, energy: np.ndarray) -> List[Region]:
+    """Cuts one long region into parts of at most `max_chunk_seconds`, each at the quietest nearby frame."""
+    parts: List[Region] = []
+    while end - start > max_chunk_seconds:
+        limit = start + max_chunk_seconds
+        # Never search the first half, so every part keeps a useful length
+        search_from = max(limit - CUT_SEARCH_SECONDS, start + max_chunk_seconds / 2)
+        first, last = int(np.ceil(search_from / FRAME_SECONDS)), int(limit / FRAME_SECONDS)
+        window = energy[first:last]
+        cut = (first + int(np.argmin(window))) * FRAME_SECONDS if len(window) else limit
+        parts.append((start, cut))
+        start = cut
+    parts.append((start, end))
+    return parts
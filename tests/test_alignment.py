@@ -0,0 +1,77 @@
+"""Vectorized speaker assignment against a brute-force linear scan over all segments."""
+import random
+
+import numpy as np
+import pytest
+
+from src import engine
+
+
+def random_case(rng: random.Random):
+    segments = []
+    for _ in range(rng.randint(1, 12)):
+        start = round(rng.uniform(0, 60), 2)
+        segments.append({"start": start, "end": round(start + rng.uniform(0.1, 8), 2), "speaker": rng.choice("ABCD")})
+    segments.sort(key=lambda segment: segment["start"])  # The linear scan returns the first hit in this order
+    words = []
+    for _ in range(rng.randint(1, 40)):
+        start = round(rng.uniform(-5, 75), 2)
+        words.append((start, round(start + rng.uniform(0, 1.5), 2)))
+    return segments, words
+
+
+def distance(segment, start, end):
+    return max(0.0, segment["start"] - end, start - segment["end"])
+
+
+def speaker_distance(segments, speaker, start, end):
+    return min(distance(segment, start, end) for segment in segments if segment["speaker"] == speaker)
+
+
+def overlap_by_speaker(segments, start, end):
+    totals = {}
+    for segment in segments:
+        overlap = min(end, segment["end"]) - max(start, segment["start"])
+        if overlap > 0:
+            totals[segment["speaker"]] = totals.get(segment["speaker"], 0.0) + overlap
+    return totals
+
+
+def assign(segments, words, strategy, fallback):
+    index = engine.build_speaker_index(segments)
+    starts = np.array([start for start, _ in words])
+    ends = np.array([end for _, end in words])
+    codes = engine.assign_speakers(index, starts, ends, strategy=strategy, fallback=fallback)
+    return [index.speakers[code] if code >= 0 else None for code in codes]
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_midpoint_matches_linear_scan(seed):
+    segments, words = random_case(random.Random(seed))
+    for (start, end), speaker in zip(words, assign(segments, words, "midpoint", "nearest")):
+        mid = start + (end - start) / 2
+        hit = next((segment["speaker"] for segment in segments if segment["start"] <= mid < segment["end"]), None)
+        if hit is not None:
+            assert speaker == hit
+        else:
+            # Nearest segment, where overlapping the word counts as distance 0; ties may go either way
+            best = min(distance(segment, start, end) for segment in segments)
+            assert speaker_distance(segments, speaker, start, end) == pytest.approx(best)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_overlap_matches_linear_scan(seed):
+    segments, words = random_case(random.Random(seed))
+    for (start, end), speaker in zip(words, assign(segments, words, "overlap", "unknown")):
+        totals = overlap_by_speaker(segments, start, end)
+        mid = start + (end - start) / 2
+        if totals:
+            assert totals[speaker] == pytest.approx(max(totals.values()))
+        else:
+            hit = next((segment["speaker"] for segment in segments if segment["start"] <= mid < segment["end"]), None)
+            assert speaker == hit
+
+
+def test_word_in_gap_overlapping_next_turn():
+    segments = [{"start": 0.0, "end": 5.0, "speaker": "A"}, {"start": 6.17, "end": 9.0, "speaker": "C"}]
+    assert assign(segments, [(5.6, 6.24)], "midpoint", "nearest") == ["C"]
@@ -0,0 +1,47 @@
+"""LRU eviction of the on-disk cache."""
+import os
+
+import pytest
+
+from src import cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache_bytes", None)
+    monkeypatch.setattr(cache, "_puts_since_scan", 0)
+    return tmp_path
+
+
+def cache_bytes(directory) -> int:
+    return sum(entry.stat().st_size for entry in directory.rglob("*.pkl"))
+
+
+def test_puts_stay_within_budget_and_evict_oldest(cache_dir, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_MAX_BYTES", 20_000)
+    for i in range(10):
+        key = cache.make_cache_key(i)
+        cache.cache_put("test", key, b"x" * 4000)
+        path = cache._entry_path("test", key)
+        os.utime(path, ns=(i * 10**9, i * 10**9))  # Distinct "last used" times, oldest first
+    assert cache_bytes(cache_dir) <= 20_000
+    assert cache.cache_get("test", cache.make_cache_key(9)) is not None
+    assert cache.cache_get("test", cache.make_cache_key(0)) is None
+
+
+def test_puts_under_budget_do_not_rescan(cache_dir, monkeypatch):
+    scans = []
+    evict_cache = cache.evict_cache
+    monkeypatch.setattr(cache, "evict_cache", lambda: scans.append(1) or evict_cache())
+    for i in range(20):
+        cache.cache_put("test", cache.make_cache_key(i), i)
+    assert len(scans) == 1  # Only the first put, to learn the current size
+    assert cache._cache_bytes == cache_bytes(cache_dir)
+
+
+def test_overwriting_an_entry_does_not_count_twice(cache_dir):
+    key = cache.make_cache_key("same")
+    cache.cache_put("test", key, b"x" * 1000)
+    cache.cache_put("test", key, b"x" * 2000)
+    assert cache._cache_bytes == cache_bytes(cache_dir)
@@ -0,0 +1,19 @@
+"""Grouping of summaries for the reduce phase."""
+from src import llm
+
+COMBINE_PROMPT = "Combine these summaries:\n\n{input_text}"
+
+
+def test_oversized_summary_is_split_to_fit_the_combine_budget():
+    budget = 200
+    summaries = ["Short summary one.", " ".join(f"word{i}" for i in range(2000)), "Short summary two."]
+    pieces = llm.split_oversized_summaries(summaries, budget, COMBINE_PROMPT)
+    assert len(pieces) > len(summaries)
+    assert pieces[0] == summaries[0] and pieces[-1] == summaries[-1]
+    for group in llm.group_summaries(pieces, budget, max_fan_in=8):
+        assert llm.count_tokens(llm.SUMMARY_SEPARATOR.join(group)) <= budget
+
+
+def test_summaries_within_budget_are_kept():
+    summaries = ["First.", "Second.", "Third."]
+    assert llm.split_oversized_summaries(summaries, 200, COMBINE_PROMPT) == summaries
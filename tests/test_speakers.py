@@ -0,0 +1,48 @@
+"""Mapping of per-piece speaker labels onto global speakers."""
+import numpy as np
+
+from src.speakers import UNMATCHED_SPEAKER, SpeakerRegistry
+
+ALICE = np.array([1.0, 0.0, 0.0])
+BOB = np.array([0.0, 1.0, 0.0])
+CAROL = np.array([0.0, 0.0, 1.0])
+
+
+def test_same_speaker_keeps_label_across_pieces():
+    registry = SpeakerRegistry()
+    first = registry.match({"SPEAKER_00": ALICE, "SPEAKER_01": BOB}, {"SPEAKER_00": 5.0, "SPEAKER_01": 5.0})
+    second = registry.match({"SPEAKER_00": BOB + 0.1 * ALICE}, {"SPEAKER_00": 5.0})
+    assert second["SPEAKER_00"] == first["SPEAKER_01"]
+    assert len(registry) == 2
+
+
+def test_unknown_speaker_added_without_cap():
+    registry = SpeakerRegistry()
+    registry.match({"SPEAKER_00": ALICE, "SPEAKER_01": BOB}, {})
+    mapping = registry.match({"SPEAKER_00": CAROL}, {})
+    assert mapping["SPEAKER_00"] == "SPEAKER_02"
+    assert len(registry) == 3
+
+
+def test_capped_registry_maps_leftover_speakers_to_closest():
+    registry = SpeakerRegistry(max_speakers=2)
+    first = registry.match({"SPEAKER_00": ALICE, "SPEAKER_01": BOB}, {})
+    # Below the match threshold for both centroids, but the registry is full
+    mapping = registry.match({"SPEAKER_00": CAROL + 0.2 * BOB}, {})
+    assert mapping["SPEAKER_00"] == first["SPEAKER_01"]
+    assert len(registry) == 2
+
+
+def test_capped_registry_with_more_local_speakers_than_cap():
+    registry = SpeakerRegistry(max_speakers=2)
+    mapping = registry.match({"SPEAKER_00": ALICE, "SPEAKER_01": BOB, "SPEAKER_02": ALICE + 0.1 * CAROL}, {})
+    assert len(registry) == 2
+    assert set(mapping.values()) == set(registry.labels)
+    assert mapping["SPEAKER_02"] == mapping["SPEAKER_00"]
+
+
+def test_speaker_without_embedding_is_unmatched():
+    registry = SpeakerRegistry(max_speakers=1)
+    mapping = registry.match({"SPEAKER_00": ALICE, "SPEAKER_01": None}, {})
+    assert mapping["SPEAKER_01"] == UNMATCHED_SPEAKER
+    assert len(registry) == 1
@@ -0,0 +1,32 @@
+"""Mapping speech-only timestamps back to the original timeline."""
+import numpy as np
+
+from src import vad
+
+SAMPLE_RATE = 1000
+
+
+def make_time_map():
+    # Speech at 0-3 s and 5-8 s, joined with a 0.3 s gap: compact 0-3, gap 3-3.3, 3.3-6.3
+    waveform = np.ones(10 * SAMPLE_RATE, dtype=np.float32)
+    _, time_map = vad.build_speech_timeline(waveform, SAMPLE_RATE, [(0.0, 3.0), (5.0, 8.0)], gap=0.3)
+    return time_map
+
+
+def test_times_inside_regions_keep_their_offset():
+    starts, ends = vad.to_original_intervals(make_time_map(), [1.0, 3.5], [2.0, 4.0])
+    np.testing.assert_allclose(starts, [1.0, 5.2])
+    np.testing.assert_allclose(ends, [2.0, 5.7])
+
+
+def test_interval_crossing_the_gap_spans_both_regions():
+    starts, ends = vad.to_original_intervals(make_time_map(), [2.5], [3.8])
+    np.testing.assert_allclose(starts, [2.5])
+    np.testing.assert_allclose(ends, [5.5])
+
+
+def test_interval_inside_the_gap_is_not_inverted():
+    starts, ends = vad.to_original_intervals(make_time_map(), [3.05], [3.25])
+    assert np.all(ends >= starts)
+    np.testing.assert_allclose(starts, [5.0])
+    np.testing.assert_allclose(ends, [5.0])